@@ -5,6 +5,100 @@ load_dotenv()
 
 class Settings:
     ANTHROPIC_API_KEY: str = os.getenv("ANTHROPIC_API_KEY")
+
+    # Database pool. Hot statements are prepared per connection, so a
+    # transaction-pooling pgbouncer in front needs DB_STATEMENT_CACHE_SIZE=0
+    # and session pooling.
+    DB_POOL_MIN_SIZE: int = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+    DB_POOL_MAX_SIZE: int = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+    DB_COMMAND_TIMEOUT: float = float(os.getenv("DB_COMMAND_TIMEOUT", "60"))
+    DB_MAX_QUERIES: int = int(os.getenv("DB_MAX_QUERIES", "50000"))
+    DB_MAX_INACTIVE_LIFETIME: float = float(os.getenv("DB_MAX_INACTIVE_LIFETIME", "300"))
+    DB_STATEMENT_CACHE_SIZE: int = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+
+    # LLM client
+    LLM_MODEL: str = os.getenv("LLM_MODEL", "claude-sonnet-4-20250514")
+    LLM_MAX_CONNECTIONS: int = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "10"))
+    LLM_KEEPALIVE_EXPIRY: float = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+    LLM_CONNECT_TIMEOUT: float = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "2"))
+    LLM_RESPOND_TIMEOUT: float = float(os.getenv("LLM_RESPOND_TIMEOUT", "15"))
+    LLM_SCORE_TIMEOUT: float = float(os.getenv("LLM_SCORE_TIMEOUT", "60"))
+
+    # Admission control: "local" slots per process (LLM_MAX_CONCURRENCY) or
+    # "postgres" slots shared by all processes (LLM_GLOBAL_CONCURRENCY). The
+    # first slots are reserved for live turns, then for live or scoring.
+    LLM_ADMISSION_BACKEND: str = os.getenv("LLM_ADMISSION_BACKEND", "local")
+    LLM_GLOBAL_CONCURRENCY: int = int(os.getenv("LLM_GLOBAL_CONCURRENCY", "32"))
+    LLM_RESERVED_LIVE: int = int(os.getenv("LLM_RESERVED_LIVE", "4"))
+    LLM_RESERVED_SCORING: int = int(os.getenv("LLM_RESERVED_SCORING", "2"))
+    LLM_QUEUE_TIMEOUT_LIVE: float = float(os.getenv("LLM_QUEUE_TIMEOUT_LIVE", "2"))
+    LLM_QUEUE_TIMEOUT_SCORING: float = float(os.getenv("LLM_QUEUE_TIMEOUT_SCORING", "30"))
+    LLM_QUEUE_TIMEOUT_BATCH: float = float(os.getenv("LLM_QUEUE_TIMEOUT_BATCH", "600"))
+    LLM_SLOT_LEASE: float = float(os.getenv("LLM_SLOT_LEASE", "300"))
+
+    # Server-side /respond history is compacted beyond this many (estimated) tokens
+    RESPOND_HISTORY_TOKEN_BUDGET: int = int(os.getenv("RESPOND_HISTORY_TOKEN_BUDGET", "1500"))
+
+    # Transcript ingestion
+    MESSAGE_BUFFER_ENABLED: bool = os.getenv("MESSAGE_BUFFER_ENABLED", "true").lower() == "true"
+    MESSAGE_FLUSH_INTERVAL: float = float(os.getenv("MESSAGE_FLUSH_INTERVAL", "0.2"))
+    MESSAGE_FLUSH_MAX_BATCH: int = int(os.getenv("MESSAGE_FLUSH_MAX_BATCH", "500"))
+
+    # Scoring job queue. A running job renews its lease every third of
+    # SCORING_JOB_LEASE; the lease only runs out if its worker dies.
+    SCORING_WORKER_CONCURRENCY: int = int(os.getenv("SCORING_WORKER_CONCURRENCY", "2"))
+    SCORING_POLL_INTERVAL: float = float(os.getenv("SCORING_POLL_INTERVAL", "0.5"))
+    SCORING_MAX_ATTEMPTS: int = int(os.getenv("SCORING_MAX_ATTEMPTS", "3"))
+    SCORING_RETRY_BASE_DELAY: float = float(os.getenv("SCORING_RETRY_BASE_DELAY", "5"))
+    SCORING_JOB_LEASE: float = float(os.getenv("SCORING_JOB_LEASE", "180"))
+
+    # Calls with fewer advisor turns are scored 0 locally, without a model call
+    SCORING_MIN_ADVISOR_TURNS: int = int(os.getenv("SCORING_MIN_ADVISOR_TURNS", "2"))
+
+    # Live scoring: a running evaluation updated as turns arrive, so /end
+    # only has to consolidate it
+    LIVE_SCORING_ENABLED: bool = os.getenv("LIVE_SCORING_ENABLED", "true").lower() == "true"
+    LIVE_SCORING_DEBOUNCE: float = float(os.getenv("LIVE_SCORING_DEBOUNCE", "1.0"))
+    LIVE_SCORING_CONCURRENCY: int = int(os.getenv("LIVE_SCORING_CONCURRENCY", "4"))
+
+    # Pre-generated first-turn lines kept per persona (0 disables the pool)
+    OPENER_POOL_SIZE: int = int(os.getenv("OPENER_POOL_SIZE", "8"))
+
+    # Speculative /respond: replies started from interim advisor transcripts
+    SPECULATION_ENABLED: bool = os.getenv("SPECULATION_ENABLED", "true").lower() == "true"
+    SPECULATION_TTL: float = float(os.getenv("SPECULATION_TTL", "30"))
+    SPECULATION_MAX_ENTRIES: int = int(os.getenv("SPECULATION_MAX_ENTRIES", "1000"))
+
+    # Personas: personas.json is re-read when it changes, checked at most
+    # this often
+    PERSONAS_FILE: str = os.getenv(
+        "PERSONAS_FILE", os.path.join(os.path.dirname(__file__), "..", "..", "personas.json")
+    )
+    PERSONAS_RELOAD_INTERVAL: float = float(os.getenv("PERSONAS_RELOAD_INTERVAL", "2"))
+    PERSONAS_CACHE_MAX_AGE: int = int(os.getenv("PERSONAS_CACHE_MAX_AGE", "60"))
+
+    # Message partitions: created this many months ahead; partitions older
+    # than MESSAGES_HOT_MONTHS are moved to gzip files in ARCHIVE_DIR
+    MESSAGES_PARTITIONS_AHEAD: int = int(os.getenv("MESSAGES_PARTITIONS_AHEAD", "2"))
+    MESSAGES_HOT_MONTHS: int = int(os.getenv("MESSAGES_HOT_MONTHS", "6"))
+    ARCHIVE_DIR: str = os.getenv("ARCHIVE_DIR", os.path.join(os.path.dirname(__file__), "..", "..", "archive"))
+
+    # Full-text search: a search still running after this many seconds is
+    # cancelled and the caller asked to narrow it
+    SEARCH_TIMEOUT: float = float(os.getenv("SEARCH_TIMEOUT", "5"))
+
+    # Exports: sessions per chunk (one connection checkout each) and rows
+    # fetched per cursor round-trip
+    EXPORT_CHUNK_SESSIONS: int = int(os.getenv("EXPORT_CHUNK_SESSIONS", "500"))
+    EXPORT_PREFETCH: int = int(os.getenv("EXPORT_PREFETCH", "1000"))
+
+    # Caches
+    SESSION_CACHE_SIZE: int = int(os.getenv("SESSION_CACHE_SIZE", "1024"))
+    SCORECARD_CACHE_SIZE: int = int(os.getenv("SCORECARD_CACHE_SIZE", "1024"))
+    CONVERSATION_CACHE_SIZE: int = int(os.getenv("CONVERSATION_CACHE_SIZE", "1024"))
     # ... other config
 
 settings = Settings()
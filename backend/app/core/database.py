@@ -1,10 +1,82 @@
+import asyncio
 import os
+import re
+import time
 from contextlib import asynccontextmanager
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Callable
 
 import asyncpg
 
+from app.core import metrics
+from app.core.config import settings
+
 _pool: asyncpg.Pool | None = None
+_pool_lock = asyncio.Lock()
+
+# SQL prepared into each new connection's statement cache before it is
+# handed out, so the first request on a fresh connection skips parse/plan.
+_hot_statements: list[str] = []
+
+# Called with the seconds each get_db_connection() waited for a connection.
+_acquire_hooks: list[Callable[[float], None]] = []
+
+
+def add_acquire_hook(hook: Callable[[float], None]) -> None:
+    """Register a callback that observes pool acquire wait times."""
+    _acquire_hooks.append(hook)
+
+
+def register_hot_statement(sql: str) -> str:
+    """Have `sql` prepared on every pooled connection as soon as it opens.
+
+    Callers keep using conn.fetch()/execute() with the same string, which
+    hits the connection's statement cache. Returns `sql` so modules can
+    register at the point of definition.
+    """
+    if sql not in _hot_statements:
+        _hot_statements.append(sql)
+    return sql
+
+
+_PARAMETER = re.compile(r"\$(\d+)")
+
+
+async def _warm_statement(conn: asyncpg.Connection, sql: str) -> None:
+    # Opening a cursor prepares the query through the same statement cache
+    # fetch()/execute() consult, then only binds it (with NULLs), so nothing
+    # runs. prepare() won't do: its statements are invalidated once the
+    # connection goes back to the pool.
+    parameters = max((int(n) for n in _PARAMETER.findall(sql)), default=0)
+    async with conn.transaction():
+        await conn.cursor(sql, *[None] * parameters)
+
+
+async def _init_connection(conn: asyncpg.Connection) -> None:
+    """Prepare the hot statements so no request pays parse/plan on them."""
+    if settings.DB_STATEMENT_CACHE_SIZE <= 0:
+        return
+
+    for sql in _hot_statements:
+        try:
+            await _warm_statement(conn, sql)
+        except asyncpg.PostgresError as e:
+            # e.g. schema not applied yet; it will be prepared on first use
+            print(f"[WARN] Could not prepare statement at connect: {e}")
+
+
+def _collect_pool_stats() -> None:
+    if _pool is None:
+        return
+    size = _pool.get_size()
+    idle = _pool.get_idle_size()
+    metrics.DB_POOL_CONNECTIONS.set(size, state="open")
+    metrics.DB_POOL_CONNECTIONS.set(idle, state="idle")
+    metrics.DB_POOL_CONNECTIONS.set(size - idle, state="in_use")
+    metrics.DB_POOL_CONNECTIONS.set(_pool.get_max_size(), state="max")
+
+
+add_acquire_hook(metrics.DB_POOL_ACQUIRE_WAIT.observe)
+metrics.add_collector(_collect_pool_stats)
 
 
 async def get_pool() -> asyncpg.Pool:
@@ -12,20 +84,44 @@ async def get_pool() -> asyncpg.Pool:
     global _pool
 
     if _pool is None:
-        database_url = os.getenv("DATABASE_URL")
-        if not database_url:
-            raise RuntimeError("DATABASE_URL environment variable is not set")
+        async with _pool_lock:
+            if _pool is None:
+                database_url = os.getenv("DATABASE_URL")
+                if not database_url:
+                    raise RuntimeError("DATABASE_URL environment variable is not set")
 
-        _pool = await asyncpg.create_pool(
-            database_url,
-            min_size=2,
-            max_size=10,
-            command_timeout=60,
-        )
+                _pool = await asyncpg.create_pool(
+                    database_url,
+                    min_size=settings.DB_POOL_MIN_SIZE,
+                    max_size=settings.DB_POOL_MAX_SIZE,
+                    max_queries=settings.DB_MAX_QUERIES,
+                    max_inactive_connection_lifetime=settings.DB_MAX_INACTIVE_LIFETIME,
+                    command_timeout=settings.DB_COMMAND_TIMEOUT,
+                    statement_cache_size=settings.DB_STATEMENT_CACHE_SIZE,
+                    init=_init_connection,
+                )
 
     return _pool
 
 
+async def warm_pool() -> asyncpg.Pool:
+    """Create the pool and bring min_size connections fully up.
+
+    Each connection is checked out once so its connect, init hook and a
+    round-trip have all happened before the first request arrives.
+    """
+    pool = await get_pool()
+
+    connections = [pool.acquire() for _ in range(settings.DB_POOL_MIN_SIZE)]
+    acquired = await asyncio.gather(*connections)
+    try:
+        await asyncio.gather(*(conn.fetchval("SELECT 1") for conn in acquired))
+    finally:
+        await asyncio.gather(*(pool.release(conn) for conn in acquired))
+
+    return pool
+
+
 async def close_pool() -> None:
     """Close the database connection pool."""
     global _pool
@@ -40,5 +136,9 @@ async def get_db_connection() -> AsyncGenerator[asyncpg.Connection, None]:
     """Get a database connection from the pool."""
     pool = await get_pool()
 
+    started = time.perf_counter()
     async with pool.acquire() as connection:
+        waited = time.perf_counter() - started
+        for hook in _acquire_hooks:
+            hook(waited)
         yield connection
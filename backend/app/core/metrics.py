@@ -0,0 +1,212 @@
+"""Minimal Prometheus-style metrics registry.
+
+Counters, gauges and histograms with labels, rendered in the Prometheus
+text exposition format by `render()` for the /metrics endpoint. Kept
+in-process and dependency-free; each worker process exposes its own
+series, as with the official client in multi-process mode without a
+shared directory.
+"""
+import math
+from typing import Callable
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_registry: list["_Metric"] = []
+_collectors: list[Callable[[], None]] = []
+
+
+def _format_labels(labelnames: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        _registry.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        super().__init__(name, help, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        for key, value in self._values.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        super().__init__(name, help, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def set(self, value: float, **labels) -> None:
+        self._values[self._key(labels)] = value
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        for key, value in self._values.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._counts: dict[tuple, list[int]] = {}
+        self._sums: dict[tuple, float] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        counts = self._counts.setdefault(key, [0] * len(self.buckets))
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        self._sums[key] = self._sums.get(key, 0.0) + value
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        for key, counts in self._counts.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(self._sums[key])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def add_collector(collector: Callable[[], None]) -> None:
+    """Register a callback that refreshes gauges right before rendering."""
+    _collectors.append(collector)
+
+
+def render() -> str:
+    for collector in _collectors:
+        collector()
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# HTTP
+HTTP_REQUEST_DURATION = Histogram(
+    "pitchiq_http_request_duration_seconds",
+    "HTTP request latency by route template.",
+    ("method", "route", "status"),
+)
+
+# Database pool
+DB_POOL_ACQUIRE_WAIT = Histogram(
+    "pitchiq_db_pool_acquire_wait_seconds",
+    "Time spent waiting for a pooled database connection.",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "pitchiq_db_pool_connections",
+    "Database pool connections by state.",
+    ("state",),
+)
+
+# LLM
+LLM_REQUEST_DURATION = Histogram(
+    "pitchiq_llm_request_duration_seconds",
+    "Model call latency, start of request to end of response.",
+    ("endpoint", "persona"),
+)
+LLM_TIME_TO_FIRST_TOKEN = Histogram(
+    "pitchiq_llm_time_to_first_token_seconds",
+    "Time from request to the first streamed text delta.",
+    ("endpoint", "persona"),
+)
+LLM_ADMISSION_WAIT = Histogram(
+    "pitchiq_llm_admission_wait_seconds",
+    "Time model calls queued for a slot, by priority class.",
+    ("priority",),
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0),
+)
+LLM_ADMISSIONS = Counter(
+    "pitchiq_llm_admissions_total",
+    "Model calls admitted, shed, or let through without a slot (unthrottled), by priority class.",
+    ("priority", "outcome"),
+)
+LLM_ADMISSION_QUEUE = Gauge(
+    "pitchiq_llm_admission_queue",
+    "Model calls in this process waiting for a slot, by priority class.",
+    ("priority",),
+)
+LLM_TOKENS = Counter(
+    "pitchiq_llm_tokens_total",
+    "Model tokens by kind: input, output, cache_read, cache_write.",
+    ("endpoint", "persona", "kind"),
+)
+LLM_ERRORS = Counter(
+    "pitchiq_llm_errors_total",
+    "Model calls that raised.",
+    ("endpoint", "persona", "error"),
+)
+SCORECARD_PARSES = Counter(
+    "pitchiq_scorecard_parses_total",
+    "Scoring replies by outcome: ok, salvaged, repaired, repair_call, failed or too_short (no model call).",
+    ("endpoint", "outcome"),
+)
+LIVE_SCORING = Counter(
+    "pitchiq_live_scoring_total",
+    "Live evaluation events: updated, bad_update, consolidated, fallback.",
+    ("event",),
+)
+SCORECARD_CACHE_LOOKUPS = Counter(
+    "pitchiq_scorecard_cache_lookups_total",
+    "Scorecard lookups by where they were answered: memory, in_flight, postgres or miss.",
+    ("result",),
+)
+OPENERS = Counter(
+    "pitchiq_openers_total",
+    "Pooled opening lines: served, empty (pool had none), generated, discarded.",
+    ("persona", "event"),
+)
+SPECULATION = Counter(
+    "pitchiq_speculation_total",
+    "Speculative replies: started, hit, miss (final utterance differed), expired, failed.",
+    ("outcome",),
+)
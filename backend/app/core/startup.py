@@ -0,0 +1,170 @@
+"""Cold-start readiness and the startup profile.
+
+The API accepts connections as soon as it is imported. The database pool
+and the model client are brought up afterwards by WarmUp, in the
+background, and /readyz answers 503 until every step is done, so a
+scale-to-zero platform only routes calls to a warm instance. /healthz
+answers straight away.
+
+Profile a cold start (each run is a fresh interpreter):
+
+    python -m app.core.startup                 # import time of main, slowest modules first
+    python -m app.core.startup --init          # plus each warm-up step (needs the database)
+    python -m app.core.startup --budget 1.0    # exit 1 if importing main takes longer
+
+With --budget the profile doubles as a startup-time regression check;
+tests/test_startup.py runs the same check under pytest.
+"""
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Optional
+
+# Where main.py lives; the profile imports it from there
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+
+class WarmUp:
+    """Runs warm-up steps in order, retrying a failing step, and records how long each took."""
+
+    def __init__(self, retry_delay: float = 1.0, max_retry_delay: float = 30.0):
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.timings: dict[str, float] = {}
+        self.ready = asyncio.Event()
+        self.error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, steps: list[tuple[str, Callable[[], Awaitable]]]) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(steps))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self, steps: list[tuple[str, Callable[[], Awaitable]]]) -> None:
+        started = time.perf_counter()
+        for name, step in steps:
+            delay = self.retry_delay
+            step_started = time.perf_counter()
+            while True:
+                try:
+                    await step()
+                    break
+                except Exception as e:
+                    # e.g. a scaled-to-zero database still waking up
+                    self.error = f"{name}: {e}"
+                    print(f"[WARN] Warm-up step '{name}' failed, retrying in {delay:.0f}s: {e}")
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, self.max_retry_delay)
+            self.timings[name] = round(time.perf_counter() - step_started, 4)
+
+        self.error = None
+        self.timings["total"] = round(time.perf_counter() - started, 4)
+        self.ready.set()
+        print(f"[STARTUP] Ready in {self.timings['total'] * 1000:.0f}ms: {self.timings}")
+
+    def status(self) -> dict:
+        return {
+            "status": "ready" if self.ready.is_set() else "starting",
+            "steps": self.timings,
+            **({"last_error": self.error} if self.error else {}),
+        }
+
+
+def parse_importtime(stderr: str) -> list[tuple[str, int, float, float]]:
+    """(module, depth, self ms, cumulative ms) for each line of `python -X importtime` output."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue  # the header line
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        modules.append((name.strip(), depth, int(self_us) / 1000, int(cumulative_us) / 1000))
+    return modules
+
+
+# Run in the child: import main, then optionally run its warm-up, and
+# print the timings as JSON on the last line of stdout
+_PROFILE_SCRIPT = """
+import asyncio, json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter() - started
+timings = dict()
+if {init}:
+    async def warm():
+        async with main.lifespan(main.app):
+            await asyncio.wait_for(main.warm_up.ready.wait(), {timeout})
+            timings.update(main.warm_up.timings)
+    asyncio.run(warm())
+print(json.dumps({{"import": imported, "init": timings}}))
+"""
+
+
+def profile(init: bool = False, timeout: float = 60.0) -> tuple[float, list, dict]:
+    """Import main in a fresh interpreter; returns (import seconds, importtime rows, warm-up timings)."""
+    import json
+    import subprocess
+    import sys
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROFILE_SCRIPT.format(init=init, timeout=timeout)],
+        capture_output=True,
+        text=True,
+        cwd=BACKEND_DIR,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing main failed:\n{result.stderr[-2000:]}")
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    return timings["import"], parse_importtime(result.stderr), timings["init"]
+
+
+def main() -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Profile the API's cold start.")
+    parser.add_argument("--init", action="store_true", help="also time the warm-up steps (needs the database)")
+    parser.add_argument("--top", type=int, default=15, help="modules to list")
+    parser.add_argument("--budget", type=float, help="fail if importing main takes longer than this many seconds")
+    parser.add_argument("--runs", type=int, default=3, help="take the fastest of this many cold imports")
+    args = parser.parse_args()
+
+    runs = [profile(init=args.init) for _ in range(args.runs)]
+    imported, modules, init = min(runs, key=lambda run: run[0])
+
+    # Anything after main's own line was imported during warm-up
+    main_index = next(i for i, m in enumerate(modules) if m[0] == "main")
+    main_depth = modules[main_index][1]
+    modules = modules[: main_index + 1]
+    direct = [m for m in modules if m[1] == main_depth + 1]
+    first_party = [m for m in modules if m[0].split(".")[0] in ("app", "personas", "prompts", "main")]
+
+    print(f"import main: {imported * 1000:.0f}ms (fastest of {args.runs})\n")
+    print(f"{'cumulative':>11} {'self':>8}  imported by main")
+    for name, _, self_ms, cumulative_ms in sorted(direct, key=lambda m: -m[3])[: args.top]:
+        print(f"{cumulative_ms:>9.1f}ms {self_ms:>6.1f}ms  {name}")
+    print(f"\n{'cumulative':>11} {'self':>8}  this repo's modules")
+    for name, _, self_ms, cumulative_ms in sorted(first_party, key=lambda m: -m[2])[: args.top]:
+        print(f"{cumulative_ms:>9.1f}ms {self_ms:>6.1f}ms  {name}")
+    if init:
+        print("\nwarm-up:")
+        for step, seconds in init.items():
+            print(f"{seconds * 1000:>9.1f}ms  {step}")
+
+    if args.budget is not None and imported > args.budget:
+        print(f"\n[ERROR] import main took {imported:.2f}s, over the {args.budget:.2f}s budget")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,84 @@
+"""Per-request trace ids.
+
+Every request runs under a trace id, available anywhere via
+`current_trace_id()` and returned in the X-Trace-Id response header.
+Requests about a session (and the scoring job for it) use an id derived
+from the session id, so one id follows a call from creation through
+transcript posts, /end and background scoring.
+"""
+import re
+import time
+import uuid
+from contextvars import ContextVar
+
+from app.core import metrics
+
+TRACE_HEADER = "x-trace-id"
+
+_trace_id: ContextVar[str] = ContextVar("trace_id", default="-")
+
+_SESSION_PATH = re.compile(r"^/sessions/([0-9a-fA-F-]{36})(?:/|$)")
+
+
+def current_trace_id() -> str:
+    return _trace_id.get()
+
+
+def set_trace_id(trace_id: str) -> None:
+    _trace_id.set(trace_id)
+
+
+def session_trace_id(session_id) -> str:
+    """The trace id shared by every request about one session."""
+    return uuid.UUID(str(session_id)).hex
+
+
+class ObservabilityMiddleware:
+    """ASGI middleware assigning trace ids and timing requests per route.
+
+    Plain ASGI rather than BaseHTTPMiddleware so a trace id set by the
+    endpoint itself (e.g. once create_session knows the new session id)
+    is the one echoed in the response header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        headers = dict(scope.get("headers") or [])
+        trace_id = headers.get(TRACE_HEADER.encode(), b"").decode()
+        if not trace_id:
+            match = _SESSION_PATH.match(scope["path"])
+            try:
+                trace_id = session_trace_id(match.group(1)) if match else uuid.uuid4().hex
+            except ValueError:
+                trace_id = uuid.uuid4().hex
+        set_trace_id(trace_id)
+
+        status = 500
+
+        async def send_with_trace(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (TRACE_HEADER.encode(), current_trace_id().encode()),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_trace)
+        finally:
+            route = scope.get("route")
+            metrics.HTTP_REQUEST_DURATION.observe(
+                time.perf_counter() - started,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=status,
+            )
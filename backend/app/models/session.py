@@ -25,6 +25,10 @@ class MessageRequest(BaseModel):
     turn_number: int
 
 
+class MessageBatchRequest(BaseModel):
+    messages: list[MessageRequest]
+
+
 class ScorecardData(BaseModel):
     overall_score: int
     opener_score: int
@@ -41,11 +45,26 @@ class ScorecardData(BaseModel):
     meeting_booked: bool
 
 
+class CallMetrics(BaseModel):
+    advisor_turns: int
+    prospect_turns: int
+    advisor_words: int
+    prospect_words: int
+    talk_ratio: float  # advisor's share of the words spoken
+    questions: int
+    objections_raised: list[str]  # persona objections the prospect brought up
+    objections_answered: int
+    close_attempts: int  # advisor turns asking for a meeting or next step
+    filler_rate: float  # filler words per 100 advisor words
+    too_short: bool  # scored 0 without a model call
+
+
 class EndSessionResponse(BaseModel):
     session_id: str
-    status: str
+    status: str  # 'scoring' until the queued scorecard is ready, then 'completed'
     ended_at: datetime
-    scorecard: ScorecardData
+    scorecard: Optional[ScorecardData] = None
+    metrics: Optional[CallMetrics] = None
 
 
 class Message(BaseModel):
@@ -61,3 +80,4 @@ class SessionDetail(BaseModel):
     session: SessionResponse
     messages: list[Message]
     scorecard: Optional[ScorecardData]
+    metrics: Optional[CallMetrics] = None
@@ -0,0 +1,441 @@
+"""Admission control for model calls.
+
+Every model call holds a slot while it runs. Calls belong to one of three
+priority classes: live persona turns, scoring, and batch work
+(re-scoring, opener pools). The lowest-numbered slots are reserved: the
+first LLM_RESERVED_LIVE for live turns only, the next
+LLM_RESERVED_SCORING for live turns or scoring. A burst of scoring can
+therefore never take the capacity live turns need. Waiters are admitted
+highest priority first (across processes with the postgres backend, on a
+best-effort basis). A call that cannot get a slot within its class's
+queue timeout is shed with AdmissionRejected, which the API turns into
+a 503.
+
+Two backends, chosen by LLM_ADMISSION_BACKEND:
+
+- local: LLM_MAX_CONCURRENCY slots per process (the default).
+- postgres: LLM_GLOBAL_CONCURRENCY slots shared by every API worker,
+  scoring worker and CLI, held as leased rows in llm_slots. A crashed
+  holder's slot frees itself when its lease runs out. The limiter keeps
+  one connection of its own for this, outside the request pool.
+"""
+import asyncio
+import heapq
+import itertools
+import os
+import random
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, Optional
+
+import asyncpg
+
+from app.core import metrics
+from app.core.config import settings
+
+LIVE = "live"
+SCORING = "scoring"
+BATCH = "batch"
+PRIORITIES = (LIVE, SCORING, BATCH)
+
+# How long each class may queue for a slot before it is shed.
+QUEUE_TIMEOUTS = {
+    LIVE: settings.LLM_QUEUE_TIMEOUT_LIVE,
+    SCORING: settings.LLM_QUEUE_TIMEOUT_SCORING,
+    BATCH: settings.LLM_QUEUE_TIMEOUT_BATCH,
+}
+
+
+class AdmissionRejected(Exception):
+    """No model capacity for this call within its queue timeout."""
+
+    def __init__(self, priority: str, waited: float):
+        super().__init__(f"No {priority} model slot free after {waited:.2f}s")
+        self.priority = priority
+        self.waited = waited
+
+
+def first_slot(priority: str) -> int:
+    """The lowest slot a class may take; those below are reserved for higher classes."""
+    if priority == LIVE:
+        return 0
+    if priority == SCORING:
+        return settings.LLM_RESERVED_LIVE
+    return settings.LLM_RESERVED_LIVE + settings.LLM_RESERVED_SCORING
+
+
+class Limiter(ABC):
+    """Slot backend interface: acquire() returns a token for release().
+
+    A token of None means the call was let through without a slot.
+    """
+
+    @abstractmethod
+    async def acquire(self, priority: str, timeout: float):
+        ...
+
+    @abstractmethod
+    async def release(self, token) -> None:
+        ...
+
+    def waiting(self, priority: str) -> int:
+        return 0
+
+    async def close(self) -> None:
+        pass
+
+    @asynccontextmanager
+    async def slot(self, priority: str) -> AsyncGenerator[None, None]:
+        started = time.perf_counter()
+        try:
+            token = await self.acquire(priority, QUEUE_TIMEOUTS[priority])
+        except AdmissionRejected:
+            metrics.LLM_ADMISSIONS.inc(priority=priority, outcome="shed")
+            raise
+        metrics.LLM_ADMISSION_WAIT.observe(time.perf_counter() - started, priority=priority)
+        metrics.LLM_ADMISSIONS.inc(priority=priority, outcome="admitted" if token is not None else "unthrottled")
+
+        try:
+            yield
+        finally:
+            await self.release(token)
+
+
+class LocalLimiter(Limiter):
+    """Slots for this process only, handed out strictly by priority then arrival."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._free = set(range(size))
+        self._waiters: list[tuple[int, int, str, asyncio.Future]] = []
+        self._order = itertools.count()
+
+    def _take(self, priority: str) -> Optional[int]:
+        eligible = [slot for slot in self._free if slot >= first_slot(priority)]
+        if not eligible:
+            return None
+        slot = min(eligible)
+        self._free.discard(slot)
+        return slot
+
+    def _dispatch(self) -> None:
+        # A class can use a subset of the slots any higher class can, so
+        # once the head waiter can't be served nobody behind it can either
+        while self._waiters:
+            _, _, priority, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            slot = self._take(priority)
+            if slot is None:
+                return
+            heapq.heappop(self._waiters)
+            future.set_result(slot)
+
+    async def acquire(self, priority: str, timeout: float) -> int:
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (PRIORITIES.index(priority), next(self._order), priority, future))
+        self._dispatch()
+
+        started = time.perf_counter()
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            if future.done():
+                return future.result()
+            future.cancel()
+            raise AdmissionRejected(priority, time.perf_counter() - started)
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                await self.release(future.result())
+            future.cancel()
+            raise
+
+    async def release(self, token: int) -> None:
+        self._free.add(token)
+        self._dispatch()
+
+    def waiting(self, priority: str) -> int:
+        return sum(1 for _, _, p, future in self._waiters if p == priority and not future.done())
+
+
+CREATE_SLOTS_SQL = """
+INSERT INTO llm_slots (slot) SELECT generate_series(0, $1 - 1)
+ON CONFLICT (slot) DO NOTHING
+"""
+
+# Left over from a larger LLM_GLOBAL_CONCURRENCY
+DROP_EXTRA_SLOTS_SQL = "DELETE FROM llm_slots WHERE slot >= $1"
+
+# The lowest free (or lease-expired) slot in the class's range
+CLAIM_SLOT_SQL = """
+UPDATE llm_slots
+SET holder = $1, priority = $2, lease_until = NOW() + $3 * interval '1 second'
+WHERE slot = (
+    SELECT slot FROM llm_slots
+    WHERE slot >= $4 AND slot < $5
+      AND (holder IS NULL OR lease_until < NOW())
+    ORDER BY slot
+    LIMIT 1
+    FOR UPDATE SKIP LOCKED
+)
+RETURNING slot
+"""
+
+RELEASE_SLOT_SQL = """
+WITH released AS (
+    UPDATE llm_slots SET holder = NULL, priority = NULL, lease_until = NULL
+    WHERE slot = $1 AND holder = $2
+    RETURNING slot
+)
+SELECT pg_notify('llm_slot_freed', slot::text) FROM released
+"""
+
+SLOT_FREED_CHANNEL = "llm_slot_freed"
+
+_DB_ERRORS = (OSError, asyncpg.PostgresError, asyncpg.InterfaceError)
+
+# While calls are queued, the limiter retries when a slot is released
+# anywhere, or after a backoff that starts at the head waiter's interval
+# and doubles up to MAX_RETRY_INTERVAL (for leases that run out, and
+# NOTIFYs lost to a reconnect).
+RETRY_INTERVALS = {LIVE: 0.05, SCORING: 0.2, BATCH: 0.5}
+MAX_RETRY_INTERVAL = 5.0
+
+# After a release, a process whose best waiter is of a lower class holds
+# back this long, so higher classes queued in other processes claim first
+WAKE_DELAYS = {LIVE: 0.0, SCORING: 0.01, BATCH: 0.05}
+
+# At most one "slot table unavailable" warning per this many seconds; the
+# calls let through meanwhile are counted as outcome="unthrottled"
+FAIL_OPEN_WARN_INTERVAL = 60.0
+
+
+class PostgresLimiter(Limiter):
+    """Slots shared across processes through the llm_slots table.
+
+    Claims and releases go over one connection of the limiter's own, so
+    queued calls never hold connections from the request pool. Queued
+    calls wait in a local heap, as in LocalLimiter; one dispatcher task
+    claims slots for them highest priority first, retrying when a release
+    NOTIFYs llm_slot_freed. Across processes the order is best-effort
+    (see WAKE_DELAYS); the reserved slot ranges are what guarantee live
+    turns their capacity. If the database can't be reached the call is
+    let through unthrottled rather than failed.
+    """
+
+    def __init__(self, size: int, lease: float):
+        self.size = size
+        self.lease = lease
+        self._conn: Optional[asyncpg.Connection] = None
+        self._lock = asyncio.Lock()
+        self._waiters: list[tuple[int, int, str, str, asyncio.Future]] = []
+        self._order = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._warned_at: Optional[float] = None
+        self._unthrottled = 0
+
+    def _fail_open(self, error: Exception, calls: int = 1) -> None:
+        """Note calls let through without a slot, warning at most every FAIL_OPEN_WARN_INTERVAL."""
+        self._unthrottled += calls
+        now = time.monotonic()
+        if self._warned_at is None or now - self._warned_at >= FAIL_OPEN_WARN_INTERVAL:
+            print(
+                f"[WARN] LLM slot table unavailable, admitting calls without a slot "
+                f"({self._unthrottled} since the last warning): {error}"
+            )
+            self._warned_at = now
+            self._unthrottled = 0
+
+    def _on_freed(self, *args) -> None:
+        self._wakeup.set()
+
+    async def _connection(self) -> asyncpg.Connection:
+        if self._conn is None or self._conn.is_closed():
+            database_url = os.getenv("DATABASE_URL")
+            if not database_url:
+                raise RuntimeError("DATABASE_URL environment variable is not set")
+            conn = await asyncpg.connect(database_url, command_timeout=settings.DB_COMMAND_TIMEOUT)
+            try:
+                async with conn.transaction():
+                    await conn.execute(CREATE_SLOTS_SQL, self.size)
+                    await conn.execute(DROP_EXTRA_SLOTS_SQL, self.size)
+                await conn.add_listener(SLOT_FREED_CHANNEL, self._on_freed)
+            except BaseException:
+                await conn.close()
+                raise
+            self._conn = conn
+            # Slots may have been released while there was no listener
+            self._on_freed()
+        return self._conn
+
+    async def _execute(self, method: str, *args):
+        """Run one statement on the limiter's connection, reconnecting if it was lost."""
+        async with self._lock:
+            try:
+                conn = await self._connection()
+                return await getattr(conn, method)(*args)
+            except _DB_ERRORS:
+                await self._drop_connection()
+                raise
+
+    async def _drop_connection(self) -> None:
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            conn.terminate()
+
+    async def _claim(self, holder: str, priority: str) -> Optional[int]:
+        return await self._execute(
+            "fetchval", CLAIM_SLOT_SQL, holder, priority, self.lease, first_slot(priority), self.size
+        )
+
+    def _head(self) -> Optional[tuple[int, int, str, str, asyncio.Future]]:
+        while self._waiters and self._waiters[0][4].done():
+            heapq.heappop(self._waiters)
+        return self._waiters[0] if self._waiters else None
+
+    async def _dispatch(self) -> None:
+        # As in LocalLimiter, once the head waiter can't be served nobody
+        # behind it can either
+        while (head := self._head()) is not None:
+            _, _, priority, holder, future = head
+            try:
+                slot = await self._claim(holder, priority)
+            except _DB_ERRORS as e:
+                queued = [waiter for *_, waiter in self._waiters if not waiter.done()]
+                for waiter in queued:
+                    waiter.set_result(None)
+                self._waiters.clear()
+                self._fail_open(e, len(queued))
+                return
+            if slot is None:
+                return
+            if future.done():
+                # Timed out or cancelled while the claim was in flight
+                await self.release((slot, holder))
+            else:
+                future.set_result((slot, holder))
+
+    async def _run(self) -> None:
+        interval = None
+        while True:
+            self._wakeup.clear()
+            await self._dispatch()
+            head = self._head()
+            if head is None:
+                self._task = None
+                return
+
+            interval = interval or RETRY_INTERVALS[head[2]]
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), interval * random.uniform(0.5, 1.5))
+            except asyncio.TimeoutError:
+                interval = min(interval * 2, MAX_RETRY_INTERVAL)
+                continue
+            interval = None
+            head = self._head()
+            if head is not None:
+                await asyncio.sleep(WAKE_DELAYS[head[2]])
+
+    async def acquire(self, priority: str, timeout: float) -> Optional[tuple[int, str]]:
+        holder = uuid.uuid4().hex
+        started = time.perf_counter()
+        rank = PRIORITIES.index(priority)
+
+        # Straight to a claim unless a call of this class or higher is already queued
+        head = self._head()
+        if head is None or rank < head[0]:
+            try:
+                slot = await self._claim(holder, priority)
+            except _DB_ERRORS as e:
+                self._fail_open(e)
+                return None
+            if slot is not None:
+                return slot, holder
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (rank, next(self._order), priority, holder, future))
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        elif self._waiters[0][4] is future:
+            # A new head: retry on its (shorter) interval
+            self._wakeup.set()
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), max(timeout - (time.perf_counter() - started), 0))
+        except asyncio.TimeoutError:
+            if future.done():
+                return future.result()
+            future.cancel()
+            raise AdmissionRejected(priority, time.perf_counter() - started)
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled() and future.result() is not None:
+                await self.release(future.result())
+            future.cancel()
+            raise
+
+    async def release(self, token: Optional[tuple[int, str]]) -> None:
+        if token is None:
+            return
+        try:
+            await self._execute("execute", RELEASE_SLOT_SQL, *token)
+        except _DB_ERRORS as e:
+            print(f"[WARN] Could not release LLM slot {token[0]}, it frees when the lease ends: {e}")
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        async with self._lock:
+            if self._conn is not None:
+                conn, self._conn = self._conn, None
+                await conn.close()
+
+    def waiting(self, priority: str) -> int:
+        return sum(1 for _, _, p, _, future in self._waiters if p == priority and not future.done())
+
+
+_limiter: Limiter | None = None
+
+
+def get_limiter() -> Limiter:
+    """Get or create the limiter for LLM_ADMISSION_BACKEND."""
+    global _limiter
+
+    if _limiter is None:
+        if settings.LLM_ADMISSION_BACKEND == "postgres":
+            _limiter = PostgresLimiter(settings.LLM_GLOBAL_CONCURRENCY, settings.LLM_SLOT_LEASE)
+        else:
+            _limiter = LocalLimiter(settings.LLM_MAX_CONCURRENCY)
+
+    return _limiter
+
+
+async def close_limiter() -> None:
+    """Close the limiter's database connection, if it has one."""
+    global _limiter
+
+    if _limiter is not None:
+        await _limiter.close()
+        _limiter = None
+
+
+def set_limiter(limiter: Limiter) -> None:
+    global _limiter
+    _limiter = limiter
+
+
+def _collect_queue_depth() -> None:
+    if _limiter is not None:
+        for priority in PRIORITIES:
+            metrics.LLM_ADMISSION_QUEUE.set(_limiter.waiting(priority), priority=priority)
+
+
+metrics.add_collector(_collect_queue_depth)
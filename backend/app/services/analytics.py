@@ -0,0 +1,228 @@
+from datetime import date, timedelta
+from typing import Optional
+
+import asyncpg
+
+from app.core.database import register_hot_statement
+from app.models.session import ScorecardData
+
+# Rollup rows are keyed on (user_id, persona_id, period, bucket). '*' in
+# user_id or persona_id aggregates over all users / all personas, and the
+# 'all' period has a single bucket, so every dashboard figure is one
+# indexed row (or a bounded range of day/week rows) however long the
+# history gets.
+ALL_USERS = "*"
+ALL_PERSONAS = "*"
+ALL_TIME_BUCKET = date(1970, 1, 1)
+
+PERIODS = ("day", "week", "all")
+
+# The 12 rollup keys a scored session contributes to, given a row source
+# exposing user_id, persona_id and day.
+ROLLUP_KEYS = """
+    LATERAL (VALUES (src.user_id), ('*')) AS u(user_id),
+    LATERAL (VALUES (src.persona_id), ('*')) AS p(persona_id),
+    LATERAL (VALUES
+        ('day', src.day),
+        ('week', date_trunc('week', src.day)::date),
+        ('all', DATE '1970-01-01')
+    ) AS b(period, bucket)
+"""
+
+# Adds one scorecard to every rollup it belongs to. Keys are upserted in a
+# fixed order so concurrent scorers lock shared rows (the '*' aggregates)
+# in the same order and cannot deadlock.
+ROLLUP_SCORECARD_SQL = register_hot_statement(f"""
+INSERT INTO score_rollups (
+    user_id, persona_id, period, bucket, sessions,
+    overall_sum, opener_sum, objection_handling_sum, tone_confidence_sum, close_attempt_sum,
+    meetings_booked, updated_at
+)
+SELECT u.user_id, p.persona_id, b.period, b.bucket, 1, $2, $3, $4, $5, $6, $7::int, NOW()
+FROM (
+    SELECT user_id, persona_id, started_at::date AS day
+    FROM sessions
+    WHERE id = $1
+) src,
+{ROLLUP_KEYS}
+ORDER BY 1, 2, 3, 4
+ON CONFLICT (user_id, persona_id, period, bucket) DO UPDATE SET
+    sessions = score_rollups.sessions + 1,
+    overall_sum = score_rollups.overall_sum + EXCLUDED.overall_sum,
+    opener_sum = score_rollups.opener_sum + EXCLUDED.opener_sum,
+    objection_handling_sum = score_rollups.objection_handling_sum + EXCLUDED.objection_handling_sum,
+    tone_confidence_sum = score_rollups.tone_confidence_sum + EXCLUDED.tone_confidence_sum,
+    close_attempt_sum = score_rollups.close_attempt_sum + EXCLUDED.close_attempt_sum,
+    meetings_booked = score_rollups.meetings_booked + EXCLUDED.meetings_booked,
+    updated_at = NOW()
+""")
+
+REBUILD_ROLLUPS_SQL = f"""
+INSERT INTO score_rollups (
+    user_id, persona_id, period, bucket, sessions,
+    overall_sum, opener_sum, objection_handling_sum, tone_confidence_sum, close_attempt_sum,
+    meetings_booked, updated_at
+)
+SELECT u.user_id, p.persona_id, b.period, b.bucket, count(*),
+       sum(COALESCE(src.overall_score, 0)),
+       sum(COALESCE(src.opener_score, 0)),
+       sum(COALESCE(src.objection_handling_score, 0)),
+       sum(COALESCE(src.tone_confidence_score, 0)),
+       sum(COALESCE(src.close_attempt_score, 0)),
+       count(*) FILTER (WHERE src.meeting_booked),
+       NOW()
+FROM (
+    SELECT s.user_id, s.persona_id, s.started_at::date AS day, sc.*
+    FROM scorecards sc
+    JOIN sessions s ON s.id = sc.session_id
+) src,
+{ROLLUP_KEYS}
+GROUP BY 1, 2, 3, 4
+"""
+
+# Per-bucket averages derived from the stored sums.
+ROLLUP_COLUMNS = """
+    sessions,
+    round(overall_sum::numeric / sessions, 2) AS avg_overall,
+    round(opener_sum::numeric / sessions, 2) AS avg_opener,
+    round(objection_handling_sum::numeric / sessions, 2) AS avg_objection_handling,
+    round(tone_confidence_sum::numeric / sessions, 2) AS avg_tone_confidence,
+    round(close_attempt_sum::numeric / sessions, 2) AS avg_close_attempt,
+    round(meetings_booked::numeric / sessions, 3) AS meeting_booked_rate
+"""
+
+ROLLING_COLUMNS = """
+    round(sum(overall_sum) OVER w::numeric / sum(sessions) OVER w, 2) AS rolling_avg_overall,
+    round(sum(opener_sum) OVER w::numeric / sum(sessions) OVER w, 2) AS rolling_avg_opener,
+    round(sum(objection_handling_sum) OVER w::numeric / sum(sessions) OVER w, 2) AS rolling_avg_objection_handling,
+    round(sum(tone_confidence_sum) OVER w::numeric / sum(sessions) OVER w, 2) AS rolling_avg_tone_confidence,
+    round(sum(close_attempt_sum) OVER w::numeric / sum(sessions) OVER w, 2) AS rolling_avg_close_attempt,
+    round(sum(meetings_booked) OVER w::numeric / sum(sessions) OVER w, 3) AS rolling_meeting_booked_rate
+"""
+
+
+async def record_scorecard_rollups(conn: asyncpg.Connection, session_id: str, scorecard: ScorecardData) -> None:
+    """Add a newly stored scorecard to the rollups.
+
+    Must run in the same transaction as the scorecard insert, and only when
+    that insert actually added a row, so each scorecard is counted once.
+    """
+    await conn.execute(
+        ROLLUP_SCORECARD_SQL,
+        session_id,
+        scorecard.overall_score,
+        scorecard.opener_score,
+        scorecard.objection_handling_score,
+        scorecard.tone_confidence_score,
+        scorecard.close_attempt_score,
+        scorecard.meeting_booked,
+    )
+
+
+async def rebuild_rollups(conn: asyncpg.Connection) -> int:
+    """Recompute every rollup from the scorecards table. Returns rows written."""
+    async with conn.transaction():
+        await conn.execute("LOCK TABLE score_rollups IN EXCLUSIVE MODE")
+        await conn.execute("DELETE FROM score_rollups")
+        result = await conn.execute(REBUILD_ROLLUPS_SQL)
+    return int(result.split()[-1])
+
+
+def bucket_start(period: str, day: date) -> date:
+    """The bucket a day falls in: itself, its week's Monday, or the all-time bucket."""
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    if period == "all":
+        return ALL_TIME_BUCKET
+    return day
+
+
+def _bucket_step(period: str) -> timedelta:
+    return timedelta(weeks=1) if period == "week" else timedelta(days=1)
+
+
+async def fetch_summary(conn: asyncpg.Connection, user_id: str) -> list[dict]:
+    """All-time figures for a user (or '*' for the team), overall and per persona."""
+    rows = await conn.fetch(
+        f"""
+        SELECT persona_id, {ROLLUP_COLUMNS}
+        FROM score_rollups
+        WHERE user_id = $1 AND period = 'all' AND bucket = $2
+        ORDER BY persona_id
+        """,
+        user_id,
+        ALL_TIME_BUCKET,
+    )
+    return [dict(row) for row in rows]
+
+
+async def fetch_trend(
+    conn: asyncpg.Connection,
+    *,
+    user_id: str,
+    persona_id: str,
+    period: str,
+    buckets: int,
+    window: int,
+    today: Optional[date] = None,
+) -> list[dict]:
+    """Per-bucket averages for the last `buckets` days or weeks, oldest first.
+
+    Each bucket also carries rolling averages over the `window` buckets
+    ending at it, weighted by session count. Buckets with no scored
+    sessions are omitted. Reads at most buckets + window - 1 rollup rows.
+    """
+    step = _bucket_step(period)
+    since = bucket_start(period, today or date.today()) - step * (buckets - 1)
+
+    rows = await conn.fetch(
+        f"""
+        SELECT *
+        FROM (
+            SELECT bucket, {ROLLUP_COLUMNS}, {ROLLING_COLUMNS}
+            FROM score_rollups
+            WHERE user_id = $1 AND persona_id = $2 AND period = $3 AND bucket >= $4
+            WINDOW w AS (ORDER BY bucket RANGE BETWEEN $5::interval PRECEDING AND CURRENT ROW)
+        ) trend
+        WHERE bucket >= $6
+        ORDER BY bucket
+        """,
+        user_id,
+        persona_id,
+        period,
+        since - step * (window - 1),
+        step * (window - 1),
+        since,
+    )
+    return [dict(row) for row in rows]
+
+
+async def fetch_leaderboard(
+    conn: asyncpg.Connection,
+    *,
+    persona_id: str,
+    period: str,
+    bucket: date,
+    limit: int,
+    min_sessions: int,
+) -> list[dict]:
+    """Top users by average overall score within one bucket.
+
+    Served by idx_score_rollups_leaderboard, so only the top rows are read.
+    """
+    rows = await conn.fetch(
+        f"""
+        SELECT user_id, {ROLLUP_COLUMNS}
+        FROM score_rollups
+        WHERE persona_id = $1 AND period = $2 AND bucket = $3
+          AND user_id <> '*' AND sessions >= $4
+        ORDER BY overall_mean DESC, sessions DESC, user_id
+        LIMIT $5
+        """,
+        persona_id,
+        period,
+        bucket,
+        min_sessions,
+        limit,
+    )
+    return [{"rank": rank, **dict(row)} for rank, row in enumerate(rows, start=1)]
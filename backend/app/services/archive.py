@@ -0,0 +1,245 @@
+"""Monthly message partitions and their compressed cold archive.
+
+`messages` is range-partitioned on session_started_at (a copy of the
+session's started_at), one partition per month, so a session's turns
+always sit together in one partition. Lookups that pass the session's
+started_at along with its id only touch that partition.
+
+Partitions older than MESSAGES_HOT_MONTHS are moved out of Postgres into
+one gzip file per month under ARCHIVE_DIR. Each session's transcript is
+written as a separate gzip member (a JSON array of its turns), and
+message_archives records the file, byte offset and length for every
+archived session. Reading a transcript back is one seek and one small
+decompress, with no scan. The partition is then dropped, so table size
+and vacuum work stay proportional to the hot months only.
+"""
+import asyncio
+import gzip
+import json
+import os
+import re
+from datetime import date, datetime
+from typing import Optional
+
+import asyncpg
+
+from app.core.config import settings
+
+_PARTITION_NAME = re.compile(r"^messages_p(\d{4})_(\d{2})$")
+
+IS_PARTITIONED_SQL = """
+SELECT EXISTS (
+    SELECT 1 FROM pg_partitioned_table pt
+    JOIN pg_class c ON c.oid = pt.partrelid
+    WHERE c.relname = 'messages' AND c.relnamespace = 'public'::regnamespace
+)
+"""
+
+PARTITIONS_SQL = """
+SELECT child.relname
+FROM pg_inherits i
+JOIN pg_class parent ON parent.oid = i.inhparent
+JOIN pg_class child ON child.oid = i.inhrelid
+WHERE parent.relname = 'messages' AND parent.relnamespace = 'public'::regnamespace
+"""
+
+# Whole sessions, in the order their archive members are written
+PARTITION_ROWS_SQL = """
+SELECT session_id, id, role, content, turn_number, created_at
+FROM {partition}
+ORDER BY session_id, turn_number, role
+"""
+
+INSERT_ARCHIVE_ENTRIES_SQL = """
+INSERT INTO message_archives (session_id, archive_file, byte_offset, byte_length, message_count, archived_at)
+SELECT e.session_id, $1, e.byte_offset, e.byte_length, e.message_count, NOW()
+FROM unnest($2::uuid[], $3::bigint[], $4::int[], $5::int[])
+    AS e(session_id, byte_offset, byte_length, message_count)
+JOIN sessions s ON s.id = e.session_id
+ON CONFLICT (session_id) DO UPDATE SET
+    archive_file = EXCLUDED.archive_file,
+    byte_offset = EXCLUDED.byte_offset,
+    byte_length = EXCLUDED.byte_length,
+    message_count = EXCLUDED.message_count,
+    archived_at = NOW()
+"""
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def next_month(month: date) -> date:
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"messages_p{month.year:04d}_{month.month:02d}"
+
+
+def partition_month(name: str) -> Optional[date]:
+    match = _PARTITION_NAME.match(name)
+    return date(int(match[1]), int(match[2]), 1) if match else None
+
+
+async def is_partitioned(conn: asyncpg.Connection) -> bool:
+    return await conn.fetchval(IS_PARTITIONED_SQL)
+
+
+DEFAULT_ROWS_SQL = """
+SELECT EXISTS (
+    SELECT 1 FROM messages_default WHERE session_started_at >= $1 AND session_started_at < $2
+)
+"""
+
+# The month's rows that landed in messages_default before its partition existed
+STASH_DEFAULT_ROWS_SQL = """
+CREATE TEMP TABLE messages_moving ON COMMIT DROP AS
+WITH moved AS (
+    DELETE FROM messages_default WHERE session_started_at >= $1 AND session_started_at < $2
+    RETURNING id, session_id, session_started_at, role, content, turn_number, created_at
+)
+SELECT * FROM moved
+"""
+
+RESTORE_DEFAULT_ROWS_SQL = """
+INSERT INTO messages (id, session_id, session_started_at, role, content, turn_number, created_at)
+SELECT id, session_id, session_started_at, role, content, turn_number, created_at FROM messages_moving
+"""
+
+
+async def create_partition(conn: asyncpg.Connection, month: date) -> bool:
+    """Create the month's partition if it's missing. Returns whether it was created.
+
+    Rows for the month already in messages_default (written while the
+    partition was missing) are moved into it in the same transaction;
+    Postgres refuses the new partition while they sit in the default.
+    """
+    name = partition_name(month)
+    create_sql = f"CREATE TABLE {name} PARTITION OF messages FOR VALUES FROM ('{month}') TO ('{next_month(month)}')"
+    try:
+        async with conn.transaction():
+            if await conn.fetchval(DEFAULT_ROWS_SQL, month, next_month(month)):
+                # No new rows may reach the default until the month's have moved
+                await conn.execute("LOCK TABLE messages_default")
+                await conn.execute(STASH_DEFAULT_ROWS_SQL, month, next_month(month))
+                await conn.execute(create_sql)
+                moved = await conn.execute(RESTORE_DEFAULT_ROWS_SQL)
+                print(f"[ARCHIVE] Moved {moved.split()[-1]} messages from messages_default into {name}")
+            else:
+                await conn.execute(create_sql)
+    except asyncpg.DuplicateTableError:
+        return False
+    except asyncpg.CheckViolationError as e:
+        print(f"[ERROR] Could not create {name}: its rows in messages_default need moving by hand: {e}")
+        return False
+    return True
+
+
+async def ensure_partitions(conn: asyncpg.Connection, months_ahead: int, today: Optional[date] = None) -> list[str]:
+    """Make sure this month's and the next `months_ahead` months' partitions exist.
+
+    Returns the partitions created. Rows for a month with no partition land
+    in messages_default; a no-op on a database whose messages table hasn't
+    been migrated to partitions yet.
+    """
+    if not await is_partitioned(conn):
+        return []
+
+    existing = {row["relname"] for row in await conn.fetch(PARTITIONS_SQL)}
+    created = []
+    month = month_start(today or date.today())
+    for _ in range(months_ahead + 1):
+        if partition_name(month) not in existing and await create_partition(conn, month):
+            created.append(partition_name(month))
+        month = next_month(month)
+    return created
+
+
+async def archivable_partitions(conn: asyncpg.Connection, hot_months: int, today: Optional[date] = None) -> list[str]:
+    """Monthly partitions that ended more than `hot_months` months ago, oldest first."""
+    cutoff = month_start(today or date.today())
+    for _ in range(hot_months):
+        cutoff = date(cutoff.year - (cutoff.month == 1), (cutoff.month - 2) % 12 + 1, 1)
+
+    names = [row["relname"] for row in await conn.fetch(PARTITIONS_SQL)]
+    old = [(partition_month(name), name) for name in names if partition_month(name) is not None]
+    return [name for month, name in sorted(old) if month < cutoff]
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _write_member(f, turns: list[dict]) -> tuple[int, int]:
+    offset = f.tell()
+    f.write(gzip.compress(json.dumps(turns, default=_json_default, ensure_ascii=False).encode()))
+    return offset, f.tell() - offset
+
+
+async def archive_partition(conn: asyncpg.Connection, partition: str, archive_dir: str) -> tuple[int, int]:
+    """Write a partition's sessions to the archive, index them and drop the partition.
+
+    The file is written under a temporary name and renamed once synced,
+    and the index rows, DETACH and DROP commit together, so an
+    interrupted run leaves the partition in place and can simply be
+    repeated. Returns (sessions, messages) archived.
+    """
+    if partition_month(partition) is None:
+        raise ValueError(f"Not a monthly messages partition: {partition}")
+
+    os.makedirs(archive_dir, exist_ok=True)
+    file_name = f"{partition}.jsonl.gz"
+    path = os.path.join(archive_dir, file_name)
+    entries: tuple[list, list, list, list] = ([], [], [], [])
+    messages = 0
+
+    with open(path + ".tmp", "wb") as f:
+        session_id, turns = None, []
+
+        def flush() -> None:
+            offset, length = _write_member(f, turns)
+            for column, value in zip(entries, (session_id, offset, length, len(turns))):
+                column.append(value)
+
+        async with conn.transaction(readonly=True):
+            async for row in conn.cursor(PARTITION_ROWS_SQL.format(partition=partition), prefetch=1000):
+                if row["session_id"] != session_id:
+                    if turns:
+                        flush()
+                    session_id, turns = row["session_id"], []
+                turns.append({
+                    "id": row["id"],
+                    "session_id": row["session_id"],
+                    "role": row["role"],
+                    "content": row["content"],
+                    "turn_number": row["turn_number"],
+                    "created_at": row["created_at"],
+                })
+                messages += 1
+        if turns:
+            flush()
+
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+
+    async with conn.transaction():
+        await conn.execute(INSERT_ARCHIVE_ENTRIES_SQL, file_name, *entries)
+        await conn.execute(f"ALTER TABLE messages DETACH PARTITION {partition}")
+        await conn.execute(f"DROP TABLE {partition}")
+
+    return len(entries[0]), messages
+
+
+def read_archived_transcript(archive_file: str, byte_offset: int, byte_length: int) -> list[dict]:
+    """One session's turns from the archive (blocking; see load_archived_transcript)."""
+    with open(os.path.join(settings.ARCHIVE_DIR, archive_file), "rb") as f:
+        f.seek(byte_offset)
+        return json.loads(gzip.decompress(f.read(byte_length)))
+
+
+async def load_archived_transcript(archive_file: str, byte_offset: int, byte_length: int) -> list[dict]:
+    return await asyncio.to_thread(read_archived_transcript, archive_file, byte_offset, byte_length)
@@ -0,0 +1,40 @@
+"""Process setup shared by the batch CLIs (rescore.py, replay.py)."""
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, Optional
+
+from app.core.config import settings
+from app.core.database import close_pool
+from app.services import admission, llm
+
+
+@asynccontextmanager
+async def batch_tool(
+    db_connections: int,
+    concurrency: int,
+    fake_latency: Optional[float] = None,
+) -> AsyncGenerator[None, None]:
+    """Size this process's DB pool and model slots for a batch run, and close them after.
+
+    Enter before the first query or model call: get_pool() reads DB_POOL_*
+    when it creates the pool, and get_limiter() reads LLM_MAX_CONCURRENCY
+    and LLM_RESERVED_* when it creates the limiter. With `fake_latency`,
+    model calls go to bench.fake_llm instead of the API.
+    """
+    settings.DB_POOL_MIN_SIZE = 1
+    settings.DB_POOL_MAX_SIZE = db_connections
+    settings.LLM_MAX_CONCURRENCY = concurrency
+    if settings.LLM_ADMISSION_BACKEND == "local":
+        # No live traffic in this process to keep slots free for
+        settings.LLM_RESERVED_LIVE = settings.LLM_RESERVED_SCORING = 0
+
+    if fake_latency is not None:
+        from bench.fake_llm import FakeAsyncAnthropic
+
+        llm.set_client(FakeAsyncAnthropic(latency=fake_latency, tokens_per_second=1000))
+
+    try:
+        yield
+    finally:
+        await llm.close_client()
+        await admission.close_limiter()
+        await close_pool()
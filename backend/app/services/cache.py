@@ -0,0 +1,52 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Optional
+
+
+class Cache(ABC):
+    """Async key/value cache interface.
+
+    The in-process LRUCache is the default; a shared backend (Redis,
+    memcached, ...) can be plugged in by implementing these three methods.
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: Any) -> None:
+        ...
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        ...
+
+
+class LRUCache(Cache):
+    """In-process cache holding at most `maxsize` entries, least recently used evicted first."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: OrderedDict[str, Any] = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Any]:
+        try:
+            self._data.move_to_end(key)
+        except KeyError:
+            return None
+        return self._data[key]
+
+    async def set(self, key: str, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    async def delete(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -0,0 +1,205 @@
+"""Server-side conversation state for /respond.
+
+With a session_id, /respond keeps the call's history here instead of
+taking it from the client each turn. Conversations live in a Cache (the
+in-process LRU by default, or a shared backend via
+set_conversation_cache) and are rebuilt from the messages table on a
+miss. Turns are persisted to messages as they happen.
+
+Once the kept turns grow past RESPOND_HISTORY_TOKEN_BUDGET, the oldest
+exchanges are folded into a running summary by a background call, so the
+prompt for each turn stays roughly the same size however long the call
+runs.
+"""
+import asyncio
+import json
+from typing import Optional
+
+from app.core.config import settings
+from app.core.database import get_db_connection
+from app.models.session import MessageRequest
+from app.services import admission, llm
+from app.services.cache import Cache, LRUCache
+from app.services.messages import insert_session_messages, message_buffer
+from prompts import CONVERSATION_SUMMARY_PROMPT
+
+LOAD_CONVERSATION_SQL = """
+SELECT s.persona_id, s.status, COALESCE((
+    SELECT json_agg(json_build_object('role', m.role, 'content', m.content, 'turn_number', m.turn_number)
+                    ORDER BY m.turn_number, m.role)
+    FROM messages m
+    WHERE m.session_id = s.id AND m.session_started_at = s.started_at
+), '[]'::json)::text AS turns
+FROM sessions s
+WHERE s.id = $1
+"""
+
+conversation_cache: Cache = LRUCache(settings.CONVERSATION_CACHE_SIZE)
+
+# Summary calls in flight in this process, by session.
+_compacting: dict[str, asyncio.Task] = {}
+
+
+def set_conversation_cache(cache: Cache) -> None:
+    global conversation_cache
+    conversation_cache = cache
+
+
+class ConversationClosedError(ValueError):
+    """The session has ended; /respond can't add turns to it."""
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token)."""
+    return len(text) // 4 + 1
+
+
+def _history_tokens(turns: list[dict]) -> int:
+    return sum(estimate_tokens(turn["content"]) for turn in turns)
+
+
+async def load_conversation(session_id: str) -> Optional[dict]:
+    """Return the session's conversation, rebuilding it from messages on a miss.
+
+    Returns None if the session doesn't exist; raises
+    ConversationClosedError if it is no longer in progress.
+    """
+    conversation = await conversation_cache.get(session_id)
+    if conversation is not None:
+        return conversation
+
+    # Turns posted through the buffer must be in the table first
+    await message_buffer.flush()
+
+    async with get_db_connection() as conn:
+        row = await conn.fetchrow(LOAD_CONVERSATION_SQL, session_id)
+
+    if row is None:
+        return None
+    if row["status"] != "in_progress":
+        raise ConversationClosedError(f"Session '{session_id}' has ended")
+
+    turns = json.loads(row["turns"])
+    return {
+        "session_id": session_id,
+        "persona_id": row["persona_id"],
+        "summary": "",
+        "turns": turns,
+        "next_turn": max((turn["turn_number"] for turn in turns), default=0) + 1,
+    }
+
+
+async def forget_conversation(session_id: str) -> None:
+    """Drop the cached conversation, e.g. once the session has ended."""
+    await conversation_cache.delete(session_id)
+
+
+def new_turn(conversation: dict, role: str, content: str, turn_number: Optional[int] = None) -> dict:
+    """A turn numbered after the conversation's last one unless `turn_number` is given."""
+    return {"role": role, "content": content, "turn_number": turn_number or conversation["next_turn"]}
+
+
+def build_prompt(conversation: dict, persona_prompt: str, pending: list[dict]) -> tuple[list[dict], list[dict]]:
+    """System blocks and Claude messages for the reply to `pending` turns.
+
+    The persona prompt stays the first, cached system block; the summary of
+    compacted turns follows it. Consecutive same-role turns are merged so
+    the messages alternate as the API requires.
+    """
+    system = llm.cached_system(persona_prompt)
+    if conversation["summary"]:
+        system.append({
+            "type": "text",
+            "text": f"What has happened earlier in this call:\n{conversation['summary']}",
+        })
+
+    messages = []
+    for turn in [*conversation["turns"], *pending]:
+        role = "user" if turn["role"] == "advisor" else "assistant"
+        if messages and messages[-1]["role"] == role:
+            messages[-1]["content"] += "\n" + turn["content"]
+        elif messages or role == "user":
+            messages.append({"role": role, "content": turn["content"]})
+
+    return system, llm.with_cache_breakpoint(messages)
+
+
+async def record_turns(conversation: dict, new_turns: list[dict]) -> None:
+    """Add turns to the conversation, persist them and compact if needed.
+
+    Called once the reply has been generated, so a failed model call
+    leaves no half-recorded exchange behind.
+    """
+    conversation["turns"].extend(new_turns)
+    conversation["next_turn"] = max(conversation["next_turn"], *(t["turn_number"] + 1 for t in new_turns))
+    await conversation_cache.set(conversation["session_id"], conversation)
+
+    if settings.MESSAGE_BUFFER_ENABLED:
+        for turn in new_turns:
+            message_buffer.add(conversation["session_id"], turn["role"], turn["content"], turn["turn_number"])
+    else:
+        async with get_db_connection() as conn:
+            await insert_session_messages(
+                conn, conversation["session_id"], [MessageRequest(**turn) for turn in new_turns]
+            )
+
+    session_id = conversation["session_id"]
+    if _history_tokens(conversation["turns"]) > settings.RESPOND_HISTORY_TOKEN_BUDGET and session_id not in _compacting:
+        _compacting[session_id] = asyncio.create_task(_compact(session_id))
+
+
+def _turns_to_fold(turns: list[dict]) -> int:
+    """How many leading turns to summarize.
+
+    Folds until what is left fits in half the budget (so compaction doesn't
+    run again on the very next turn), always keeping the latest exchange
+    and cutting before an advisor turn so the kept history starts with one.
+    """
+    target = settings.RESPOND_HISTORY_TOKEN_BUDGET // 2
+    remaining = _history_tokens(turns)
+    count = 0
+    while count < len(turns) - 2 and remaining > target:
+        remaining -= estimate_tokens(turns[count]["content"])
+        count += 1
+    while 0 < count < len(turns) and turns[count]["role"] != "advisor":
+        count += 1
+    return count if count < len(turns) else 0
+
+
+async def _compact(session_id: str) -> None:
+    try:
+        conversation = await conversation_cache.get(session_id)
+        if conversation is None:
+            return
+
+        count = _turns_to_fold(conversation["turns"])
+        if count == 0:
+            return
+
+        folded = conversation["turns"][:count]
+        transcript = "\n".join(
+            f"{'Advisor' if turn['role'] == 'advisor' else 'Prospect'}: {turn['content']}" for turn in folded
+        )
+        previous = f"Summary so far:\n{conversation['summary']}\n\n" if conversation["summary"] else ""
+
+        response = await llm.create_message(
+            max_tokens=300,
+            system=CONVERSATION_SUMMARY_PROMPT,
+            messages=[{"role": "user", "content": f"{previous}Turns to add:\n{transcript}"}],
+            timeout=settings.LLM_RESPOND_TIMEOUT,
+            label="compact",
+            persona=conversation["persona_id"],
+            priority=admission.SCORING,
+        )
+        summary = response.content[0].text.strip()
+
+        # Apply to the latest state; turns may have been added meanwhile
+        conversation = await conversation_cache.get(session_id) or conversation
+        last_folded = folded[-1]["turn_number"]
+        conversation["turns"] = [turn for turn in conversation["turns"] if turn["turn_number"] > last_folded]
+        conversation["summary"] = summary
+        await conversation_cache.set(session_id, conversation)
+    except Exception as e:
+        print(f"[ERROR] Compacting conversation {session_id} failed: {e}")
+    finally:
+        _compacting.pop(session_id, None)
@@ -0,0 +1,272 @@
+"""Streaming export of sessions with their transcripts and scorecards.
+
+Sessions are exported oldest first in chunks of EXPORT_CHUNK_SESSIONS,
+keyed on (started_at, id). Each chunk is read through a server-side
+cursor on a connection held only while that chunk is read. Rows are
+encoded, and compressed if asked, as they arrive. The connection is
+released before the chunk is sent, so a slow client never pins a pooled
+connection. Memory stays at one encoded chunk however large the export.
+
+Formats:
+
+- jsonl: one line per session with its scorecard and `messages`.
+- csv, table=sessions: one row per session, scorecard columns inline.
+- csv, table=messages: one row per transcript turn.
+
+Because the order is stable and new sessions sort last, an export is
+resumed (or continued incrementally, e.g. a nightly CRM sync) by passing
+the id of the last session fully received as `after`.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime, timedelta
+from typing import AsyncGenerator, Optional
+
+import asyncpg
+
+from app.core.config import settings
+from app.core.database import get_db_connection
+from app.services.archive import load_archived_transcript
+from app.services.messages import message_buffer
+from app.services.sessions import json_default
+
+FORMATS = ("jsonl", "csv")
+CSV_TABLES = ("sessions", "messages")
+
+SCORECARD_COLUMNS = (
+    "overall_score",
+    "opener_score",
+    "opener_feedback",
+    "objection_handling_score",
+    "objection_handling_feedback",
+    "tone_confidence_score",
+    "tone_confidence_feedback",
+    "close_attempt_score",
+    "close_attempt_feedback",
+    "best_moment",
+    "biggest_mistake",
+    "what_to_say_instead",
+    "meeting_booked",
+)
+
+SESSION_COLUMNS = ("id", "user_id", "persona_id", "conversation_id", "started_at", "ended_at", "status")
+
+MESSAGE_COLUMNS = ("session_id", "user_id", "persona_id", "turn_number", "role", "content", "created_at")
+
+# The chunk's sessions; {conditions} always includes the keyset bound
+SESSION_CHUNK_SQL = """
+SELECT s.*
+FROM sessions s
+WHERE {conditions}
+ORDER BY s.started_at, s.id
+LIMIT ${limit}
+"""
+
+# One JSON document per session, built in Postgres like GET /sessions/{id}
+JSONL_CHUNK_SQL = """
+SELECT s.id, s.started_at, json_build_object(
+    'id', s.id,
+    'user_id', s.user_id,
+    'persona_id', s.persona_id,
+    'conversation_id', s.conversation_id,
+    'started_at', s.started_at,
+    'ended_at', s.ended_at,
+    'status', s.status,
+    'metrics', s.call_metrics,
+    'scorecard', (
+        SELECT json_build_object({scorecard_fields})
+        FROM scorecards sc
+        WHERE sc.session_id = s.id
+    ),
+    'messages', COALESCE((
+        SELECT json_agg(json_build_object(
+            'turn_number', m.turn_number,
+            'role', m.role,
+            'content', m.content,
+            'created_at', m.created_at
+        ) ORDER BY m.turn_number, m.role)
+        FROM messages m
+        WHERE m.session_id = s.id AND m.session_started_at = s.started_at
+    ), '[]'::json)
+)::text AS body,
+a.archive_file, a.byte_offset, a.byte_length
+FROM ({sessions}) s
+LEFT JOIN message_archives a ON a.session_id = s.id
+ORDER BY s.started_at, s.id
+"""
+
+SESSIONS_CSV_CHUNK_SQL = """
+SELECT {session_columns}, {scorecard_columns}
+FROM ({sessions}) s
+LEFT JOIN scorecards sc ON sc.session_id = s.id
+ORDER BY s.started_at, s.id
+"""
+
+# Archived sessions come back as a single row with no message columns
+MESSAGES_CSV_CHUNK_SQL = """
+SELECT s.id, s.started_at, s.user_id, s.persona_id,
+       a.archive_file, a.byte_offset, a.byte_length,
+       m.turn_number, m.role, m.content, m.created_at
+FROM ({sessions}) s
+LEFT JOIN message_archives a ON a.session_id = s.id
+LEFT JOIN messages m ON m.session_id = s.id AND m.session_started_at = s.started_at
+ORDER BY s.started_at, s.id, m.turn_number, m.role
+"""
+
+
+class ExportCursorError(ValueError):
+    """The `after` session to resume from doesn't exist."""
+
+
+def export_sql(export_format: str, table: str, sessions_sql: str) -> str:
+    if export_format == "jsonl":
+        return JSONL_CHUNK_SQL.format(
+            scorecard_fields=", ".join(f"'{column}', sc.{column}" for column in SCORECARD_COLUMNS),
+            sessions=sessions_sql,
+        )
+    if table == "sessions":
+        return SESSIONS_CSV_CHUNK_SQL.format(
+            session_columns=", ".join(f"s.{column}" for column in SESSION_COLUMNS),
+            scorecard_columns=", ".join(f"sc.{column}" for column in SCORECARD_COLUMNS),
+            sessions=sessions_sql,
+        )
+    return MESSAGES_CSV_CHUNK_SQL.format(sessions=sessions_sql)
+
+
+def csv_header(table: str) -> tuple[str, ...]:
+    return SESSION_COLUMNS + SCORECARD_COLUMNS if table == "sessions" else MESSAGE_COLUMNS
+
+
+def _csv_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+class ChunkWriter:
+    """Encodes rows for one chunk, compressing across chunks when gzip is on."""
+
+    def __init__(self, export_format: str, table: str, compress: bool):
+        self.export_format = export_format
+        self.table = table
+        self._compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if compress else None
+        self._text = io.StringIO()
+        self._csv = csv.writer(self._text)
+        self._out = bytearray()
+
+    def _drain_text(self) -> None:
+        data = self._text.getvalue().encode()
+        self._text.seek(0)
+        self._text.truncate()
+        self._out += self._compressor.compress(data) if self._compressor else data
+
+    def header(self) -> None:
+        if self.export_format == "csv":
+            self._csv.writerow(csv_header(self.table))
+
+    async def row(self, row: asyncpg.Record) -> None:
+        if self.export_format == "jsonl":
+            body = row["body"]
+            if row["archive_file"] is not None:
+                session = json.loads(body)
+                session["messages"] = await _archived_turns(row)
+                body = json.dumps(session, default=json_default, ensure_ascii=False)
+            self._text.write(body)
+            self._text.write("\n")
+        elif self.table == "sessions":
+            self._csv.writerow([_csv_value(value) for value in row.values()])
+        elif row["turn_number"] is not None:
+            self._csv.writerow(
+                [str(row["id"]), row["user_id"], row["persona_id"], row["turn_number"], row["role"], row["content"],
+                 _csv_value(row["created_at"])]
+            )
+        elif row["archive_file"] is not None:
+            for turn in await _archived_turns(row):
+                self._csv.writerow(
+                    [str(row["id"]), row["user_id"], row["persona_id"], turn["turn_number"], turn["role"],
+                     turn["content"], turn["created_at"]]
+                )
+
+        # Keep text small; the chunk is held compressed when gzip is on
+        if self._text.tell() >= 64 * 1024:
+            self._drain_text()
+
+    def take(self, final: bool = False) -> bytes:
+        """The encoded bytes so far; flushed so the client can decode them as they arrive."""
+        self._drain_text()
+        if self._compressor:
+            self._out += self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+        data, self._out = bytes(self._out), bytearray()
+        return data
+
+
+async def _archived_turns(row: asyncpg.Record) -> list[dict]:
+    turns = await load_archived_transcript(row["archive_file"], row["byte_offset"], row["byte_length"])
+    return [
+        {"turn_number": t["turn_number"], "role": t["role"], "content": t["content"], "created_at": t["created_at"]}
+        for t in sorted(turns, key=lambda t: (t["turn_number"], t["role"]))
+    ]
+
+
+async def resume_position(conn: asyncpg.Connection, after: str) -> tuple[datetime, str]:
+    started_at = await conn.fetchval("SELECT started_at FROM sessions WHERE id = $1", after)
+    if started_at is None:
+        raise ExportCursorError(f"Session '{after}' not found")
+    return started_at, after
+
+
+async def stream_export(
+    export_format: str,
+    *,
+    table: str = "sessions",
+    user_id: Optional[str] = None,
+    persona_id: Optional[str] = None,
+    status: Optional[str] = None,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    after: Optional[tuple[datetime, str]] = None,
+    compress: bool = False,
+) -> AsyncGenerator[bytes, None]:
+    """Yield the export chunk by chunk, starting after the `after` (started_at, id) position."""
+    args: list = []
+    conditions = []
+    for column, value in (("s.user_id", user_id), ("s.persona_id", persona_id), ("s.status", status)):
+        if value is not None:
+            args.append(value)
+            conditions.append(f"{column} = ${len(args)}")
+    if since is not None:
+        args.append(since)
+        conditions.append(f"s.started_at >= ${len(args)}::date")
+    if until is not None:
+        args.append(until + timedelta(days=1))
+        conditions.append(f"s.started_at < ${len(args)}::date")
+
+    # Keyset bound and chunk size are always the last three arguments
+    conditions.append(f"(s.started_at, s.id) > (${len(args) + 1}, ${len(args) + 2}::uuid)")
+    sessions_sql = SESSION_CHUNK_SQL.format(conditions=" AND ".join(conditions), limit=len(args) + 3)
+    sql = export_sql(export_format, table, sessions_sql)
+
+    # Turns for live sessions may still be in the write buffer
+    await message_buffer.flush()
+
+    writer = ChunkWriter(export_format, table, compress)
+    writer.header()
+    position = after or (datetime.min, "00000000-0000-0000-0000-000000000000")
+    chunk_size = settings.EXPORT_CHUNK_SESSIONS
+
+    while True:
+        sessions = 0
+        async with get_db_connection() as conn:
+            async with conn.transaction(readonly=True):
+                async for row in conn.cursor(sql, *args, *position, chunk_size, prefetch=settings.EXPORT_PREFETCH):
+                    if (row["started_at"], str(row["id"])) != position:
+                        sessions += 1
+                        position = (row["started_at"], str(row["id"]))
+                    await writer.row(row)
+
+        if sessions < chunk_size:
+            yield writer.take(final=True)
+            return
+        yield writer.take()
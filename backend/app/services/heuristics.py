@@ -0,0 +1,136 @@
+"""Instant transcript metrics, computed in-process without a model call.
+
+For each call: how much of the talking the advisor did, how many
+questions they asked, which of the persona's objections came up and got
+an answer, how often they tried to close, and their filler-word rate.
+The metrics are stored with the session when the call ends (so
+dashboards have them before the scorecard lands), and the scoring
+message includes them as evidence for the model.
+
+A call with fewer than SCORING_MIN_ADVISOR_TURNS advisor turns is too
+short to evaluate. SCORING_PROMPT scores such calls 0 across the board,
+so they get that scorecard locally instead of a model call.
+"""
+import re
+from functools import lru_cache
+
+from app.core.config import settings
+
+# Bump when the metrics or their wording in the scoring message change;
+# it is part of SCORING_PROMPT_VERSION, so cached scorecards are redone.
+FEATURES_VERSION = "1"
+
+TOO_SHORT_FEEDBACK = "Call ended too early to evaluate."
+
+_WORD = re.compile(r"[a-z0-9']+")
+_QUESTION = re.compile(r"\?+")
+_FILLER = re.compile(r"\b(?:u+m+|u+h+|e+r+m*|hmm+|basically|literally|honestly|you know|i mean|kind of|sort of)\b")
+_CLOSE = re.compile(
+    r"\b(?:meet(?:ing)?|schedul\w*|calendar|book\w* (?:a|some) (?:time|call)|set up (?:a|some) (?:call|time)"
+    r"|follow[- ]up|next (?:week|monday|tuesday|wednesday|thursday|friday)"
+    r"|(?:are|would|could) you (?:be )?(?:open|free|available)|coffee|(?:15|20|30|fifteen|twenty|thirty) minutes)\b"
+)
+
+# Words too common to tell one objection from another
+_STOPWORDS = frozenset("""
+a an and are as at be been but by can could did do does don't for from get got had has have how i i'm i've
+if in is it it's just me my of on or so that the this to was we what what's with you your
+""".split())
+
+
+@lru_cache(maxsize=64)
+def _objection_keywords(objections: tuple[str, ...]) -> tuple[tuple[str, frozenset], ...]:
+    """Each objection with the words a prospect line must share with it to count as raising it."""
+    keywords = []
+    for objection in objections:
+        words = frozenset(w for w in _WORD.findall(objection.lower()) if w not in _STOPWORDS and len(w) > 2)
+        if words:
+            keywords.append((objection, words))
+    return tuple(keywords)
+
+
+def _persona_objections(persona: dict) -> tuple[tuple[str, frozenset], ...]:
+    return _objection_keywords((persona["main_objection"], *persona.get("secondary_objections", ())))
+
+
+def analyze_transcripts(calls: list[tuple[list, dict]]) -> list[dict]:
+    """Metrics for a batch of (turns, persona) pairs, in order.
+
+    Turns are dicts with `role` and `content`. Patterns are compiled once
+    and each persona's objection keywords once, however many calls share it.
+    """
+    results = []
+    for turns, persona in calls:
+        objections = _persona_objections(persona)
+        advisor_turns = prospect_turns = advisor_words = prospect_words = 0
+        questions = close_attempts = fillers = 0
+        raised: dict[str, bool] = {}
+
+        for turn in turns:
+            text = turn["content"].lower()
+            words = len(_WORD.findall(text))
+            if turn["role"] == "advisor":
+                advisor_turns += 1
+                advisor_words += words
+                questions += len(_QUESTION.findall(text))
+                close_attempts += bool(_CLOSE.search(text))
+                fillers += len(_FILLER.findall(text))
+                # Objections raised so far now have an advisor reply
+                for objection in raised:
+                    raised[objection] = True
+            else:
+                prospect_turns += 1
+                prospect_words += words
+                spoken = set(_WORD.findall(text))
+                for objection, keywords in objections:
+                    if objection not in raised and len(keywords & spoken) >= min(2, len(keywords)):
+                        raised[objection] = False
+
+        total_words = advisor_words + prospect_words
+        results.append({
+            "advisor_turns": advisor_turns,
+            "prospect_turns": prospect_turns,
+            "advisor_words": advisor_words,
+            "prospect_words": prospect_words,
+            "talk_ratio": round(advisor_words / total_words, 3) if total_words else 0.0,
+            "questions": questions,
+            "objections_raised": list(raised),
+            "objections_answered": sum(raised.values()),
+            "close_attempts": close_attempts,
+            "filler_rate": round(100 * fillers / advisor_words, 2) if advisor_words else 0.0,
+            "too_short": advisor_turns < settings.SCORING_MIN_ADVISOR_TURNS,
+        })
+    return results
+
+
+def analyze_transcript(turns: list, persona: dict) -> dict:
+    return analyze_transcripts([(turns, persona)])[0]
+
+
+def too_short_scorecard() -> dict:
+    """The scorecard SCORING_PROMPT asks for when a call is too short to evaluate."""
+    category = {"score": 0, "feedback": TOO_SHORT_FEEDBACK}
+    return {
+        "overall_score": 0,
+        "opener": dict(category),
+        "objection_handling": dict(category),
+        "tone_and_confidence": dict(category),
+        "close_attempt": dict(category),
+        "best_moment": TOO_SHORT_FEEDBACK,
+        "biggest_mistake": "The call ended before the conversation got going.",
+        "what_to_say_instead": "Stay on the line past the opener and ask a question that earns the next minute.",
+        "meeting_booked": False,
+    }
+
+
+def describe_metrics(call_metrics: dict) -> str:
+    """The metrics as lines for the scoring message."""
+    raised = call_metrics["objections_raised"]
+    return "\n".join([
+        f"- Advisor share of words spoken: {call_metrics['talk_ratio']:.0%}",
+        f"- Questions asked by the advisor: {call_metrics['questions']}",
+        f"- Persona objections raised: {len(raised)}" + (f" ({'; '.join(raised)})" if raised else "")
+        + f", answered: {call_metrics['objections_answered']}",
+        f"- Advisor turns attempting to close: {call_metrics['close_attempts']}",
+        f"- Filler words per 100 advisor words: {call_metrics['filler_rate']}",
+    ])
@@ -0,0 +1,273 @@
+"""Running per-session evaluation, updated while the call is still going.
+
+Each time a prospect reply lands, the session is re-evaluated in the
+background from its previous evaluation plus only the turns since, and
+the result is stored in session_evaluations. When the call ends, the
+scoring worker brings the evaluation up to date (usually nothing is left
+to do) and turns it into the scorecard locally instead of scoring the
+whole transcript from scratch.
+"""
+import asyncio
+import json
+from typing import Optional
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.database import get_db_connection
+from app.models.session import ScorecardData
+from app.services import admission, llm
+from app.services.messages import message_buffer
+from app.services.scoring import (
+    SCORECARD_TOOL,
+    build_transcript_text,
+    find_tool_input,
+    flatten_scorecard,
+    salvage_scorecard,
+)
+from personas import PERSONAS
+from prompts import LIVE_EVALUATION_PROMPT, SCORING_PROMPT
+
+# The scoring rubric followed by the live instructions, one cacheable prefix.
+LIVE_EVALUATION_SYSTEM = llm.cached_system(f"{SCORING_PROMPT}\n\n{LIVE_EVALUATION_PROMPT}")
+
+# The scorecard shape plus running notes on each objection raised so far.
+EVALUATION_TOOL = {
+    "name": "update_evaluation",
+    "description": "Record the evaluation of the call so far.",
+    "input_schema": {
+        **SCORECARD_TOOL["input_schema"],
+        "properties": {
+            **SCORECARD_TOOL["input_schema"]["properties"],
+            "objections": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "turn": {"type": "integer"},
+                        "objection": {"type": "string"},
+                        "handled_well": {"type": "boolean"},
+                        "note": {"type": "string"},
+                    },
+                    "required": ["objection", "handled_well", "note"],
+                },
+            },
+        },
+    },
+}
+EVALUATION_TOOL_CHOICE = {"type": "tool", "name": EVALUATION_TOOL["name"]}
+
+# The session's stored evaluation and the turns it hasn't seen yet. While
+# the call is live only turns up to the latest prospect reply are taken,
+# so an advisor line is never evaluated without its answer.
+PENDING_TURNS_SQL = """
+SELECT s.persona_id,
+       COALESCE(e.through_turn, 0) AS through_turn,
+       COALESCE(e.messages_seen, 0) AS messages_seen,
+       e.state::text AS state,
+       (
+           SELECT json_agg(json_build_object('role', m.role, 'content', m.content, 'turn_number', m.turn_number)
+                           ORDER BY m.turn_number, m.role)
+           FROM messages m
+           WHERE m.session_id = s.id AND m.session_started_at = s.started_at
+             AND m.turn_number > COALESCE(e.through_turn, 0)
+             AND ($2 OR m.turn_number <= (
+                 SELECT max(turn_number) FROM messages
+                 WHERE session_id = s.id AND session_started_at = s.started_at AND role = 'prospect'
+             ))
+       )::text AS turns,
+       (
+           SELECT count(*) FROM messages m
+           WHERE m.session_id = s.id AND m.session_started_at = s.started_at
+       ) AS message_count
+FROM sessions s
+LEFT JOIN session_evaluations e ON e.session_id = s.id
+WHERE s.id = $1
+"""
+
+# Evaluations only move forward: each one covers every turn up to its
+# through_turn, so a concurrent update that covers more always wins.
+SAVE_EVALUATION_SQL = """
+INSERT INTO session_evaluations (session_id, through_turn, messages_seen, state, updated_at)
+VALUES ($1, $2, $3, $4::jsonb, NOW())
+ON CONFLICT (session_id) DO UPDATE SET
+    through_turn = EXCLUDED.through_turn,
+    messages_seen = EXCLUDED.messages_seen,
+    state = EXCLUDED.state,
+    updated_at = NOW()
+WHERE session_evaluations.through_turn < EXCLUDED.through_turn
+"""
+
+
+def build_update_message(persona: dict, state: Optional[dict], through_turn: int, turns: list) -> str:
+    evaluation = (
+        f"Evaluation so far (through turn {through_turn}):\n{json.dumps(state)}"
+        if state is not None
+        else "Evaluation so far: none, the call just started."
+    )
+    return f"""Prospect persona: {persona['name']} — {persona['age']}-year-old {persona['occupation']}, {persona['portfolio_value']} portfolio at {persona['current_provider']}, difficulty: {persona['difficulty']}.
+
+{evaluation}
+
+New turns:
+{build_transcript_text(turns, persona)}
+Update the evaluation now."""
+
+
+async def update_evaluation(session_id: str, final: bool = False) -> Optional[dict]:
+    """Fold the session's unevaluated turns into its stored evaluation.
+
+    With `final`, every stored turn is taken (the call is over). Returns a
+    dict with the evaluation state and whether it covers every stored
+    message, or None if the session doesn't exist.
+    """
+    async with get_db_connection() as conn:
+        row = await conn.fetchrow(PENDING_TURNS_SQL, session_id, final)
+
+    if row is None:
+        return None
+
+    state = json.loads(row["state"]) if row["state"] is not None else None
+    turns = json.loads(row["turns"]) if row["turns"] is not None else []
+    messages_seen = row["messages_seen"]
+
+    # Until the call is long enough to be scored by the model there is
+    # nothing to evaluate; a call that ends here is scored 0 locally
+    if state is None and sum(turn["role"] == "advisor" for turn in turns) < settings.SCORING_MIN_ADVISOR_TURNS:
+        turns = []
+
+    persona = PERSONAS.get(row["persona_id"])
+    if turns and persona is not None:
+        response = await llm.create_message(
+            max_tokens=1024,
+            system=LIVE_EVALUATION_SYSTEM,
+            messages=[{
+                "role": "user",
+                "content": build_update_message(persona, state, row["through_turn"], turns),
+            }],
+            timeout=settings.LLM_SCORE_TIMEOUT,
+            label="live_scoring",
+            persona=row["persona_id"],
+            tools=[EVALUATION_TOOL],
+            tool_choice=EVALUATION_TOOL_CHOICE,
+            priority=admission.SCORING,
+        )
+        update = find_tool_input(response, EVALUATION_TOOL["name"])
+        if update is None:
+            metrics.LIVE_SCORING.inc(event="bad_update")
+            return {"state": state, "complete": False}
+
+        state = update
+        messages_seen += len(turns)
+        async with get_db_connection() as conn:
+            await conn.execute(
+                SAVE_EVALUATION_SQL,
+                session_id,
+                max(turn["turn_number"] for turn in turns),
+                messages_seen,
+                json.dumps(state),
+            )
+        metrics.LIVE_SCORING.inc(event="updated")
+
+    return {"state": state, "complete": state is not None and messages_seen == row["message_count"]}
+
+
+async def final_scorecard(session_id: str) -> Optional[ScorecardData]:
+    """Consolidate the running evaluation into the session's scorecard.
+
+    Returns None when there is no usable evaluation covering the whole
+    transcript (e.g. turns arrived out of order), so the caller falls back
+    to scoring the full transcript.
+    """
+    try:
+        evaluation = await update_evaluation(session_id, final=True)
+        if evaluation is None or not evaluation["complete"]:
+            metrics.LIVE_SCORING.inc(event="fallback")
+            return None
+
+        scorecard_json, _ = salvage_scorecard(evaluation["state"])
+    except Exception as e:
+        print(f"[WARN] Live evaluation of {session_id} unusable, scoring full transcript: {e}")
+        metrics.LIVE_SCORING.inc(event="fallback")
+        return None
+
+    metrics.LIVE_SCORING.inc(event="consolidated")
+    return flatten_scorecard(scorecard_json)
+
+
+class LiveEvaluator:
+    """Debounced background re-evaluation of sessions with new turns.
+
+    notify() marks a session dirty; every `debounce` seconds the dirty
+    sessions are updated, at most `concurrency` at a time and never the
+    same session twice at once.
+    """
+
+    def __init__(self, debounce: float, concurrency: int):
+        self.debounce = debounce
+        self._semaphore = asyncio.Semaphore(max(concurrency, 1))
+        self._dirty: set[str] = set()
+        self._running: set[str] = set()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def notify(self, session_id: str) -> None:
+        self._dirty.add(session_id)
+        self._wakeup.set()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        tasks: set[asyncio.Task] = set()
+        try:
+            while True:
+                await self._wakeup.wait()
+                await asyncio.sleep(self.debounce)
+                self._wakeup.clear()
+
+                ready = self._dirty - self._running
+                self._dirty -= ready
+                if not ready:
+                    continue
+
+                # Turns posted through the buffer must be in the table first
+                try:
+                    await message_buffer.flush()
+                except Exception as e:
+                    print(f"[ERROR] Live scoring could not flush messages: {e}")
+
+                for session_id in ready:
+                    self._running.add(session_id)
+                    task = asyncio.create_task(self._update(session_id))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _update(self, session_id: str) -> None:
+        try:
+            async with self._semaphore:
+                await update_evaluation(session_id)
+        except Exception as e:
+            print(f"[ERROR] Live scoring update for {session_id} failed: {e}")
+        finally:
+            self._running.discard(session_id)
+            if session_id in self._dirty:
+                self._wakeup.set()
+
+
+live_evaluator = LiveEvaluator(
+    debounce=settings.LIVE_SCORING_DEBOUNCE,
+    concurrency=settings.LIVE_SCORING_CONCURRENCY,
+)
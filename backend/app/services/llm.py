@@ -0,0 +1,257 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, AsyncGenerator
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.tracing import current_trace_id
+from app.services import admission
+
+# The SDK takes over a second to import, so it is only imported when the
+# client is built (see warm_client), keeping it off the cold-start path.
+if TYPE_CHECKING:
+    import anthropic
+
+_client: "anthropic.AsyncAnthropic | None" = None
+
+# Running token totals for this process, including prompt-cache reads/writes.
+usage_totals = {
+    "input_tokens": 0,
+    "output_tokens": 0,
+    "cache_read_input_tokens": 0,
+    "cache_creation_input_tokens": 0,
+}
+
+_EPHEMERAL = {"type": "ephemeral"}
+
+
+class LLMError(Exception):
+    """A model call failed at the API (SDK errors are re-raised as this)."""
+
+
+class LLMTimeoutError(LLMError):
+    """A model call ran out of time."""
+
+
+def get_client() -> "anthropic.AsyncAnthropic":
+    """Get or create the shared async Anthropic client.
+
+    All calls go through one pooled HTTP transport so connections are kept
+    alive and reused across requests instead of re-handshaking per call.
+    """
+    global _client
+
+    if _client is None:
+        import anthropic
+        import httpx
+
+        http_client = anthropic.DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=settings.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(
+                settings.LLM_SCORE_TIMEOUT,
+                connect=settings.LLM_CONNECT_TIMEOUT,
+            ),
+        )
+        _client = anthropic.AsyncAnthropic(
+            api_key=settings.ANTHROPIC_API_KEY,
+            http_client=http_client,
+            max_retries=settings.LLM_MAX_RETRIES,
+        )
+
+    return _client
+
+
+async def warm_client() -> None:
+    """Import the SDK and build the client in a thread, off the event loop."""
+    if _client is None:
+        await asyncio.to_thread(get_client)
+
+
+def _api_error(error: Exception) -> Exception | None:
+    """The LLMError for an SDK error, so callers needn't import the SDK to catch it."""
+    if not type(error).__module__.startswith("anthropic"):
+        return None
+
+    import anthropic
+
+    if isinstance(error, anthropic.APITimeoutError):
+        return LLMTimeoutError(str(error))
+    if isinstance(error, anthropic.APIError):
+        return LLMError(str(error))
+    return None
+
+
+def observe_ttft(label: str, seconds: float, persona: str = "") -> None:
+    metrics.LLM_TIME_TO_FIRST_TOKEN.observe(seconds, endpoint=label, persona=persona)
+
+
+def _record_error(label: str, persona: str, error: Exception) -> None:
+    metrics.LLM_ERRORS.inc(endpoint=label, persona=persona, error=type(error).__name__)
+
+
+def set_client(client) -> None:
+    """Replace the shared client, e.g. with bench.fake_llm.FakeAsyncAnthropic."""
+    global _client
+    _client = client
+
+
+async def close_client() -> None:
+    """Close the shared client and its HTTP connection pool."""
+    global _client
+
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+def cached_system(text: str) -> list[dict]:
+    """Wrap a system prompt as a single block marked for prompt caching."""
+    return [{"type": "text", "text": text, "cache_control": _EPHEMERAL}]
+
+
+def with_cache_breakpoint(messages: list[dict]) -> list[dict]:
+    """Mark the end of the conversation as a prompt-cache breakpoint.
+
+    Each turn's request is the previous request plus two new messages, so
+    caching up to the latest message lets the next turn read the system
+    prompt and every earlier turn from cache and only pay for the new ones.
+    """
+    if not messages:
+        return messages
+
+    *earlier, last = messages
+    content = last["content"]
+    if isinstance(content, str):
+        content = [{"type": "text", "text": content}]
+    content = [*content[:-1], {**content[-1], "cache_control": _EPHEMERAL}]
+
+    return [*earlier, {**last, "content": content}]
+
+
+_TOKEN_KINDS = {
+    "input_tokens": "input",
+    "output_tokens": "output",
+    "cache_read_input_tokens": "cache_read",
+    "cache_creation_input_tokens": "cache_write",
+}
+
+
+def record_usage(label: str, usage, persona: str = "") -> None:
+    """Add a response's token usage to the running totals and metrics, and log it."""
+    counts = {key: getattr(usage, key, None) or 0 for key in usage_totals}
+    for key, value in counts.items():
+        usage_totals[key] += value
+        metrics.LLM_TOKENS.inc(value, endpoint=label, persona=persona, kind=_TOKEN_KINDS[key])
+
+    print(
+        f"[LLM] trace={current_trace_id()} {label}: input={counts['input_tokens']} "
+        f"cache_read={counts['cache_read_input_tokens']} "
+        f"cache_write={counts['cache_creation_input_tokens']} "
+        f"output={counts['output_tokens']}"
+    )
+
+
+async def create_message(
+    *,
+    system: str | list[dict],
+    messages: list[dict],
+    max_tokens: int,
+    timeout: float,
+    label: str = "llm",
+    persona: str = "",
+    tools: list[dict] | None = None,
+    tool_choice: dict | None = None,
+    priority: str = admission.LIVE,
+    model: str | None = None,
+) -> "anthropic.types.Message":
+    """Send a Messages API request without blocking the event loop.
+
+    `timeout` bounds the call once admitted; the call first waits for a
+    slot in its `priority` class (see app.services.admission) and raises
+    AdmissionRejected if none frees up in time. `label` and `persona` tag
+    the call's metrics. `tools`/`tool_choice` are passed through when given.
+    `model` overrides LLM_MODEL for this call.
+    """
+    extra = {}
+    if tools is not None:
+        extra["tools"] = tools
+    if tool_choice is not None:
+        extra["tool_choice"] = tool_choice
+
+    async with admission.get_limiter().slot(priority):
+        started = time.perf_counter()
+        try:
+            response = await get_client().messages.create(
+                model=model or settings.LLM_MODEL,
+                max_tokens=max_tokens,
+                system=system,
+                messages=messages,
+                timeout=timeout,
+                **extra,
+            )
+        except Exception as e:
+            _record_error(label, persona, e)
+            error = _api_error(e)
+            if error is None:
+                raise
+            raise error from e
+        metrics.LLM_REQUEST_DURATION.observe(time.perf_counter() - started, endpoint=label, persona=persona)
+
+    record_usage(label, response.usage, persona)
+    return response
+
+
+@asynccontextmanager
+async def stream_message(
+    *,
+    system: str | list[dict],
+    messages: list[dict],
+    max_tokens: int,
+    timeout: float,
+    label: str = "llm",
+    persona: str = "",
+    priority: str = admission.LIVE,
+) -> AsyncGenerator["anthropic.AsyncMessageStream", None]:
+    """Open a streaming Messages API request.
+
+    Iterate `stream.text_stream` for text deltas and call
+    `stream.get_final_message()` for the assembled reply. The admission
+    slot is held until the context exits, and token usage is recorded once
+    the stream has completed.
+    """
+    async with admission.get_limiter().slot(priority):
+        started = time.perf_counter()
+        caller_error = None
+        try:
+            async with get_client().messages.stream(
+                model=settings.LLM_MODEL,
+                max_tokens=max_tokens,
+                system=system,
+                messages=messages,
+                timeout=timeout,
+            ) as stream:
+                try:
+                    yield stream
+                except Exception as e:
+                    # Raised in the caller's block: only SDK errors (from
+                    # reading the stream) are failures of the call itself
+                    if _api_error(e) is None:
+                        caller_error = e
+                    raise
+                final = await stream.get_final_message()
+        except Exception as e:
+            if e is caller_error:
+                raise
+            _record_error(label, persona, e)
+            error = _api_error(e)
+            if error is None:
+                raise
+            raise error from e
+        metrics.LLM_REQUEST_DURATION.observe(time.perf_counter() - started, endpoint=label, persona=persona)
+
+    record_usage(label, final.usage, persona)
@@ -0,0 +1,157 @@
+import asyncio
+
+import asyncpg
+
+from app.core.config import settings
+from app.core.database import get_db_connection, register_hot_statement
+from app.services.cache import Cache, LRUCache
+
+# Inserts a batch of turns for one session in a single round-trip. The
+# `session` CTE doubles as the foreign-key check, so a missing session is
+# reported without a separate EXISTS query.
+INSERT_SESSION_MESSAGES_SQL = register_hot_statement("""
+WITH session AS (
+    SELECT id, started_at FROM sessions WHERE id = $1
+),
+inserted AS (
+    INSERT INTO messages (session_id, session_started_at, role, content, turn_number, created_at)
+    SELECT session.id, session.started_at, m.role, m.content, m.turn_number, NOW()
+    FROM session, unnest($2::text[], $3::text[], $4::int[]) AS m(role, content, turn_number)
+    ON CONFLICT (session_id, turn_number, role, session_started_at) DO NOTHING
+    RETURNING 1
+)
+SELECT EXISTS(SELECT 1 FROM session) AS session_found,
+       (SELECT count(*) FROM inserted) AS inserted
+""")
+
+# Inserts buffered turns across many sessions at once. Rows whose session
+# no longer exists are dropped by the join instead of failing the batch.
+INSERT_BUFFERED_MESSAGES_SQL = register_hot_statement("""
+INSERT INTO messages (session_id, session_started_at, role, content, turn_number, created_at)
+SELECT m.session_id, s.started_at, m.role, m.content, m.turn_number, NOW()
+FROM unnest($1::uuid[], $2::text[], $3::text[], $4::int[]) AS m(session_id, role, content, turn_number)
+JOIN sessions s ON s.id = m.session_id
+ON CONFLICT (session_id, turn_number, role, session_started_at) DO NOTHING
+""")
+
+
+async def insert_session_messages(
+    conn: asyncpg.Connection,
+    session_id: str,
+    messages: list,
+) -> tuple[bool, int]:
+    """Insert turns for one session.
+
+    Returns (session_found, inserted); turns already stored are skipped.
+    """
+    row = await conn.fetchrow(
+        INSERT_SESSION_MESSAGES_SQL,
+        session_id,
+        [m.role for m in messages],
+        [m.content for m in messages],
+        [m.turn_number for m in messages],
+    )
+    return row["session_found"], row["inserted"]
+
+
+SESSION_EXISTS_SQL = register_hot_statement("SELECT EXISTS(SELECT 1 FROM sessions WHERE id = $1)")
+
+# Sessions known to exist, so buffered posts during a call skip the lookup
+known_sessions: Cache = LRUCache(settings.SESSION_CACHE_SIZE)
+
+
+async def session_exists(session_id: str) -> bool:
+    """Whether the session exists; found ids are remembered in known_sessions."""
+    if await known_sessions.get(session_id):
+        return True
+
+    async with get_db_connection() as conn:
+        found = await conn.fetchval(SESSION_EXISTS_SQL, session_id)
+    if found:
+        await known_sessions.set(session_id, True)
+    return found
+
+
+class MessageBuffer:
+    """Coalesce single-message posts into periodic batch inserts.
+
+    Messages are keyed on (session_id, turn_number, role), so a retried post
+    that is still pending is dropped here and one that was already flushed is
+    dropped by the unique index.
+    """
+
+    def __init__(self, flush_interval: float, max_batch: int):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._pending: dict[tuple, tuple] = {}
+        self._lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def add(self, session_id: str, role: str, content: str, turn_number: int) -> None:
+        key = (session_id, turn_number, role)
+        self._pending.setdefault(key, (session_id, role, content, turn_number))
+
+        if len(self._pending) >= self.max_batch:
+            self._wakeup.set()
+
+    async def flush(self) -> int:
+        """Write all pending messages in one statement."""
+        async with self._lock:
+            if not self._pending:
+                return 0
+
+            batch, self._pending = self._pending, {}
+            rows = list(batch.values())
+
+            try:
+                async with get_db_connection() as conn:
+                    await conn.execute(
+                        INSERT_BUFFERED_MESSAGES_SQL,
+                        [r[0] for r in rows],
+                        [r[1] for r in rows],
+                        [r[2] for r in rows],
+                        [r[3] for r in rows],
+                    )
+            except Exception:
+                # Keep the batch for the next flush rather than losing turns
+                for key, row in batch.items():
+                    self._pending.setdefault(key, row)
+                raise
+
+            return len(rows)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background loop and write whatever is still pending."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"[ERROR] Message buffer flush failed, will retry: {e}")
+
+
+message_buffer = MessageBuffer(
+    flush_interval=settings.MESSAGE_FLUSH_INTERVAL,
+    max_batch=settings.MESSAGE_FLUSH_MAX_BATCH,
+)
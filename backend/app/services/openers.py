@@ -0,0 +1,140 @@
+"""Pre-generated opening lines per persona.
+
+A persona's first reply is always a short greeting ("Hello?", "Yeah,
+who's this?"), so /respond serves turn 1 from a small in-memory pool per
+persona instead of making a model round-trip. Pools are refilled in the
+background when they run low, from the persona's own (cached) system
+prompt, and are discarded when that prompt changes.
+"""
+import asyncio
+import random
+import re
+from typing import Optional
+
+from app.core import metrics
+from app.core.config import settings
+from app.services import admission, llm
+from personas import PERSONAS, get_rendered_persona_prompt
+from prompts import OPENER_REQUEST_PROMPT
+
+_LIST_MARKER = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s*")
+
+# Longer lines aren't greetings; the model ignored the instructions
+MAX_OPENER_LENGTH = 80
+
+
+def parse_openers(text: str) -> list[str]:
+    """Distinct lines from the model's reply, with list markers and quotes stripped."""
+    openers = []
+    for line in text.splitlines():
+        line = _LIST_MARKER.sub("", line).strip().strip("\"“”")
+        if line and len(line) <= MAX_OPENER_LENGTH and line not in openers:
+            openers.append(line)
+    return openers
+
+
+class OpenerPool:
+    """Per-persona pools of opening lines, each served once.
+
+    take() pops a random line (or returns None if the pool is empty) and
+    asks for a refill once the pool is down to half of `size`.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._lines: dict[str, list[str]] = {}
+        # The persona prompt each pool was generated from
+        self._prompts: dict[str, str] = {}
+        self._low: set[str] = set()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def _current(self, persona_id: str) -> list[str]:
+        """The persona's pool, emptied first if the persona has changed since it was filled."""
+        lines = self._lines.setdefault(persona_id, [])
+        if lines and self._prompts.get(persona_id) != get_rendered_persona_prompt(persona_id):
+            metrics.OPENERS.inc(len(lines), persona=persona_id, event="discarded")
+            lines.clear()
+        return lines
+
+    def available(self, persona_id: str) -> bool:
+        return self.size > 0 and bool(self._current(persona_id))
+
+    def take(self, persona_id: str) -> Optional[str]:
+        if self.size <= 0:
+            return None
+
+        lines = self._current(persona_id)
+        if lines:
+            opener = lines.pop(random.randrange(len(lines)))
+            metrics.OPENERS.inc(persona=persona_id, event="served")
+        else:
+            opener = None
+            metrics.OPENERS.inc(persona=persona_id, event="empty")
+
+        if len(lines) <= self.size // 2:
+            self._low.add(persona_id)
+            self._wakeup.set()
+        return opener
+
+    def start(self) -> None:
+        if self.size > 0 and self._task is None:
+            self._low.update(PERSONAS)
+            self._wakeup.set()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+
+            low, self._low = self._low, set()
+            for persona_id in low:
+                try:
+                    await self._refill(persona_id)
+                except Exception as e:
+                    print(f"[ERROR] Refilling openers for {persona_id} failed: {e}")
+
+    async def _refill(self, persona_id: str) -> None:
+        if persona_id not in PERSONAS:
+            self._lines.pop(persona_id, None)
+            self._prompts.pop(persona_id, None)
+            return
+
+        prompt = get_rendered_persona_prompt(persona_id)
+        missing = self.size - len(self._current(persona_id))
+        if missing <= 0:
+            return
+
+        response = await llm.create_message(
+            max_tokens=20 * missing,
+            system=llm.cached_system(prompt),
+            messages=[{"role": "user", "content": OPENER_REQUEST_PROMPT.format(count=missing)}],
+            timeout=settings.LLM_RESPOND_TIMEOUT,
+            label="openers",
+            persona=persona_id,
+            priority=admission.BATCH,
+        )
+
+        # Lines may have been served, or the persona edited, during the call
+        if prompt != get_rendered_persona_prompt(persona_id):
+            return
+        lines = self._current(persona_id)
+        self._prompts[persona_id] = prompt
+
+        added = [line for line in parse_openers(response.content[0].text) if line not in lines]
+        added = added[: self.size - len(lines)]
+        lines.extend(added)
+        metrics.OPENERS.inc(len(added), persona=persona_id, event="generated")
+
+
+opener_pool = OpenerPool(settings.OPENER_POOL_SIZE)
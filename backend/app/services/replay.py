@@ -0,0 +1,360 @@
+"""Replay stored calls against persona and scoring prompt variants.
+
+A variant is a named combination of a persona prompt, a scoring prompt,
+a model and optionally a different advisor opening line, each defaulting
+to what production uses. Replaying a session under a variant re-drives
+it: the stored advisor turns are sent one at a time to the variant's
+persona, whose replies build up a new transcript, which the variant's
+scoring prompt then scores. A `rescore_only` variant skips the persona
+and scores the stored transcript as-is, which isolates a scoring prompt
+change from persona noise.
+
+Every model call goes through ReplayCache, a content-addressed disk
+cache keyed on everything sent. Variants that share a persona prompt
+share its calls, and re-running a variant set only calls the model for
+what changed. Runs are also reproducible, since a cached reply is reused
+rather than re-sampled.
+"""
+import asyncio
+import hashlib
+import importlib
+import json
+import os
+import random
+import statistics
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Optional
+
+from app.core.config import settings
+from app.services import admission, heuristics, llm
+from app.services.conversations import build_prompt
+from app.services.scoring import (
+    SCORECARD_TOOL,
+    SCORECARD_TOOL_CHOICE,
+    build_scoring_message,
+    build_transcript_text,
+    flatten_scorecard,
+    read_scorecard,
+)
+from personas import PERSONAS, get_rendered_persona_prompt
+from prompts import SCORING_PROMPT
+
+SCORE_FIELDS = (
+    "overall_score",
+    "opener_score",
+    "objection_handling_score",
+    "tone_confidence_score",
+    "close_attempt_score",
+)
+
+
+class VariantError(ValueError):
+    """A variants file entry is invalid or refers to something that can't be imported."""
+
+
+def import_ref(ref: str) -> Any:
+    """The object named by 'module:attribute', e.g. 'prompts_v2:get_persona_prompt'."""
+    module_name, _, attribute = ref.partition(":")
+    if not module_name or not attribute:
+        raise VariantError(f"Expected 'module:attribute', got '{ref}'")
+    try:
+        return getattr(importlib.import_module(module_name), attribute)
+    except (ImportError, AttributeError) as e:
+        raise VariantError(f"Cannot import '{ref}': {e}") from e
+
+
+@dataclass
+class Variant:
+    name: str
+    persona_prompt: Optional[Callable[[dict], str]] = None
+    scoring_prompt: str = SCORING_PROMPT
+    model: Optional[str] = None
+    opener: Optional[str] = None
+    rescore_only: bool = False
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Variant":
+        """Build a variant from a variants file entry.
+
+        `persona_prompt` names a function taking the persona dict, with the
+        same contract as prompts.get_persona_prompt; `scoring_prompt` names
+        a string. Both are 'module:attribute' references.
+        """
+        unknown = set(data) - {"name", "persona_prompt", "scoring_prompt", "model", "opener", "rescore_only"}
+        if unknown or not data.get("name"):
+            raise VariantError(f"Invalid variant {data!r}: needs a name; unknown keys {sorted(unknown)}")
+
+        variant = cls(
+            name=data["name"],
+            model=data.get("model"),
+            opener=data.get("opener"),
+            rescore_only=bool(data.get("rescore_only", False)),
+        )
+        if data.get("persona_prompt"):
+            variant.persona_prompt = import_ref(data["persona_prompt"])
+            if not callable(variant.persona_prompt):
+                raise VariantError(f"{data['persona_prompt']} is not a function")
+        if data.get("scoring_prompt"):
+            variant.scoring_prompt = import_ref(data["scoring_prompt"])
+            if not isinstance(variant.scoring_prompt, str):
+                raise VariantError(f"{data['scoring_prompt']} is not a string")
+        if variant.rescore_only and (variant.persona_prompt or variant.opener):
+            raise VariantError(f"Variant '{variant.name}': rescore_only ignores persona_prompt and opener")
+        if variant.opener:
+            variant.check_opener()
+        return variant
+
+    def check_opener(self) -> None:
+        """Fail now, not mid-run, if the opener uses a placeholder some persona lacks."""
+        for persona_id, persona in PERSONAS.items():
+            try:
+                self.opener.format_map(persona)
+            except (KeyError, IndexError, ValueError) as e:
+                raise VariantError(
+                    f"Variant '{self.name}': opener can't be filled for persona '{persona_id}' ({e!r}); "
+                    f"placeholders are persona fields: {', '.join(sorted(persona))}"
+                ) from e
+
+    def render_persona_prompt(self, persona_id: str) -> str:
+        if self.persona_prompt is None:
+            return get_rendered_persona_prompt(persona_id)
+        return self.persona_prompt(PERSONAS[persona_id])
+
+
+def load_variants(path: str) -> list[Variant]:
+    """Variants from a JSON file holding a list of entries (the first is the baseline)."""
+    with open(path) as f:
+        data = json.load(f)
+    entries = data["variants"] if isinstance(data, dict) else data
+    variants = [Variant.from_dict(entry) for entry in entries]
+    names = [variant.name for variant in variants]
+    if len(variants) < 2 or len(set(names)) != len(names):
+        raise VariantError("Need at least two variants, with distinct names")
+    return variants
+
+
+def cache_key(*parts) -> str:
+    payload = json.dumps(parts, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ReplayCache:
+    """Model results on disk, one JSON file per key, with concurrent duplicates sharing one call."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._in_flight: dict[str, asyncio.Task] = {}
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[Any]:
+        try:
+            with open(self._path(key)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def set(self, key: str, value: Any) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "w") as f:
+            json.dump(value, f, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+
+    async def call(self, key: str, produce: Callable[[], Awaitable[Any]]) -> Any:
+        cached = self.get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.hits += 1
+            return await asyncio.shield(task)
+
+        self.misses += 1
+
+        async def run() -> Any:
+            try:
+                value = await produce()
+                self.set(key, value)
+                return value
+            finally:
+                self._in_flight.pop(key, None)
+
+        task = self._in_flight[key] = asyncio.create_task(run())
+        return await asyncio.shield(task)
+
+
+async def persona_reply(cache: ReplayCache, variant: Variant, persona_id: str, persona_prompt: str, turns: list[dict]) -> str:
+    system, messages = build_prompt({"summary": None, "turns": []}, persona_prompt, turns)
+    model = variant.model or settings.LLM_MODEL
+
+    async def produce() -> str:
+        response = await llm.create_message(
+            max_tokens=256,
+            system=system,
+            messages=messages,
+            timeout=settings.LLM_RESPOND_TIMEOUT,
+            label="replay_respond",
+            persona=persona_id,
+            priority=admission.BATCH,
+            model=variant.model,
+        )
+        return response.content[0].text
+
+    return await cache.call(cache_key("respond", model, system, messages), produce)
+
+
+async def score_transcript(cache: ReplayCache, variant: Variant, persona_id: str, turns: list[dict]) -> dict:
+    """The flattened scorecard for `turns` under the variant's scoring prompt and model."""
+    persona = PERSONAS[persona_id]
+    call_metrics = heuristics.analyze_transcript(turns, persona)
+    if call_metrics["too_short"]:
+        return flatten_scorecard(heuristics.too_short_scorecard()).model_dump()
+    scoring_message = build_scoring_message(persona, build_transcript_text(turns, persona), call_metrics)
+    model = variant.model or settings.LLM_MODEL
+
+    async def produce() -> dict:
+        response = await llm.create_message(
+            max_tokens=1024,
+            system=llm.cached_system(variant.scoring_prompt),
+            messages=[{"role": "user", "content": scoring_message}],
+            timeout=settings.LLM_SCORE_TIMEOUT,
+            label="replay_score",
+            persona=persona_id,
+            tools=[SCORECARD_TOOL],
+            tool_choice=SCORECARD_TOOL_CHOICE,
+            priority=admission.BATCH,
+            model=variant.model,
+        )
+        scorecard = await read_scorecard(response, "replay_score", persona_id, admission.BATCH)
+        return flatten_scorecard(scorecard).model_dump()
+
+    return await cache.call(
+        cache_key("score", model, variant.scoring_prompt, SCORECARD_TOOL, scoring_message), produce
+    )
+
+
+async def replay_session(cache: ReplayCache, variant: Variant, session: dict) -> dict:
+    """Re-drive (or re-score) one stored session under `variant`.
+
+    `session` has id, persona_id and `turns` (role, content) in call
+    order. Returns the result row written to the run's results file.
+    """
+    persona_id = session["persona_id"]
+    if persona_id not in PERSONAS:
+        raise LookupError(f"Persona '{persona_id}' not found")
+
+    if variant.rescore_only:
+        turns = [{"role": t["role"], "content": t["content"]} for t in session["turns"]]
+    else:
+        advisor_lines = [t["content"] for t in session["turns"] if t["role"] == "advisor"]
+        if variant.opener and advisor_lines:
+            advisor_lines[0] = variant.opener.format_map(PERSONAS[persona_id])
+
+        persona_prompt = variant.render_persona_prompt(persona_id)
+        turns = []
+        for line in advisor_lines:
+            turns.append({"role": "advisor", "content": line})
+            reply = await persona_reply(cache, variant, persona_id, persona_prompt, turns)
+            turns.append({"role": "prospect", "content": reply})
+
+    scorecard = await score_transcript(cache, variant, persona_id, turns)
+    return {
+        "session_id": session["id"],
+        "persona_id": persona_id,
+        "variant": variant.name,
+        "turns": turns,
+        "scorecard": scorecard,
+    }
+
+
+def _quantile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def _bootstrap_ci(deltas: list[float], resamples: int = 2000, seed: int = 0) -> tuple[float, float]:
+    """95% interval of the mean paired difference."""
+    rng = random.Random(seed)
+    means = sorted(statistics.fmean(rng.choices(deltas, k=len(deltas))) for _ in range(resamples))
+    return means[int(0.025 * resamples)], means[int(0.975 * resamples) - 1]
+
+
+def summarize(results: list[dict], variant_names: list[str]) -> dict:
+    """Score distributions per variant, and each variant against the first, paired by session."""
+    by_variant: dict[str, dict[str, dict]] = {name: {} for name in variant_names}
+    for result in results:
+        if result["variant"] in by_variant:
+            by_variant[result["variant"]][result["session_id"]] = result
+
+    variants = {}
+    for name, rows in by_variant.items():
+        cards = [row["scorecard"] for row in rows.values()]
+        if not cards:
+            variants[name] = {"sessions": 0}
+            continue
+        overall = [card["overall_score"] for card in cards]
+        personas: dict[str, list[int]] = {}
+        for row in rows.values():
+            personas.setdefault(row["persona_id"], []).append(row["scorecard"]["overall_score"])
+        variants[name] = {
+            "sessions": len(cards),
+            "mean": {field: round(statistics.fmean(card[field] for card in cards), 2) for field in SCORE_FIELDS},
+            "stdev": round(statistics.pstdev(overall), 2),
+            "p10": _quantile(overall, 0.1),
+            "median": _quantile(overall, 0.5),
+            "p90": _quantile(overall, 0.9),
+            "histogram": [overall.count(score) for score in range(11)],
+            "meeting_booked_rate": round(sum(card["meeting_booked"] for card in cards) / len(cards), 3),
+            "by_persona": {p: round(statistics.fmean(scores), 2) for p, scores in sorted(personas.items())},
+        }
+
+    baseline = by_variant[variant_names[0]]
+    comparisons = {}
+    for name in variant_names[1:]:
+        shared = sorted(set(baseline) & set(by_variant[name]))
+        if not shared:
+            continue
+        deltas = [
+            by_variant[name][s]["scorecard"]["overall_score"] - baseline[s]["scorecard"]["overall_score"]
+            for s in shared
+        ]
+        low, high = _bootstrap_ci(deltas)
+        comparisons[name] = {
+            "paired_sessions": len(shared),
+            "mean_delta": round(statistics.fmean(deltas), 2),
+            "ci95": [round(low, 2), round(high, 2)],
+            "better": sum(d > 0 for d in deltas),
+            "same": sum(d == 0 for d in deltas),
+            "worse": sum(d < 0 for d in deltas),
+        }
+
+    return {"baseline": variant_names[0], "variants": variants, "vs_baseline": comparisons}
+
+
+def format_report(summary: dict) -> str:
+    lines = [f"{'variant':<24} {'n':>5} {'mean':>6} {'sd':>5} {'p10':>4} {'p50':>4} {'p90':>4} {'booked':>7}  overall 0..10"]
+    for name, stats in summary["variants"].items():
+        if not stats["sessions"]:
+            lines.append(f"{name:<24} {0:>5}")
+            continue
+        lines.append(
+            f"{name:<24} {stats['sessions']:>5} {stats['mean']['overall_score']:>6.2f} {stats['stdev']:>5.2f} "
+            f"{stats['p10']:>4} {stats['median']:>4} {stats['p90']:>4} {stats['meeting_booked_rate']:>7.1%}  "
+            + " ".join(str(count) for count in stats["histogram"])
+        )
+
+    for name, comparison in summary["vs_baseline"].items():
+        low, high = comparison["ci95"]
+        verdict = "no clear difference" if low <= 0 <= high else ("better" if low > 0 else "worse")
+        lines.append(
+            f"{name} vs {summary['baseline']}: {comparison['mean_delta']:+.2f} overall "
+            f"(95% CI {low:+.2f}..{high:+.2f}, {verdict}) over {comparison['paired_sessions']} sessions; "
+            f"{comparison['better']} better / {comparison['same']} same / {comparison['worse']} worse"
+        )
+    return "\n".join(lines)
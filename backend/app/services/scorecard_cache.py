@@ -0,0 +1,136 @@
+"""Content-addressed cache of scoring results.
+
+A scorecard is keyed by a hash of everything that determines it: the
+normalized transcript, the persona, the scoring prompt version and the
+model. Lookups go through an in-process LRU, then the scorecard_cache
+table, and only then to the model. Concurrent requests for the same key
+in one process share a single in-flight call.
+"""
+import asyncio
+import hashlib
+import json
+import re
+from typing import Awaitable, Callable, Optional
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.database import get_db_connection, register_hot_statement
+from app.services.cache import Cache, LRUCache
+
+SELECT_SCORECARD_SQL = register_hot_statement("""
+SELECT scorecard::text FROM scorecard_cache WHERE key = $1
+""")
+
+INSERT_SCORECARD_SQL = register_hot_statement("""
+INSERT INTO scorecard_cache (key, persona_id, prompt_version, model, scorecard)
+VALUES ($1, $2, $3, $4, $5::jsonb)
+ON CONFLICT (key) DO NOTHING
+""")
+
+_WHITESPACE = re.compile(r"\s+")
+
+memory_cache: Cache = LRUCache(settings.SCORECARD_CACHE_SIZE)
+
+_in_flight: dict[str, asyncio.Task] = {}
+
+
+def set_memory_cache(cache: Cache) -> None:
+    global memory_cache
+    memory_cache = cache
+
+
+def normalize_transcript(entries: list) -> list[tuple[str, str]]:
+    """(role, content) pairs with whitespace collapsed, in transcript order."""
+    return [(entry["role"], _WHITESPACE.sub(" ", entry["content"]).strip()) for entry in entries]
+
+
+def scorecard_key(entries: list, persona_id: str, prompt_version: str, model: str) -> str:
+    payload = json.dumps(
+        {
+            "transcript": normalize_transcript(entries),
+            "persona": persona_id,
+            "prompt": prompt_version,
+            "model": model,
+        },
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+async def _load(key: str) -> Optional[dict]:
+    async with get_db_connection() as conn:
+        raw = await conn.fetchval(SELECT_SCORECARD_SQL, key)
+    return json.loads(raw) if raw is not None else None
+
+
+async def _store(key: str, persona_id: str, prompt_version: str, model: str, scorecard: dict) -> None:
+    async with get_db_connection() as conn:
+        await conn.execute(INSERT_SCORECARD_SQL, key, persona_id, prompt_version, model, json.dumps(scorecard))
+
+
+async def _lookup_or_score(
+    key: str,
+    persona_id: str,
+    prompt_version: str,
+    model: str,
+    score: Callable[[], Awaitable[dict]],
+) -> dict:
+    try:
+        scorecard = await _load(key)
+    except Exception as e:
+        # The cache is an optimization; scoring still works without it
+        print(f"[WARN] Scorecard cache read failed: {e}")
+        scorecard = None
+
+    if scorecard is not None:
+        metrics.SCORECARD_CACHE_LOOKUPS.inc(result="postgres")
+    else:
+        metrics.SCORECARD_CACHE_LOOKUPS.inc(result="miss")
+        scorecard = await score()
+        try:
+            await _store(key, persona_id, prompt_version, model, scorecard)
+        except Exception as e:
+            print(f"[WARN] Scorecard cache write failed: {e}")
+
+    await memory_cache.set(key, scorecard)
+    return scorecard
+
+
+async def get_or_score(
+    entries: list,
+    persona_id: str,
+    prompt_version: str,
+    model: str,
+    score: Callable[[], Awaitable[dict]],
+) -> dict:
+    """Return the cached scorecard for this transcript, calling `score()` on a miss.
+
+    Failures (e.g. an unparseable reply) are not cached; every caller
+    waiting on the failed call gets the exception.
+    """
+    key = scorecard_key(entries, persona_id, prompt_version, model)
+
+    scorecard = await memory_cache.get(key)
+    if scorecard is not None:
+        metrics.SCORECARD_CACHE_LOOKUPS.inc(result="memory")
+        return scorecard
+
+    task = _in_flight.get(key)
+    if task is not None:
+        metrics.SCORECARD_CACHE_LOOKUPS.inc(result="in_flight")
+    else:
+        # Run as its own task so one caller disconnecting doesn't cancel the
+        # call for everyone else waiting on it
+        task = asyncio.create_task(_lookup_or_score(key, persona_id, prompt_version, model, score))
+        _in_flight[key] = task
+        task.add_done_callback(lambda t: _finish(key, t))
+
+    return await asyncio.shield(task)
+
+
+def _finish(key: str, task: asyncio.Task) -> None:
+    _in_flight.pop(key, None)
+    if not task.cancelled():
+        # Mark the exception retrieved even if every waiter went away
+        task.exception()
@@ -0,0 +1,465 @@
+import hashlib
+import json
+import re
+from typing import Optional
+
+import asyncpg
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.database import get_db_connection, register_hot_statement
+from app.models.session import ScorecardData
+from app.services import admission, heuristics, llm
+from app.services.archive import load_archived_transcript
+from app.services.scorecard_cache import get_or_score
+from personas import PERSONAS, persona_version
+from prompts import SCORECARD_REPAIR_PROMPT, SCORING_PROMPT
+
+# Fixed scoring instructions, sent as a cacheable prefix on every scoring call.
+SCORING_SYSTEM = llm.cached_system(SCORING_PROMPT)
+
+CATEGORIES = ("opener", "objection_handling", "tone_and_confidence", "close_attempt")
+
+_CATEGORY_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "score": {"type": "integer", "minimum": 0, "maximum": 10},
+        "feedback": {"type": "string"},
+    },
+    "required": ["score", "feedback"],
+}
+
+# Scoring replies come back as a forced call to this tool, so the model's
+# output is constrained to the scorecard shape instead of free text.
+SCORECARD_TOOL = {
+    "name": "record_scorecard",
+    "description": "Record the scorecard for the advisor's cold call.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "overall_score": {"type": "integer", "minimum": 0, "maximum": 10},
+            **{category: _CATEGORY_SCHEMA for category in CATEGORIES},
+            "best_moment": {"type": "string"},
+            "biggest_mistake": {"type": "string"},
+            "what_to_say_instead": {"type": "string"},
+            "meeting_booked": {"type": "boolean"},
+        },
+        "required": [
+            "overall_score",
+            *CATEGORIES,
+            "best_moment",
+            "biggest_mistake",
+            "what_to_say_instead",
+            "meeting_booked",
+        ],
+    },
+}
+SCORECARD_TOOL_CHOICE = {"type": "tool", "name": SCORECARD_TOOL["name"]}
+
+# Part of every scorecard cache key, so editing the prompt, the output
+# schema or the metrics in the scoring message invalidates previously
+# cached scorecards.
+SCORING_PROMPT_VERSION = hashlib.sha256(
+    (SCORING_PROMPT + json.dumps(SCORECARD_TOOL, sort_keys=True) + heuristics.FEATURES_VERSION).encode()
+).hexdigest()[:16]
+
+# Flat field names (as stored) accepted in place of the nested categories.
+_FLAT_SCORE_FIELDS = {
+    "opener": "opener",
+    "objection_handling": "objection_handling",
+    "tone_and_confidence": "tone_confidence",
+    "close_attempt": "close_attempt",
+}
+_TEXT_FIELDS = ("best_moment", "biggest_mistake", "what_to_say_instead")
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+
+class ScorecardParseError(ValueError):
+    """Claude's scoring reply could not be parsed as scorecard JSON."""
+
+    def __init__(self, message: str, raw: str):
+        super().__init__(message)
+        self.raw = raw
+
+
+class SessionNotFoundError(LookupError):
+    """The session to score does not exist."""
+
+
+def build_transcript_text(entries: list, persona: dict) -> str:
+    """Format advisor/prospect turns as a labelled plain-text transcript."""
+    transcript_text = ""
+    for entry in entries:
+        label = "Advisor" if entry["role"] == "advisor" else persona["name"]
+        transcript_text += f"{label}: {entry['content']}\n"
+    return transcript_text
+
+
+def build_scoring_message(persona: dict, transcript_text: str, call_metrics: Optional[dict] = None) -> str:
+    measured = ""
+    if call_metrics is not None:
+        measured = f"""Measured from the transcript (supporting evidence; the transcript itself decides):
+{heuristics.describe_metrics(call_metrics)}
+
+"""
+    return f"""Prospect persona: {persona['name']} — {persona['age']}-year-old {persona['occupation']}, {persona['portfolio_value']} portfolio at {persona['current_provider']}, difficulty: {persona['difficulty']}.
+
+Transcript:
+{transcript_text}
+
+{measured}Score this call now."""
+
+
+def _close_truncated(raw: str) -> str:
+    """Close a string, arrays and objects left open by a cut-off reply."""
+    stack = []
+    in_string = escaped = False
+    for char in raw:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]" and stack:
+            stack.pop()
+
+    closed = raw + ('"' if in_string else "")
+    closed = closed.rstrip().rstrip(",")
+    return closed + "".join(reversed(stack))
+
+
+def parse_scorecard(raw: str) -> tuple[dict, bool]:
+    """Parse a text scoring reply, repairing common damage locally.
+
+    Handles markdown code fences, prose around the JSON object, trailing
+    commas and output cut off mid-object. Returns (parsed JSON, whether a
+    repair was needed).
+    """
+    raw = raw.strip()
+
+    # Strip markdown code fences if present
+    if raw.startswith("```"):
+        # Handle both ```json and ``` formats
+        lines = raw.split("\n")
+        raw = "\n".join(lines[1:])  # Remove first line with ```
+        raw = raw.rsplit("```", 1)[0].strip()
+
+    try:
+        return json.loads(raw), False
+    except json.JSONDecodeError as e:
+        error = e
+
+    start = raw.find("{")
+    if start != -1:
+        body = raw[start:]
+        # The object alone without surrounding prose, then the object closed off
+        for attempt in (body[:body.rfind("}") + 1], _close_truncated(body)):
+            try:
+                parsed = json.loads(_TRAILING_COMMA.sub(r"\1", attempt))
+            except json.JSONDecodeError:
+                continue
+            if isinstance(parsed, dict):
+                return parsed, True
+
+    print(f"[ERROR] Failed to parse Claude response. Raw content (first 500 chars):")
+    print(raw[:500])
+    print(f"[ERROR] JSON decode error: {error}")
+    raise ScorecardParseError(f"Failed to parse scorecard JSON from Claude. Error: {str(error)}", raw)
+
+
+def _coerce_score(value) -> Optional[int]:
+    """Read a 0-10 score from an int, float or text like "7" or "7/10"."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        number = float(value)
+    elif isinstance(value, str) and (match := _NUMBER.search(value)):
+        number = float(match.group())
+    else:
+        return None
+    return min(max(round(number), 0), 10)
+
+
+def _coerce_bool(value) -> Optional[bool]:
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().lower() in ("true", "yes", "false", "no"):
+        return value.strip().lower() in ("true", "yes")
+    return None
+
+
+def salvage_scorecard(data: dict, raw: str = "") -> tuple[dict, bool]:
+    """Normalize scorecard JSON to the exact tool schema.
+
+    Out-of-range or stringly-typed values are coerced, flat field names
+    (opener_score, ...) are accepted, missing text becomes "", and a
+    missing overall score is the rounded mean of the categories. Returns
+    (scorecard, whether anything had to be fixed). Raises
+    ScorecardParseError if a category score can't be recovered.
+    """
+    if not isinstance(data, dict):
+        raise ScorecardParseError("Scorecard is not a JSON object", raw)
+
+    fixed = False
+    categories = {}
+
+    for category in CATEGORIES:
+        section = data.get(category)
+        flat = _FLAT_SCORE_FIELDS[category]
+        if not isinstance(section, dict):
+            section = {"score": data.get(f"{flat}_score"), "feedback": data.get(f"{flat}_feedback")}
+            fixed = True
+
+        score = _coerce_score(section.get("score"))
+        if score is None:
+            raise ScorecardParseError(f"Scorecard is missing a usable '{category}' score", raw)
+        feedback = section.get("feedback")
+
+        fixed = fixed or score != section.get("score") or not isinstance(feedback, str)
+        categories[category] = {"score": score, "feedback": feedback if isinstance(feedback, str) else ""}
+
+    overall = _coerce_score(data.get("overall_score"))
+    if overall is None:
+        overall = round(sum(c["score"] for c in categories.values()) / len(CATEGORIES))
+    fixed = fixed or overall != data.get("overall_score")
+    scorecard = {"overall_score": overall, **categories}
+
+    for field in _TEXT_FIELDS:
+        value = data.get(field)
+        fixed = fixed or not isinstance(value, str)
+        scorecard[field] = value if isinstance(value, str) else ""
+
+    meeting_booked = _coerce_bool(data.get("meeting_booked"))
+    fixed = fixed or meeting_booked is not data.get("meeting_booked")
+    scorecard["meeting_booked"] = bool(meeting_booked)
+
+    return scorecard, fixed
+
+
+def find_tool_input(response, name: str = SCORECARD_TOOL["name"]) -> Optional[dict]:
+    for block in response.content:
+        if block.type == "tool_use" and block.name == name:
+            return block.input
+    return None
+
+
+def _reply_text(response) -> str:
+    return "".join(block.text for block in response.content if block.type == "text")
+
+
+async def repair_scorecard(raw: str, label: str, persona_id: str, priority: str = admission.SCORING) -> dict:
+    """Last resort: have the model re-emit a broken reply through the tool.
+
+    Only the broken output is sent, not the transcript, so the call is
+    small and nothing is re-evaluated.
+    """
+    response = await llm.create_message(
+        max_tokens=1024,
+        system=SCORECARD_REPAIR_PROMPT,
+        messages=[{"role": "user", "content": raw[:8000] or "(empty reply)"}],
+        timeout=settings.LLM_SCORE_TIMEOUT,
+        label=f"{label}_repair",
+        persona=persona_id,
+        tools=[SCORECARD_TOOL],
+        tool_choice=SCORECARD_TOOL_CHOICE,
+        priority=priority,
+    )
+    tool_input = find_tool_input(response)
+    if tool_input is None:
+        raise ScorecardParseError("Repair call did not return a scorecard", raw)
+    scorecard, _ = salvage_scorecard(tool_input, raw)
+    return scorecard
+
+
+async def read_scorecard(response, label: str, persona_id: str, priority: str = admission.SCORING) -> dict:
+    """Turn a scoring reply into a scorecard, spending as little as possible.
+
+    Tool output is used as-is when valid. Otherwise, in order: local
+    normalization, local JSON repair of a text reply, and a targeted repair
+    call. Each outcome is counted in pitchiq_scorecard_parses_total.
+    """
+    tool_input = find_tool_input(response)
+    raw = json.dumps(tool_input) if tool_input is not None else _reply_text(response)
+
+    try:
+        if tool_input is not None:
+            scorecard, fixed = salvage_scorecard(tool_input, raw)
+            outcome = "salvaged" if fixed else "ok"
+        else:
+            parsed, repaired = parse_scorecard(raw)
+            scorecard, fixed = salvage_scorecard(parsed, raw)
+            outcome = "repaired" if repaired or fixed else "ok"
+    except ScorecardParseError as e:
+        print(f"[WARN] Scorecard needs a repair call: {e}")
+        try:
+            scorecard = await repair_scorecard(raw, label, persona_id, priority)
+        except ScorecardParseError:
+            metrics.SCORECARD_PARSES.inc(endpoint=label, outcome="failed")
+            raise
+        outcome = "repair_call"
+
+    metrics.SCORECARD_PARSES.inc(endpoint=label, outcome=outcome)
+    return scorecard
+
+
+def flatten_scorecard(scorecard_json: dict) -> ScorecardData:
+    """Flatten Claude's nested scorecard JSON into the stored shape."""
+    opener = scorecard_json.get("opener", {})
+    objection_handling = scorecard_json.get("objection_handling", {})
+    tone_and_confidence = scorecard_json.get("tone_and_confidence", {})
+    close_attempt = scorecard_json.get("close_attempt", {})
+
+    return ScorecardData(
+        overall_score=scorecard_json.get("overall_score", 0),
+        opener_score=opener.get("score", 0),
+        opener_feedback=opener.get("feedback", ""),
+        objection_handling_score=objection_handling.get("score", 0),
+        objection_handling_feedback=objection_handling.get("feedback", ""),
+        tone_confidence_score=tone_and_confidence.get("score", 0),
+        tone_confidence_feedback=tone_and_confidence.get("feedback", ""),
+        close_attempt_score=close_attempt.get("score", 0),
+        close_attempt_feedback=close_attempt.get("feedback", ""),
+        best_moment=scorecard_json.get("best_moment", ""),
+        biggest_mistake=scorecard_json.get("biggest_mistake", ""),
+        what_to_say_instead=scorecard_json.get("what_to_say_instead", ""),
+        meeting_booked=scorecard_json.get("meeting_booked", False),
+    )
+
+
+async def generate_scorecard(
+    persona: dict,
+    entries: list,
+    label: str = "score",
+    persona_id: str = "",
+    priority: str = admission.SCORING,
+    call_metrics: Optional[dict] = None,
+) -> dict:
+    """Score a transcript with Claude and return the raw scorecard JSON.
+
+    Identical transcripts are scored once; repeats are served from the
+    scorecard cache. `priority` is the admission class of the model calls.
+    `call_metrics` are the transcript's heuristics metrics, if already
+    computed. A call too short to evaluate is scored without the model.
+    """
+    if call_metrics is None:
+        call_metrics = heuristics.analyze_transcript(entries, persona)
+    if call_metrics["too_short"]:
+        metrics.SCORECARD_PARSES.inc(endpoint=label, outcome="too_short")
+        return heuristics.too_short_scorecard()
+
+    async def score() -> dict:
+        transcript_text = build_transcript_text(entries, persona)
+        scoring_message = build_scoring_message(persona, transcript_text, call_metrics)
+
+        response = await llm.create_message(
+            max_tokens=1024,
+            system=SCORING_SYSTEM,
+            messages=[{"role": "user", "content": scoring_message}],
+            timeout=settings.LLM_SCORE_TIMEOUT,
+            label=label,
+            persona=persona_id,
+            tools=[SCORECARD_TOOL],
+            tool_choice=SCORECARD_TOOL_CHOICE,
+            priority=priority,
+        )
+
+        return await read_scorecard(response, label, persona_id, priority)
+
+    return await get_or_score(
+        entries,
+        persona_id or persona["name"],
+        # Persona details are part of the scoring message
+        f"{SCORING_PROMPT_VERSION}-{persona_version(persona)}",
+        settings.LLM_MODEL,
+        score,
+    )
+
+
+INSERT_SCORECARD_SQL = register_hot_statement("""
+INSERT INTO scorecards (
+    session_id, overall_score,
+    opener_score, opener_feedback,
+    objection_handling_score, objection_handling_feedback,
+    tone_confidence_score, tone_confidence_feedback,
+    close_attempt_score, close_attempt_feedback,
+    best_moment, biggest_mistake, what_to_say_instead,
+    meeting_booked, generated_at
+)
+VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, NOW())
+ON CONFLICT (session_id) DO NOTHING
+""")
+
+
+async def save_scorecard(conn: asyncpg.Connection, session_id: str, scorecard: ScorecardData) -> bool:
+    """Insert a session's scorecard; a scorecard already stored is kept.
+
+    Returns True if a new scorecard row was written.
+    """
+    result = await conn.execute(
+        INSERT_SCORECARD_SQL,
+        session_id,
+        scorecard.overall_score,
+        scorecard.opener_score,
+        scorecard.opener_feedback,
+        scorecard.objection_handling_score,
+        scorecard.objection_handling_feedback,
+        scorecard.tone_confidence_score,
+        scorecard.tone_confidence_feedback,
+        scorecard.close_attempt_score,
+        scorecard.close_attempt_feedback,
+        scorecard.best_moment,
+        scorecard.biggest_mistake,
+        scorecard.what_to_say_instead,
+        scorecard.meeting_booked,
+    )
+    return result == "INSERT 0 1"
+
+
+async def load_session_transcript(session_id: str) -> tuple[str, dict, list]:
+    """The persona id, persona and ordered transcript turns of a stored session.
+
+    Transcripts moved to the archive are read from there.
+    """
+    async with get_db_connection() as conn:
+        session_row = await conn.fetchrow(
+            """
+            SELECT s.id, s.persona_id, s.started_at, a.archive_file, a.byte_offset, a.byte_length
+            FROM sessions s
+            LEFT JOIN message_archives a ON a.session_id = s.id
+            WHERE s.id = $1
+            """,
+            session_id,
+        )
+
+        if not session_row:
+            raise SessionNotFoundError(f"Session '{session_id}' not found")
+
+        # Turns in call order; an advisor line and its reply share a turn_number
+        message_rows = await conn.fetch(
+            """
+            SELECT role, content, turn_number
+            FROM messages
+            WHERE session_id = $1 AND session_started_at = $2
+            ORDER BY turn_number, role
+            """,
+            session_id,
+            session_row["started_at"],
+        )
+
+    if not message_rows and session_row["archive_file"] is not None:
+        message_rows = await load_archived_transcript(
+            session_row["archive_file"], session_row["byte_offset"], session_row["byte_length"]
+        )
+
+    persona = PERSONAS.get(session_row["persona_id"])
+    if not persona:
+        raise SessionNotFoundError(f"Persona '{session_row['persona_id']}' not found")
+
+    return session_row["persona_id"], persona, message_rows
@@ -0,0 +1,204 @@
+import asyncio
+import json
+
+import asyncpg
+
+from app.core.config import settings
+from app.core.database import get_db_connection, register_hot_statement
+from app.core.tracing import current_trace_id, session_trace_id, set_trace_id
+from app.services.analytics import record_scorecard_rollups
+from app.services.live_scoring import final_scorecard
+from app.services.heuristics import analyze_transcript
+from app.services.scoring import (
+    SessionNotFoundError,
+    flatten_scorecard,
+    generate_scorecard,
+    load_session_transcript,
+    save_scorecard,
+)
+
+ENQUEUE_SQL = """
+INSERT INTO scoring_jobs (session_id, run_after)
+VALUES ($1, NOW() + make_interval(secs => $2))
+ON CONFLICT (session_id) DO NOTHING
+"""
+
+# Claims one runnable job. Jobs stuck in 'running' past their lease (the
+# worker died mid-call) become claimable again. SKIP LOCKED lets any number
+# of workers poll the same table without blocking each other.
+CLAIM_SQL = register_hot_statement("""
+UPDATE scoring_jobs j
+SET status = 'running', attempts = j.attempts + 1, locked_at = NOW(), updated_at = NOW()
+FROM (
+    SELECT id
+    FROM scoring_jobs
+    WHERE (status = 'queued' AND run_after <= NOW())
+       OR (status = 'running' AND locked_at < NOW() - make_interval(secs => $1))
+    ORDER BY run_after
+    LIMIT 1
+    FOR UPDATE SKIP LOCKED
+) next_job
+WHERE j.id = next_job.id
+RETURNING j.id, j.session_id, j.attempts
+""")
+
+# Renews a running job's lease, as long as no one has re-claimed it since.
+# The updates below settle a job the same way: only the worker holding the
+# latest attempt may, so one whose lease ran out can't overwrite another's.
+HEARTBEAT_SQL = """
+UPDATE scoring_jobs SET locked_at = NOW()
+WHERE id = $1 AND status = 'running' AND attempts = $2
+"""
+
+COMPLETE_JOB_SQL = """
+UPDATE scoring_jobs SET status = 'done', last_error = NULL, updated_at = NOW()
+WHERE id = $1 AND status = 'running' AND attempts = $2
+RETURNING id
+"""
+
+GIVE_UP_JOB_SQL = """
+UPDATE scoring_jobs SET status = 'failed', last_error = $3, updated_at = NOW()
+WHERE id = $1 AND status = 'running' AND attempts = $2
+RETURNING id
+"""
+
+RETRY_JOB_SQL = """
+UPDATE scoring_jobs
+SET status = 'queued', last_error = $3, updated_at = NOW(),
+    run_after = NOW() + make_interval(secs => $4)
+WHERE id = $1 AND status = 'running' AND attempts = $2
+"""
+
+
+async def enqueue_scoring(conn: asyncpg.Connection, session_id: str) -> None:
+    """Queue a session for scoring; a session already queued is left alone.
+
+    The job is held back for one message-buffer flush interval so turns
+    buffered by other API workers land before the transcript is read.
+    """
+    await conn.execute(ENQUEUE_SQL, session_id, settings.MESSAGE_FLUSH_INTERVAL * 2)
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff for the next attempt, capped at five minutes."""
+    return min(settings.SCORING_RETRY_BASE_DELAY * 2 ** (attempts - 1), 300.0)
+
+
+class ScoringWorker:
+    """Claim and run scoring jobs with bounded concurrency.
+
+    Each of the `concurrency` slots loops claiming one job at a time, so at
+    most that many scoring calls are in flight from this worker.
+    """
+
+    def __init__(self, concurrency: int, poll_interval: float):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self._tasks: list[asyncio.Task] = []
+
+    def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._run_slot()) for _ in range(self.concurrency)]
+
+    async def stop(self) -> None:
+        """Cancel all slots; an interrupted job is retried once its lease expires."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def run_forever(self) -> None:
+        self.start()
+        await asyncio.gather(*self._tasks)
+
+    async def _run_slot(self) -> None:
+        while True:
+            try:
+                ran = await self.run_once()
+            except Exception as e:
+                print(f"[ERROR] Scoring worker failed to claim a job: {e}")
+                ran = False
+
+            if not ran:
+                await asyncio.sleep(self.poll_interval)
+
+    async def run_once(self) -> bool:
+        """Claim and process a single job. Returns False if none was ready."""
+        async with get_db_connection() as conn:
+            job = await conn.fetchrow(CLAIM_SQL, settings.SCORING_JOB_LEASE)
+
+        if job is None:
+            return False
+
+        # A slow attempt (queueing for a model slot, timeouts and retries)
+        # can outlast the lease, so keep it renewed until the job is settled
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        try:
+            await self._process(job)
+        finally:
+            heartbeat.cancel()
+        return True
+
+    async def _heartbeat(self, job: asyncpg.Record) -> None:
+        while True:
+            await asyncio.sleep(settings.SCORING_JOB_LEASE / 3)
+            try:
+                async with get_db_connection() as conn:
+                    await conn.execute(HEARTBEAT_SQL, job["id"], job["attempts"])
+            except (OSError, asyncpg.PostgresError) as e:
+                print(f"[WARN] Could not renew the lease on scoring job {job['id']}: {e}")
+
+    async def _process(self, job: asyncpg.Record) -> None:
+        session_id = str(job["session_id"])
+        set_trace_id(session_trace_id(session_id))
+
+        try:
+            persona_id, persona, entries = await load_session_transcript(session_id)
+            call_metrics = analyze_transcript(entries, persona)
+            scorecard = None
+            if settings.LIVE_SCORING_ENABLED and not call_metrics["too_short"]:
+                scorecard = await final_scorecard(session_id)
+            if scorecard is None:
+                scorecard_json = await generate_scorecard(
+                    persona, entries, label="end_session", persona_id=persona_id, call_metrics=call_metrics
+                )
+                scorecard = flatten_scorecard(scorecard_json)
+        except Exception as e:
+            await self._fail(job, e)
+            return
+
+        try:
+            async with get_db_connection() as conn:
+                async with conn.transaction():
+                    if await conn.fetchval(COMPLETE_JOB_SQL, job["id"], job["attempts"]) is None:
+                        print(f"[WARN] Scoring job {job['id']} was re-claimed after its lease ran out; dropping this result")
+                        return
+                    if await save_scorecard(conn, session_id, scorecard):
+                        await record_scorecard_rollups(conn, session_id, scorecard)
+                    # Metrics again, in case turns landed after /end computed them
+                    await conn.execute(
+                        "UPDATE sessions SET status = 'completed', call_metrics = $2::jsonb WHERE id = $1",
+                        session_id,
+                        json.dumps(call_metrics),
+                    )
+        except Exception as e:
+            await self._fail(job, e)
+
+    async def _fail(self, job: asyncpg.Record, error: Exception) -> None:
+        attempts = job["attempts"]
+        give_up = attempts >= settings.SCORING_MAX_ATTEMPTS or isinstance(error, SessionNotFoundError)
+        print(f"[ERROR] trace={current_trace_id()} Scoring session {job['session_id']} failed (attempt {attempts}): {error}")
+
+        try:
+            async with get_db_connection() as conn:
+                async with conn.transaction():
+                    if give_up:
+                        if await conn.fetchval(GIVE_UP_JOB_SQL, job["id"], attempts, str(error)) is not None:
+                            await conn.execute(
+                                "UPDATE sessions SET status = 'scoring_failed' WHERE id = $1",
+                                job["session_id"],
+                            )
+                    else:
+                        await conn.execute(RETRY_JOB_SQL, job["id"], attempts, str(error), retry_delay(attempts))
+        except (OSError, asyncpg.PostgresError) as e:
+            print(f"[ERROR] Could not record the failure of scoring job {job['id']}, it is retried when its lease ends: {e}")
@@ -0,0 +1,266 @@
+"""Full-text search over transcripts and scorecard feedback.
+
+messages.content_tsv and scorecards.feedback_tsv are generated tsvector
+columns with GIN indexes, kept current by every insert. Queries use
+websearch syntax ("quoted phrases", -excluded, or) and are matched
+against the index. Only the page of hits being returned is highlighted,
+because ts_headline re-parses the text. Results are ordered by rank.
+They are paged with a (rank, id) keyset cursor, so a later page costs
+no more than the first.
+
+Transcripts moved to the cold archive (see app.services.archive) are no
+longer in the index, so they don't appear in transcript results.
+"""
+import base64
+import json
+import uuid
+from datetime import date, timedelta
+from typing import Optional
+
+import asyncpg
+
+from app.core.config import settings
+from app.services.sessions import InvalidCursorError
+
+SEARCH_CONFIG = "english"
+
+HEADLINE_OPTIONS = "StartSel=<mark>, StopSel=</mark>, MaxWords=30, MinWords=10, MaxFragments=2"
+
+ROLES = ("advisor", "prospect")
+
+# Scorecard columns searched, in the order their matches are listed
+FEEDBACK_FIELDS = (
+    "biggest_mistake",
+    "what_to_say_instead",
+    "best_moment",
+    "opener_feedback",
+    "objection_handling_feedback",
+    "tone_confidence_feedback",
+    "close_attempt_feedback",
+)
+
+# Matches are filtered first (the OFFSET 0 keeps ranking out of the
+# scan, so only rows passing every filter are ranked), then ranked and
+# cut to the page. Sessions are joined and ts_headline run only for the
+# rows returned.
+TRANSCRIPT_SEARCH_SQL = """
+SELECT hit.*, s.user_id, s.persona_id, s.started_at,
+       ts_headline('{config}', hit.content, websearch_to_tsquery('{config}', $1), '{options}') AS headline
+FROM (
+    SELECT m.id, m.session_id, m.role, m.turn_number, m.content, m.created_at,
+           ts_rank_cd(m.content_tsv, m.q) AS rank
+    FROM (
+        SELECT m.*, q
+        FROM messages m, websearch_to_tsquery('{config}', $1) q
+        WHERE m.content_tsv @@ q {conditions}
+        OFFSET 0
+    ) m
+    {after}
+    ORDER BY rank DESC, m.id DESC
+    LIMIT ${limit}
+) hit
+JOIN sessions s ON s.id = hit.session_id
+ORDER BY hit.rank DESC, hit.id DESC
+"""
+
+# One row per scorecard; `matches` holds the highlighted fields that match
+SCORECARD_SEARCH_SQL = """
+SELECT hit.session_id AS id, hit.session_id, s.user_id, s.persona_id, s.started_at,
+       hit.overall_score, hit.meeting_booked, hit.rank,
+       (
+           SELECT json_agg(json_build_object(
+               'field', f.field,
+               'headline', ts_headline('{config}', f.text, websearch_to_tsquery('{config}', $1), '{options}')
+           ) ORDER BY f.ord)
+           FROM unnest(ARRAY[{field_names}], ARRAY[{field_values}]) WITH ORDINALITY AS f(field, text, ord)
+           WHERE to_tsvector('{config}', COALESCE(f.text, '')) @@ websearch_to_tsquery('{config}', $1)
+       )::text AS matches
+FROM (
+    SELECT sc.*, ts_rank(sc.feedback_tsv, sc.q) AS rank
+    FROM (
+        SELECT sc.*, q
+        FROM scorecards sc, websearch_to_tsquery('{config}', $1) q
+        WHERE sc.feedback_tsv @@ q {conditions}
+        OFFSET 0
+    ) sc
+    {after}
+    ORDER BY rank DESC, sc.session_id DESC
+    LIMIT ${limit}
+) hit
+JOIN sessions s ON s.id = hit.session_id
+ORDER BY hit.rank DESC, hit.session_id DESC
+"""
+
+
+class SearchTooBroadError(Exception):
+    """A search matched too much to rank within SEARCH_TIMEOUT."""
+
+
+def encode_search_cursor(rank: float, hit_id) -> str:
+    raw = f"{rank!r}|{hit_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_search_cursor(cursor: str) -> tuple[float, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        rank, hit_id = base64.urlsafe_b64decode(padded).decode().split("|", 1)
+        return float(rank), str(uuid.UUID(hit_id))
+    except ValueError as e:
+        raise InvalidCursorError(f"Invalid cursor: {cursor}") from e
+
+
+def transcript_hit(row: asyncpg.Record) -> dict:
+    return {
+        "session_id": str(row["session_id"]),
+        "message_id": str(row["id"]),
+        "user_id": row["user_id"],
+        "persona_id": row["persona_id"],
+        "started_at": row["started_at"],
+        "role": row["role"],
+        "turn_number": row["turn_number"],
+        "content": row["content"],
+        "headline": row["headline"],
+        "rank": row["rank"],
+    }
+
+
+def scorecard_hit(row: asyncpg.Record) -> dict:
+    return {
+        "session_id": str(row["session_id"]),
+        "user_id": row["user_id"],
+        "persona_id": row["persona_id"],
+        "started_at": row["started_at"],
+        "overall_score": row["overall_score"],
+        "meeting_booked": row["meeting_booked"],
+        "matches": json.loads(row["matches"] or "[]"),
+        "rank": row["rank"],
+    }
+
+
+def _date_range(args: list, column: str, since: Optional[date], until: Optional[date]) -> list[str]:
+    """Conditions for `column` within [since, until], both inclusive dates."""
+    conditions = []
+    if since is not None:
+        args.append(since)
+        conditions.append(f"{column} >= ${len(args)}::date")
+    if until is not None:
+        args.append(until + timedelta(days=1))
+        conditions.append(f"{column} < ${len(args)}::date")
+    return conditions
+
+
+def _session_filter(args: list, session_column: str, session_conditions: list[str], **equals) -> list[str]:
+    """A semi-join restricting `session_column` to sessions matching the filters given."""
+    for column, value in equals.items():
+        if value is not None:
+            args.append(value)
+            session_conditions.append(f"s.{column} = ${len(args)}")
+
+    if not session_conditions:
+        return []
+    return [f"{session_column} IN (SELECT s.id FROM sessions s WHERE {' AND '.join(session_conditions)})"]
+
+
+async def _fetch(conn: asyncpg.Connection, sql: str, args: list) -> list[asyncpg.Record]:
+    # Ranking costs grow with the number of matches, so a very common term
+    # over the whole history is cut off rather than left to tie up the pool
+    try:
+        async with conn.transaction(readonly=True):
+            await conn.execute(f"SET LOCAL statement_timeout = {int(settings.SEARCH_TIMEOUT * 1000)}")
+            return await conn.fetch(sql, *args)
+    except asyncpg.QueryCanceledError as e:
+        raise SearchTooBroadError(
+            "Search matched too many lines; narrow it with since/until, user_id or persona_id"
+        ) from e
+
+
+def _page(rows: list[asyncpg.Record], limit: int) -> tuple[list[asyncpg.Record], Optional[str]]:
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_search_cursor(last["rank"], last["id"])
+
+
+async def search_transcripts(
+    conn: asyncpg.Connection,
+    query: str,
+    *,
+    user_id: Optional[str] = None,
+    persona_id: Optional[str] = None,
+    role: Optional[str] = None,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    cursor: Optional[str] = None,
+    limit: int = 20,
+) -> tuple[list[asyncpg.Record], Optional[str]]:
+    """Ranked transcript lines matching `query`, and the next page's cursor."""
+    args: list = [query]
+    # On the partition key, so months outside the range aren't searched
+    conditions = _date_range(args, "m.session_started_at", since, until)
+    conditions += _session_filter(args, "m.session_id", [], user_id=user_id, persona_id=persona_id)
+    if role is not None:
+        args.append(role)
+        conditions.append(f"m.role = ${len(args)}")
+    after = ""
+    if cursor:
+        rank, message_id = decode_search_cursor(cursor)
+        args.extend([rank, message_id])
+        after = f"WHERE (ts_rank_cd(m.content_tsv, m.q), m.id) < (${len(args) - 1}::real, ${len(args)}::uuid)"
+
+    args.append(limit + 1)
+    sql = TRANSCRIPT_SEARCH_SQL.format(
+        config=SEARCH_CONFIG,
+        options=HEADLINE_OPTIONS,
+        conditions="".join(f" AND {condition}" for condition in conditions),
+        after=after,
+        limit=len(args),
+    )
+    return _page(await _fetch(conn, sql, args), limit)
+
+
+async def search_scorecards(
+    conn: asyncpg.Connection,
+    query: str,
+    *,
+    field: Optional[str] = None,
+    user_id: Optional[str] = None,
+    persona_id: Optional[str] = None,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    cursor: Optional[str] = None,
+    limit: int = 20,
+) -> tuple[list[asyncpg.Record], Optional[str]]:
+    """Ranked scorecards whose feedback matches `query`, and the next page's cursor.
+
+    With `field` (one of FEEDBACK_FIELDS) only that column has to match;
+    the index still narrows the candidates first.
+    """
+    args: list = [query]
+    conditions = _session_filter(
+        args, "sc.session_id", _date_range(args, "s.started_at", since, until), user_id=user_id, persona_id=persona_id
+    )
+    fields = FEEDBACK_FIELDS
+    if field is not None:
+        if field not in FEEDBACK_FIELDS:
+            raise ValueError(f"Unknown scorecard field: {field}")
+        fields = (field,)
+        conditions.append(f"to_tsvector('{SEARCH_CONFIG}', COALESCE(sc.{field}, '')) @@ q")
+    after = ""
+    if cursor:
+        rank, session_id = decode_search_cursor(cursor)
+        args.extend([rank, session_id])
+        after = f"WHERE (ts_rank(sc.feedback_tsv, sc.q), sc.session_id) < (${len(args) - 1}::real, ${len(args)}::uuid)"
+
+    args.append(limit + 1)
+    sql = SCORECARD_SEARCH_SQL.format(
+        config=SEARCH_CONFIG,
+        options=HEADLINE_OPTIONS,
+        field_names=", ".join(f"'{name}'" for name in fields),
+        field_values=", ".join(f"hit.{name}" for name in fields),
+        conditions="".join(f" AND {condition}" for condition in conditions),
+        after=after,
+        limit=len(args),
+    )
+    return _page(await _fetch(conn, sql, args), limit)
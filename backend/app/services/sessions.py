@@ -0,0 +1,239 @@
+import base64
+import hashlib
+import json
+import uuid
+from datetime import datetime
+from typing import AsyncGenerator, Optional
+
+import asyncpg
+
+from app.core.config import settings
+from app.core.database import get_db_connection, register_hot_statement
+from app.services.archive import load_archived_transcript
+from app.services.cache import Cache, LRUCache
+from app.services.messages import message_buffer
+
+SESSION_SUMMARY_COLUMNS = """
+    s.id, s.user_id, s.persona_id, s.conversation_id, s.started_at, s.ended_at, s.status,
+    sc.overall_score, sc.meeting_booked
+"""
+
+# Builds the whole GET /sessions/{id} response body in Postgres: the
+# session, its ordered transcript and its scorecard in one round-trip,
+# already serialized as JSON.
+SESSION_DETAIL_SQL = register_hot_statement("""
+SELECT s.status, json_build_object(
+    'session', json_build_object(
+        'id', s.id,
+        'user_id', s.user_id,
+        'persona_id', s.persona_id,
+        'conversation_id', s.conversation_id,
+        'started_at', s.started_at,
+        'status', s.status
+    ),
+    'messages', COALESCE((
+        SELECT json_agg(json_build_object(
+            'id', m.id,
+            'session_id', m.session_id,
+            'role', m.role,
+            'content', m.content,
+            'turn_number', m.turn_number,
+            'created_at', m.created_at
+        ) ORDER BY m.turn_number, m.role)
+        FROM messages m
+        WHERE m.session_id = s.id AND m.session_started_at = s.started_at
+    ), '[]'::json),
+    'scorecard', (
+        SELECT json_build_object(
+            'overall_score', sc.overall_score,
+            'opener_score', sc.opener_score,
+            'opener_feedback', sc.opener_feedback,
+            'objection_handling_score', sc.objection_handling_score,
+            'objection_handling_feedback', sc.objection_handling_feedback,
+            'tone_confidence_score', sc.tone_confidence_score,
+            'tone_confidence_feedback', sc.tone_confidence_feedback,
+            'close_attempt_score', sc.close_attempt_score,
+            'close_attempt_feedback', sc.close_attempt_feedback,
+            'best_moment', sc.best_moment,
+            'biggest_mistake', sc.biggest_mistake,
+            'what_to_say_instead', sc.what_to_say_instead,
+            'meeting_booked', sc.meeting_booked
+        )
+        FROM scorecards sc
+        WHERE sc.session_id = s.id
+    ),
+    'metrics', s.call_metrics
+)::text AS body,
+a.archive_file, a.byte_offset, a.byte_length
+FROM sessions s
+LEFT JOIN message_archives a ON a.session_id = s.id
+WHERE s.id = $1
+""")
+
+# Completed sessions never change, so their serialized detail is cached by
+# session id. Swap in a shared Cache implementation with set_session_cache().
+session_cache: Cache = LRUCache(settings.SESSION_CACHE_SIZE)
+
+
+def set_session_cache(cache: Cache) -> None:
+    global session_cache
+    session_cache = cache
+
+
+class InvalidCursorError(ValueError):
+    """A pagination cursor could not be decoded."""
+
+
+def encode_cursor(started_at: datetime, session_id) -> str:
+    raw = f"{started_at.isoformat()}|{session_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        started_at, session_id = base64.urlsafe_b64decode(padded).decode().split("|", 1)
+        return datetime.fromisoformat(started_at), str(uuid.UUID(session_id))
+    except ValueError as e:
+        raise InvalidCursorError(f"Invalid cursor: {cursor}") from e
+
+
+def json_default(value):
+    """json.dumps fallback matching FastAPI's encoding of datetimes and UUIDs."""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def make_etag(body: str) -> str:
+    return '"' + hashlib.sha1(body.encode()).hexdigest() + '"'
+
+
+async def get_session_detail(session_id: str) -> Optional[tuple[str, str]]:
+    """Return (etag, JSON body) for a session's detail, or None if missing.
+
+    Completed sessions are served from session_cache without touching the
+    database. Transcripts moved to the cold archive are read from there.
+    """
+    cached = await session_cache.get(session_id)
+    if cached is not None:
+        return cached
+
+    # Turns for a live session may still be sitting in the write buffer
+    await message_buffer.flush()
+
+    async with get_db_connection() as conn:
+        row = await conn.fetchrow(SESSION_DETAIL_SQL, session_id)
+
+    if row is None:
+        return None
+
+    body = row["body"]
+    if row["archive_file"] is not None:
+        detail_json = json.loads(body)
+        detail_json["messages"] = await load_archived_transcript(
+            row["archive_file"], row["byte_offset"], row["byte_length"]
+        )
+        body = json.dumps(detail_json, ensure_ascii=False)
+
+    detail = (make_etag(body), body)
+    if row["status"] == "completed":
+        await session_cache.set(session_id, detail)
+
+    return detail
+
+
+def session_summary(row: asyncpg.Record) -> dict:
+    return {
+        "id": str(row["id"]),
+        "user_id": row["user_id"],
+        "persona_id": row["persona_id"],
+        "conversation_id": row["conversation_id"],
+        "started_at": row["started_at"],
+        "ended_at": row["ended_at"],
+        "status": row["status"],
+        "overall_score": row["overall_score"],
+        "meeting_booked": row["meeting_booked"],
+    }
+
+
+async def fetch_session_page(
+    conn: asyncpg.Connection,
+    *,
+    user_id: Optional[str] = None,
+    status: Optional[str] = None,
+    persona_id: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+) -> tuple[list[asyncpg.Record], Optional[str]]:
+    """Fetch one page of sessions, newest first, with scorecard summaries.
+
+    Pages are keyed on (started_at, id) rather than OFFSET, so each page
+    costs the same no matter how deep into the history it is. Only the
+    filters actually given end up in the SQL, which keeps every variant
+    able to use its index. Returns the rows and the cursor of the next
+    page (None on the last page).
+    """
+    conditions = []
+    args = []
+
+    for column, value in (("s.user_id", user_id), ("s.status", status), ("s.persona_id", persona_id)):
+        if value is not None:
+            args.append(value)
+            conditions.append(f"{column} = ${len(args)}")
+
+    if cursor:
+        started_at, session_id = decode_cursor(cursor)
+        args.extend([started_at, session_id])
+        conditions.append(f"(s.started_at, s.id) < (${len(args) - 1}, ${len(args)}::uuid)")
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    args.append(limit + 1)
+
+    rows = await conn.fetch(
+        f"""
+        SELECT {SESSION_SUMMARY_COLUMNS}
+        FROM sessions s
+        LEFT JOIN scorecards sc ON sc.session_id = s.id
+        {where}
+        ORDER BY s.started_at DESC, s.id DESC
+        LIMIT ${len(args)}
+        """,
+        *args,
+    )
+
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(last["started_at"], last["id"])
+
+
+async def iter_session_pages(page_size: int = 500, **filters) -> AsyncGenerator[list[asyncpg.Record], None]:
+    """Yield every matching session page by page.
+
+    A pooled connection is held only while a page is being fetched, never
+    while the consumer is busy with it (e.g. writing to a slow client).
+    """
+    cursor = filters.pop("cursor", None)
+
+    while True:
+        async with get_db_connection() as conn:
+            rows, cursor = await fetch_session_page(conn, cursor=cursor, limit=page_size, **filters)
+
+        if rows:
+            yield rows
+        if cursor is None:
+            return
+
+
+async def stream_sessions_json(**filters) -> AsyncGenerator[str, None]:
+    """Stream every matching session summary as one JSON array."""
+    yield "["
+    separator = ""
+    async for rows in iter_session_pages(**filters):
+        for row in rows:
+            yield separator + json.dumps(session_summary(row), default=json_default)
+            separator = ","
+    yield "]"
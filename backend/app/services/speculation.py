@@ -0,0 +1,105 @@
+"""Speculative persona replies from interim advisor transcripts.
+
+While the advisor is still talking, the voice client can post the
+interim transcript to /respond with `interim: true`. A reply is started
+in the background under a key for the conversation so far. A later
+interim with different words cancels it and starts over. When the final
+utterance arrives and matches the one being speculated on (ignoring
+case, punctuation and spacing), that reply is used instead of starting a
+new model call. A mismatch cancels it.
+"""
+import asyncio
+import hashlib
+import json
+import re
+import time
+from typing import Awaitable, Callable, Optional
+
+from app.core import metrics
+from app.core.config import settings
+
+_NOT_WORD = re.compile(r"[^\w\s]+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_utterance(text: str) -> str:
+    return _WHITESPACE.sub(" ", _NOT_WORD.sub("", text.lower())).strip()
+
+
+def speculation_key(*parts) -> str:
+    """Key for what precedes the advisor's utterance (session, persona, history)."""
+    payload = json.dumps(parts, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class Speculation:
+    def __init__(self, utterance: str, task: asyncio.Task):
+        self.utterance = utterance
+        self.task = task
+        self.started = time.monotonic()
+
+
+class Speculator:
+    """In-flight speculative replies, at most one per conversation key."""
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: dict[str, Speculation] = {}
+
+    def start(self, key: str, utterance: str, generate: Callable[[], Awaitable[str]]) -> None:
+        """Speculate on `utterance`, replacing any speculation on different words."""
+        normalized = normalize_utterance(utterance)
+        current = self._entries.get(key)
+        if current is not None and current.utterance == normalized and not current.task.cancelled():
+            return
+        self.discard(key)
+
+        self._evict()
+        task = asyncio.create_task(generate())
+        # Mark failures retrieved even if no final request ever takes them
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._entries[key] = Speculation(normalized, task)
+        metrics.SPECULATION.inc(outcome="started")
+
+    async def take(self, key: str, utterance: str) -> Optional[str]:
+        """The speculated reply if it was made for this utterance, else None."""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return None
+
+        if time.monotonic() - entry.started > self.ttl:
+            entry.task.cancel()
+            metrics.SPECULATION.inc(outcome="expired")
+            return None
+        if entry.utterance != normalize_utterance(utterance):
+            entry.task.cancel()
+            metrics.SPECULATION.inc(outcome="miss")
+            return None
+
+        try:
+            reply = await entry.task
+        except Exception as e:
+            print(f"[WARN] Speculative reply failed, generating again: {e}")
+            metrics.SPECULATION.inc(outcome="failed")
+            return None
+
+        metrics.SPECULATION.inc(outcome="hit")
+        return reply
+
+    def discard(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            entry.task.cancel()
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        for key in [key for key, entry in self._entries.items() if now - entry.started > self.ttl]:
+            self.discard(key)
+            metrics.SPECULATION.inc(outcome="expired")
+        # Oldest first, by insertion order
+        while len(self._entries) >= self.max_entries > 0:
+            self.discard(next(iter(self._entries)))
+
+
+speculator = Speculator(settings.SPECULATION_TTL, settings.SPECULATION_MAX_ENTRIES)
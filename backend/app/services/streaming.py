@@ -0,0 +1,76 @@
+import json
+import re
+
+# Sentence-ending punctuation, optionally followed by closing quotes/brackets,
+# then whitespace. Clause boundaries are only used for the first segment so
+# TTS can start speaking as early as possible.
+_SENTENCE_END = re.compile(r"[.!?…]+[\"')\]]*\s+")
+_CLAUSE_END = re.compile(r"(?:[,;:]|\s[—–-]{1,2})\s+")
+
+# Words ending in "." that don't end a sentence.
+_ABBREVIATIONS = {"mr", "mrs", "ms", "dr", "st", "jr", "sr", "vs", "etc", "inc", "e.g", "i.e"}
+
+
+def _is_abbreviation(text: str, end: int) -> bool:
+    """Check whether the period ending at `end` belongs to an abbreviation."""
+    words = text[:end].rstrip(".").split()
+    return bool(words) and words[-1].lower() in _ABBREVIATIONS
+
+
+class SentenceSplitter:
+    """Accumulate streamed text deltas and cut them into speakable segments.
+
+    `feed()` returns every segment completed by the new text. The first
+    segment may end at a clause boundary (comma, semicolon, dash) once it is
+    at least `min_clause_chars` long; after that, only full sentences are
+    emitted. `flush()` returns whatever is left when the stream ends.
+    """
+
+    def __init__(self, min_clause_chars: int = 12):
+        self.min_clause_chars = min_clause_chars
+        self._buffer = ""
+        self._emitted = 0
+
+    def feed(self, text: str) -> list[tuple[str, str]]:
+        self._buffer += text
+        segments = []
+
+        while True:
+            segment = self._next_segment()
+            if segment is None:
+                break
+            segments.append(segment)
+
+        return segments
+
+    def flush(self) -> tuple[str, str] | None:
+        remainder = self._buffer.strip()
+        self._buffer = ""
+        if not remainder:
+            return None
+        self._emitted += 1
+        return ("sentence", remainder)
+
+    def _next_segment(self) -> tuple[str, str] | None:
+        for match in _SENTENCE_END.finditer(self._buffer):
+            if match.group().startswith(".") and _is_abbreviation(self._buffer, match.start() + 1):
+                continue
+            return self._cut(match.end(), "sentence")
+
+        if self._emitted == 0:
+            for match in _CLAUSE_END.finditer(self._buffer):
+                if match.start() >= self.min_clause_chars:
+                    return self._cut(match.end(), "clause")
+
+        return None
+
+    def _cut(self, end: int, kind: str) -> tuple[str, str]:
+        segment = self._buffer[:end].strip()
+        self._buffer = self._buffer[end:]
+        self._emitted += 1
+        return (kind, segment)
+
+
+def sse_event(event: str, data: dict) -> str:
+    """Format one Server-Sent Events frame."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
@@ -0,0 +1,123 @@
+"""Maintain the monthly messages partitions and the cold archive.
+
+    python archive_messages.py migrate    # one-off: convert an unpartitioned messages table
+    python archive_messages.py ensure     # create upcoming monthly partitions
+    python archive_messages.py archive    # move partitions past MESSAGES_HOT_MONTHS to ARCHIVE_DIR
+
+The API creates upcoming partitions when it starts; run `archive` (which
+also does `ensure`) from cron, e.g. daily. Run `migrate` with the API
+stopped: it copies every stored message into the new table in one
+transaction.
+"""
+import argparse
+import asyncio
+import os
+from datetime import date
+
+from app.core.config import settings
+from app.core.database import close_pool, get_db_connection
+from app.services.archive import (
+    archivable_partitions,
+    archive_partition,
+    create_partition,
+    ensure_partitions,
+    is_partitioned,
+)
+
+SCHEMA_FILE = os.path.join(os.path.dirname(__file__), "schema.sql")
+
+# Frees the old table's index names for the new table's
+RENAME_UNPARTITIONED_SQL = """
+ALTER TABLE messages RENAME TO messages_unpartitioned;
+ALTER INDEX IF EXISTS messages_pkey RENAME TO messages_unpartitioned_pkey;
+ALTER INDEX IF EXISTS uq_messages_session_turn_role RENAME TO uq_messages_unpartitioned_session_turn_role;
+ALTER INDEX IF EXISTS idx_messages_session_id_turn RENAME TO idx_messages_unpartitioned_session_id_turn;
+ALTER INDEX IF EXISTS idx_messages_content_tsv RENAME TO idx_messages_unpartitioned_content_tsv;
+"""
+
+COPY_MESSAGES_SQL = """
+INSERT INTO messages (id, session_id, session_started_at, role, content, turn_number, created_at)
+SELECT m.id, m.session_id, s.started_at, m.role, m.content, m.turn_number, m.created_at
+FROM messages_unpartitioned m
+JOIN sessions s ON s.id = m.session_id
+"""
+
+
+async def migrate() -> None:
+    async with get_db_connection() as conn:
+        if await is_partitioned(conn):
+            print("[ARCHIVE] messages is already partitioned")
+            return
+
+        with open(SCHEMA_FILE) as f:
+            schema = f.read()
+
+        async with conn.transaction():
+            # The partition key can't be NULL
+            await conn.execute("UPDATE sessions SET started_at = COALESCE(ended_at, NOW()) WHERE started_at IS NULL")
+            await conn.execute(RENAME_UNPARTITIONED_SQL)
+            await conn.execute(schema)
+
+            months = await conn.fetch(
+                """
+                SELECT DISTINCT date_trunc('month', s.started_at)::date AS month
+                FROM messages_unpartitioned m
+                JOIN sessions s ON s.id = m.session_id
+                """
+            )
+            for row in months:
+                await create_partition(conn, row["month"])
+            await ensure_partitions(conn, settings.MESSAGES_PARTITIONS_AHEAD)
+
+            copied = await conn.execute(COPY_MESSAGES_SQL)
+            await conn.execute("DROP TABLE messages_unpartitioned")
+
+    print(f"[ARCHIVE] Migrated {copied.split()[-1]} messages into {len(months)} monthly partitions")
+
+
+async def ensure() -> None:
+    async with get_db_connection() as conn:
+        created = await ensure_partitions(conn, settings.MESSAGES_PARTITIONS_AHEAD)
+    print(f"[ARCHIVE] Created partitions: {', '.join(created) or 'none'}")
+
+
+async def archive(hot_months: int, dry_run: bool) -> None:
+    await ensure()
+
+    async with get_db_connection() as conn:
+        partitions = await archivable_partitions(conn, hot_months, date.today())
+        if dry_run:
+            print(f"[ARCHIVE] Would archive: {', '.join(partitions) or 'nothing'}")
+            return
+
+        for partition in partitions:
+            sessions, messages = await archive_partition(conn, partition, settings.ARCHIVE_DIR)
+            print(f"[ARCHIVE] {partition}: {sessions} sessions, {messages} messages archived")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("migrate", help="convert an unpartitioned messages table")
+    commands.add_parser("ensure", help="create upcoming monthly partitions")
+    archive_parser = commands.add_parser("archive", help="archive partitions past the hot window")
+    archive_parser.add_argument("--hot-months", type=int, default=settings.MESSAGES_HOT_MONTHS)
+    archive_parser.add_argument("--dry-run", action="store_true", help="list partitions without archiving")
+    return parser.parse_args()
+
+
+async def main() -> None:
+    args = parse_args()
+    try:
+        if args.command == "migrate":
+            await migrate()
+        elif args.command == "ensure":
+            await ensure()
+        else:
+            await archive(args.hot_months, args.dry_run)
+    finally:
+        await close_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,169 @@
+"""Deterministic stand-in for the Anthropic async client.
+
+Mimics the parts of `AsyncAnthropic.messages` the backend uses (`create`
+and `stream`) with a configurable fixed latency and token rate, so load
+tests and offline tools exercise the real code paths without network
+calls or cost. Scoring requests get a valid scorecard back; persona turns
+get a short prospect line.
+"""
+import asyncio
+import hashlib
+import json
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+PERSONA_LINES = [
+    "Yeah, who's this?",
+    "Look, I already manage it myself, and I've done fine.",
+    "How did you get my number?",
+    "What makes you any different from the last guy who called?",
+    "I don't pay fees for something I can do myself.",
+    "Fine, I can do 15 minutes next week. But if it's a sales pitch, I'm hanging up.",
+]
+
+
+@dataclass
+class FakeUsage:
+    input_tokens: int
+    output_tokens: int
+    cache_read_input_tokens: int = 0
+    cache_creation_input_tokens: int = 0
+
+
+@dataclass
+class FakeBlock:
+    type: str
+    text: Optional[str] = None
+    name: Optional[str] = None
+    input: Optional[dict] = None
+    id: str = "toolu_fake"
+
+
+@dataclass
+class FakeMessage:
+    content: list[FakeBlock]
+    usage: FakeUsage
+    stop_reason: str = "end_turn"
+    model: str = "fake"
+    id: str = "msg_fake"
+    role: str = "assistant"
+    type: str = "message"
+
+
+def _text_of(value: Any) -> str:
+    """Flatten a system prompt or message content into plain text."""
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value
+    return "".join(block.get("text", "") for block in value if isinstance(block, dict))
+
+
+def _seed(*parts: str) -> int:
+    return int(hashlib.sha256("|".join(parts).encode()).hexdigest()[:8], 16)
+
+
+def fake_scorecard(seed: int) -> dict:
+    def category(offset: int) -> dict:
+        return {"score": (seed >> offset) % 11, "feedback": "Referenced the prospect's objection directly."}
+
+    opener, objections, tone, close = category(0), category(4), category(8), category(12)
+    return {
+        "overall_score": round((opener["score"] + objections["score"] + tone["score"] + close["score"]) / 4),
+        "opener": opener,
+        "objection_handling": objections,
+        "tone_and_confidence": tone,
+        "close_attempt": close,
+        "best_moment": "Asked how the prospect currently reviews their allocation.",
+        "biggest_mistake": "Talked about fees before establishing any value.",
+        "what_to_say_instead": "What would make a second opinion worth 15 minutes of your time?",
+        "meeting_booked": seed % 3 == 0,
+    }
+
+
+@dataclass
+class FakeMessages:
+    latency: float = 0.2
+    tokens_per_second: float = 80.0
+    calls: int = 0
+    _prefixes: set = field(default_factory=set)
+
+    def _respond(self, kwargs: dict) -> tuple[FakeMessage, str]:
+        system_text = _text_of(kwargs.get("system"))
+        messages = kwargs.get("messages", [])
+        transcript = "\n".join(_text_of(m.get("content")) for m in messages)
+        seed = _seed(system_text, transcript)
+
+        tools = kwargs.get("tools") or []
+        if tools:
+            scorecard = fake_scorecard(seed)
+            block = FakeBlock(type="tool_use", name=tools[0]["name"], input=scorecard)
+            text = json.dumps(scorecard)
+        elif '"overall_score"' in system_text:
+            text = json.dumps(fake_scorecard(seed))
+            block = FakeBlock(type="text", text=text)
+        else:
+            turn = sum(1 for m in messages if m.get("role") == "assistant")
+            text = PERSONA_LINES[min(turn, len(PERSONA_LINES) - 1)]
+            block = FakeBlock(type="text", text=text)
+
+        # Pretend the system prompt is cached after its first use
+        input_tokens = (len(system_text) + len(transcript)) // 4
+        cached = input_tokens // 2 if system_text in self._prefixes else 0
+        self._prefixes.add(system_text)
+
+        usage = FakeUsage(
+            input_tokens=input_tokens - cached,
+            output_tokens=max(len(text) // 4, 1),
+            cache_read_input_tokens=cached,
+        )
+        return FakeMessage(content=[block], usage=usage), text
+
+    async def create(self, **kwargs) -> FakeMessage:
+        self.calls += 1
+        message, _ = self._respond(kwargs)
+        await asyncio.sleep(self.latency + message.usage.output_tokens / self.tokens_per_second)
+        return message
+
+    def stream(self, **kwargs):
+        self.calls += 1
+        message, text = self._respond(kwargs)
+        return _stream(message, text, self.latency, self.tokens_per_second)
+
+
+class FakeStream:
+    def __init__(self, message: FakeMessage, text: str, latency: float, tokens_per_second: float):
+        self._message = message
+        self._text = text
+        self._latency = latency
+        self._tokens_per_second = tokens_per_second
+
+    @property
+    def text_stream(self):
+        return self._iter_text()
+
+    async def _iter_text(self):
+        await asyncio.sleep(self._latency)
+        words = self._text.split(" ")
+        for i, word in enumerate(words):
+            await asyncio.sleep(1 / self._tokens_per_second)
+            yield word if i == len(words) - 1 else word + " "
+
+    async def get_final_message(self) -> FakeMessage:
+        return self._message
+
+
+@asynccontextmanager
+async def _stream(message: FakeMessage, text: str, latency: float, tokens_per_second: float):
+    yield FakeStream(message, text, latency, tokens_per_second)
+
+
+class FakeAsyncAnthropic:
+    """Drop-in for `anthropic.AsyncAnthropic` in benchmarks and offline runs."""
+
+    def __init__(self, latency: float = 0.2, tokens_per_second: float = 80.0):
+        self.messages = FakeMessages(latency=latency, tokens_per_second=tokens_per_second)
+
+    async def close(self) -> None:
+        pass
@@ -0,0 +1,311 @@
+"""Load test and latency benchmark for the PitchIQ backend.
+
+Drives the real FastAPI app from main.py in-process through its ASGI
+interface, with the Anthropic client swapped for bench.fake_llm and a
+throwaway Postgres database created (and dropped) for the run. Each
+virtual advisor runs the full call flow:
+
+    POST /sessions -> N x (POST /messages, POST /respond, POST /messages)
+    -> POST /end -> poll GET /sessions/{id} until scored -> GET again
+
+and the run reports p50/p95/p99 latency and throughput per endpoint, DB
+pool acquire wait, event-loop lag and LLM token usage as JSON.
+
+    cd backend
+    python -m bench.run --database-url postgresql://postgres@localhost/postgres \\
+        --calls 200 --concurrency 20 --output bench-results.json
+    python -m bench.run ... --compare bench-results.json
+
+--database-url points at any server you may create databases on; the
+benchmark database is created inside it and dropped afterwards unless
+--keep-db is given.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+from collections import defaultdict
+from pathlib import Path
+
+import asyncpg
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+SCHEMA_PATH = BACKEND_DIR / "schema.sql"
+
+
+def percentiles(samples: list[float]) -> dict:
+    """Summarize latency samples (seconds) in milliseconds."""
+    if not samples:
+        return {"count": 0}
+
+    ordered = sorted(samples)
+
+    def pct(p: float) -> float:
+        index = min(int(round(p / 100 * (len(ordered) - 1))), len(ordered) - 1)
+        return round(ordered[index] * 1000, 2)
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 2),
+        "p50_ms": pct(50),
+        "p95_ms": pct(95),
+        "p99_ms": pct(99),
+        "max_ms": round(ordered[-1] * 1000, 2),
+    }
+
+
+class Recorder:
+    """Collect per-endpoint latencies and error counts."""
+
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+
+    async def request(self, client: httpx.AsyncClient, name: str, method: str, url: str, **kwargs) -> httpx.Response:
+        started = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        self.latencies[name].append(time.perf_counter() - started)
+        if response.status_code >= 400:
+            self.errors[name] += 1
+        return response
+
+    def report(self, wall_seconds: float) -> dict:
+        endpoints = {}
+        for name, samples in sorted(self.latencies.items()):
+            endpoints[name] = {
+                **percentiles(samples),
+                "errors": self.errors.get(name, 0),
+                "rps": round(len(samples) / wall_seconds, 2),
+            }
+        return endpoints
+
+
+class CallFailed(Exception):
+    """A call that could not continue because an endpoint returned an error."""
+
+
+class LoopLagMonitor:
+    """Measure how late the event loop wakes a task that sleeps `interval`."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: list[float] = []
+        self._task: asyncio.Task | None = None
+
+    async def _run(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(time.perf_counter() - started - self.interval, 0.0))
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+
+async def run_call(client: httpx.AsyncClient, recorder: Recorder, args: argparse.Namespace, index: int) -> None:
+    persona_id = ("robert", "sarah", "marcus")[index % 3]
+
+    response = await recorder.request(
+        client, "POST /sessions", "POST", "/sessions",
+        json={"user_id": f"bench-user-{index % args.users}", "persona_id": persona_id},
+    )
+    if response.status_code >= 400:
+        raise CallFailed(f"POST /sessions returned {response.status_code}")
+    session_id = response.json()["id"]
+
+    history = []
+    turn_number = 0
+    for turn in range(args.turns):
+        advisor_line = f"Advisor line {turn} for call {index}. Do you have a minute to talk about your portfolio?"
+        history.append({"role": "advisor", "content": advisor_line})
+        turn_number += 1
+        await recorder.request(
+            client, "POST /sessions/{id}/messages", "POST", f"/sessions/{session_id}/messages",
+            json={"role": "advisor", "content": advisor_line, "turn_number": turn_number},
+        )
+
+        response = await recorder.request(
+            client, "POST /respond", "POST", "/respond",
+            json={"persona_id": persona_id, "turn_number": turn + 1, "conversation_history": history},
+        )
+        if response.status_code >= 400:
+            # No prospect reply to record; end the call with the turns so far
+            break
+        reply = response.json().get("response", "")
+        history.append({"role": "prospect", "content": reply})
+        turn_number += 1
+        await recorder.request(
+            client, "POST /sessions/{id}/messages", "POST", f"/sessions/{session_id}/messages",
+            json={"role": "prospect", "content": reply, "turn_number": turn_number},
+        )
+
+    await recorder.request(client, "POST /sessions/{id}/end", "POST", f"/sessions/{session_id}/end")
+
+    scored_started = time.perf_counter()
+    deadline = scored_started + args.score_timeout
+    while time.perf_counter() < deadline:
+        response = await recorder.request(client, "GET /sessions/{id}", "GET", f"/sessions/{session_id}")
+        if response.status_code < 400 and response.json()["session"]["status"] in ("completed", "scoring_failed"):
+            break
+        await asyncio.sleep(args.poll_interval)
+    recorder.latencies["end -> scorecard ready"].append(time.perf_counter() - scored_started)
+
+    # A second load of a finished scorecard, as the review page does
+    await recorder.request(client, "GET /sessions/{id} (completed)", "GET", f"/sessions/{session_id}")
+
+
+async def create_database(admin_url: str) -> tuple[str, str]:
+    name = f"pitchiq_bench_{uuid.uuid4().hex[:8]}"
+    conn = await asyncpg.connect(admin_url)
+    try:
+        await conn.execute(f'CREATE DATABASE "{name}"')
+    finally:
+        await conn.close()
+
+    bench_url = admin_url.rsplit("/", 1)[0] + "/" + name
+    if "?" in admin_url.rsplit("/", 1)[1]:
+        bench_url += "?" + admin_url.split("?", 1)[1]
+
+    conn = await asyncpg.connect(bench_url)
+    try:
+        await conn.execute(SCHEMA_PATH.read_text())
+    finally:
+        await conn.close()
+
+    return name, bench_url
+
+
+async def drop_database(admin_url: str, name: str) -> None:
+    conn = await asyncpg.connect(admin_url)
+    try:
+        await conn.execute(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)')
+    finally:
+        await conn.close()
+
+
+async def benchmark(args: argparse.Namespace) -> dict:
+    db_name, bench_url = await create_database(args.database_url)
+    os.environ["DATABASE_URL"] = bench_url
+    os.environ["SCORING_WORKER_CONCURRENCY"] = str(args.scoring_workers)
+
+    try:
+        sys.path.insert(0, str(BACKEND_DIR))
+        import main
+        from app.core.database import add_acquire_hook, get_pool
+        from app.services import llm
+        from bench.fake_llm import FakeAsyncAnthropic
+
+        fake = FakeAsyncAnthropic(latency=args.llm_latency, tokens_per_second=args.llm_tokens_per_second)
+        llm.set_client(fake)
+
+        pool_waits: list[float] = []
+        add_acquire_hook(pool_waits.append)
+
+        recorder = Recorder()
+        lag = LoopLagMonitor()
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def bounded_call(index: int) -> None:
+            async with semaphore:
+                await run_call(client, recorder, args, index)
+
+        transport = httpx.ASGITransport(app=main.app)
+        async with main.app.router.lifespan_context(main.app):
+            pool = await get_pool()
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+                lag.start()
+                started = time.perf_counter()
+                results = await asyncio.gather(
+                    *(bounded_call(i) for i in range(args.calls)), return_exceptions=True
+                )
+                wall_seconds = time.perf_counter() - started
+                await lag.stop()
+
+            pool_size = {"size": pool.get_size(), "max_size": pool.get_max_size()}
+
+        failures = [repr(r) for r in results if isinstance(r, Exception)]
+
+        return {
+            "config": {
+                "calls": args.calls,
+                "concurrency": args.concurrency,
+                "turns": args.turns,
+                "users": args.users,
+                "scoring_workers": args.scoring_workers,
+                "llm_latency_s": args.llm_latency,
+                "llm_tokens_per_second": args.llm_tokens_per_second,
+            },
+            "wall_seconds": round(wall_seconds, 3),
+            "calls_per_second": round(args.calls / wall_seconds, 2),
+            "failed_calls": len(failures),
+            "failures": failures[:10],
+            "endpoints": recorder.report(wall_seconds),
+            "db_pool": {**pool_size, "acquire_wait": percentiles(pool_waits)},
+            "event_loop_lag": percentiles(lag.samples),
+            "llm": {"calls": fake.messages.calls, **llm.usage_totals},
+        }
+    finally:
+        if not args.keep_db:
+            await drop_database(args.database_url, db_name)
+
+
+def compare(current: dict, baseline: dict) -> None:
+    """Print p50/p95 deltas against an earlier run."""
+    print(f"{'endpoint':40} {'p50 ms':>16} {'p95 ms':>16}")
+    for name, stats in current["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(name)
+        if not before or not stats.get("count"):
+            continue
+        cells = []
+        for key in ("p50_ms", "p95_ms"):
+            delta = stats[key] - before[key]
+            cells.append(f"{stats[key]:>8.1f} ({delta:+.1f})")
+        print(f"{name:40} {cells[0]:>16} {cells[1]:>16}")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"), required=os.getenv("BENCH_DATABASE_URL") is None,
+                        help="Postgres server to create the throwaway benchmark database in")
+    parser.add_argument("--calls", type=int, default=50, help="number of simulated calls")
+    parser.add_argument("--concurrency", type=int, default=10, help="calls in flight at once")
+    parser.add_argument("--turns", type=int, default=3, help="advisor turns per call")
+    parser.add_argument("--users", type=int, default=5, help="distinct advisors the calls are spread over")
+    parser.add_argument("--scoring-workers", type=int, default=4, help="in-process scoring worker slots")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="fake model time before the first token (s)")
+    parser.add_argument("--llm-tokens-per-second", type=float, default=80.0, help="fake model output rate")
+    parser.add_argument("--poll-interval", type=float, default=0.25, help="scorecard polling interval (s)")
+    parser.add_argument("--score-timeout", type=float, default=60.0, help="give up waiting for a scorecard after (s)")
+    parser.add_argument("--output", type=Path, help="write the JSON report here")
+    parser.add_argument("--compare", type=Path, help="earlier JSON report to diff against")
+    parser.add_argument("--keep-db", action="store_true", help="don't drop the benchmark database")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    report = asyncio.run(benchmark(args))
+
+    rendered = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(rendered)
+    print(rendered)
+
+    if args.compare:
+        compare(report, json.loads(args.compare.read_text()))
+
+
+if __name__ == "__main__":
+    main()
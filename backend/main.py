@@ -1,37 +1,97 @@
 import json
-import os
+import time
+import uuid
 from contextlib import asynccontextmanager
-from datetime import datetime
+from dataclasses import dataclass
+from datetime import date, datetime
 from typing import Optional
 
-from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 
-import anthropic
-
-from app.core.database import get_pool, close_pool, get_db_connection
+from app.core import metrics
+from app.core.config import settings
+from app.core.tracing import ObservabilityMiddleware, session_trace_id, set_trace_id
+from app.core.database import close_pool, get_db_connection, register_hot_statement, warm_pool
+from app.core.startup import WarmUp
 from app.models.session import (
     CreateSessionRequest,
     SessionResponse,
     MessageRequest,
+    MessageBatchRequest,
     ScorecardData,
     EndSessionResponse,
-    Message,
     SessionDetail,
 )
-from personas import PERSONAS
-from prompts import get_persona_prompt, SCORING_PROMPT
+from personas import PERSONAS, get_rendered_persona_prompt
+from app.services import admission, analytics, conversations, export, llm, search
+from app.services.archive import ensure_partitions
+from app.services.heuristics import analyze_transcript
+from app.services.live_scoring import live_evaluator
+from app.services.messages import insert_session_messages, known_sessions, message_buffer, session_exists
+from app.services.openers import opener_pool
+from app.services.scoring import ScorecardParseError, generate_scorecard
+from app.services.scoring_queue import ScoringWorker, enqueue_scoring
+from app.services.speculation import speculation_key, speculator
+from app.services.sessions import (
+    InvalidCursorError,
+    decode_cursor,
+    fetch_session_page,
+    get_session_detail,
+    session_summary,
+    stream_sessions_json,
+)
+from app.services.streaming import SentenceSplitter, sse_event
+
+scoring_worker = ScoringWorker(
+    concurrency=settings.SCORING_WORKER_CONCURRENCY,
+    poll_interval=settings.SCORING_POLL_INTERVAL,
+)
+
+
+warm_up = WarmUp()
+
+
+async def create_partitions() -> None:
+    try:
+        async with get_db_connection() as conn:
+            await ensure_partitions(conn, settings.MESSAGES_PARTITIONS_AHEAD)
+    except Exception as e:
+        print(f"[WARN] Could not create upcoming message partitions: {e}")
 
-load_dotenv()
+
+async def start_workers() -> None:
+    # After the client is built, so no worker imports the SDK on the event loop
+    if settings.LIVE_SCORING_ENABLED:
+        live_evaluator.start()
+    if settings.SCORING_WORKER_CONCURRENCY > 0:
+        scoring_worker.start()
+    opener_pool.start()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Manage database connection lifecycle."""
-    await get_pool()
+    """Manage database connection, background workers and LLM client lifecycle."""
+    # Serve straight away: the pool and the model client come up in the
+    # background, and /readyz reports 503 until they have
+    if settings.MESSAGE_BUFFER_ENABLED:
+        message_buffer.start()
+    warm_up.start([
+        ("db_pool", warm_pool),
+        ("partitions", create_partitions),
+        ("llm_client", llm.warm_client),
+        ("workers", start_workers),
+    ])
     yield
+    await warm_up.stop()
+    await opener_pool.stop()
+    await scoring_worker.stop()
+    await live_evaluator.stop()
+    await message_buffer.stop()
+    await llm.close_client()
+    await admission.close_limiter()
     await close_pool()
 
 
@@ -43,15 +103,36 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "X-Trace-Id"],
 )
+app.add_middleware(ObservabilityMiddleware)
+
+
+@app.exception_handler(llm.LLMTimeoutError)
+async def llm_timeout_handler(request: Request, exc: llm.LLMTimeoutError):
+    return JSONResponse(status_code=504, content={"detail": "Timed out waiting for Claude"})
+
 
-client = anthropic.Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+@app.exception_handler(admission.AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: admission.AdmissionRejected):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Model capacity is saturated, retry shortly"},
+        headers={"Retry-After": "1"},
+    )
 
 
 class RespondRequest(BaseModel):
-    persona_id: str
-    turn_number: int
-    conversation_history: list[dict]
+    persona_id: Optional[str] = None
+    turn_number: Optional[int] = None
+    # Stateless: the client sends the whole history every turn
+    conversation_history: Optional[list[dict]] = None
+    # Session mode: the server keeps the history; send only the new advisor line
+    session_id: Optional[str] = None
+    message: Optional[str] = None
+    # The advisor is still speaking: start the reply in the background and
+    # return 202; the final request with the same words picks it up
+    interim: bool = False
 
 
 class ScoreRequest(BaseModel):
@@ -60,94 +141,317 @@ class ScoreRequest(BaseModel):
     transcript: list[dict]
 
 
-@app.get("/personas")
-def get_personas():
-    return {
-        pid: {
-            "name": p["name"],
-            "age": p["age"],
-            "occupation": p["occupation"],
-            "portfolio_value": p["portfolio_value"],
-            "current_provider": p["current_provider"],
-            "difficulty": p["difficulty"],
-            "voice_id": p["voice_id"],
-            "main_objection": p["main_objection"],
-        }
-        for pid, p in PERSONAS.items()
-    }
+@app.get("/healthz")
+def healthz():
+    """Liveness: the process is up. Answers even while warming up."""
+    return {"status": "ok"}
 
 
-@app.post("/respond")
-def respond(req: RespondRequest):
-    persona = PERSONAS.get(req.persona_id)
-    if not persona:
-        raise HTTPException(status_code=404, detail=f"Persona '{req.persona_id}' not found")
+@app.get("/readyz")
+def readyz(response: Response):
+    """Readiness: 503 until the DB pool is warm and the model client built."""
+    if not warm_up.ready.is_set():
+        response.status_code = 503
+    return warm_up.status()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus scrape endpoint for this worker process."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
-    system_prompt = get_persona_prompt(persona)
 
+@app.get("/personas")
+def get_personas(request: Request):
+    """Public persona details, prebuilt when personas.json is loaded.
+
+    Served with an ETag; a matching If-None-Match gets a 304.
+    """
+    snapshot = PERSONAS.current()
+    headers = {
+        "ETag": snapshot.etag,
+        "Cache-Control": f"public, max-age={settings.PERSONAS_CACHE_MAX_AGE}",
+    }
+    if snapshot.etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return Response(content=snapshot.payload, media_type="application/json", headers=headers)
+
+
+def build_persona_messages(req: RespondRequest) -> list[dict]:
+    """Convert advisor/prospect history into Claude user/assistant turns."""
     messages = []
     for entry in req.conversation_history:
         role = "user" if entry["role"] == "advisor" else "assistant"
         messages.append({"role": role, "content": entry["content"]})
+    return messages
 
-    response = client.messages.create(
-        model="claude-sonnet-4-20250514",
-        max_tokens=256,
-        system=system_prompt,
+
+@dataclass
+class RespondContext:
+    persona_id: str
+    turn_number: Optional[int]
+    system: list[dict]
+    messages: list[dict]
+    # No prospect reply yet, so the reply is an opener
+    first_turn: bool = False
+    # The advisor's latest utterance and what precedes it, for speculation
+    speculation_key: Optional[str] = None
+    utterance: Optional[str] = None
+    # Session mode only
+    conversation: Optional[dict] = None
+    advisor_turn: Optional[dict] = None
+
+
+async def prepare_respond(req: RespondRequest) -> RespondContext:
+    """Resolve the persona, system prompt and messages for a /respond request.
+
+    With a session_id the history comes from the server-side conversation
+    store and only `message` is read from the request; otherwise the
+    request's conversation_history is used as-is.
+    """
+    if req.session_id is None:
+        if req.persona_id is None or req.conversation_history is None:
+            raise HTTPException(
+                status_code=400, detail="Send session_id, or persona_id with conversation_history"
+            )
+        if req.persona_id not in PERSONAS:
+            raise HTTPException(status_code=404, detail=f"Persona '{req.persona_id}' not found")
+
+        history = req.conversation_history
+        context = RespondContext(
+            persona_id=req.persona_id,
+            turn_number=req.turn_number,
+            system=llm.cached_system(get_rendered_persona_prompt(req.persona_id)),
+            messages=llm.with_cache_breakpoint(build_persona_messages(req)),
+            first_turn=all(entry["role"] == "advisor" for entry in history),
+        )
+        if history and history[-1]["role"] == "advisor":
+            context.speculation_key = speculation_key(req.persona_id, history[:-1])
+            context.utterance = history[-1]["content"]
+        return context
+
+    validate_session_id(req.session_id)
+    if not req.message:
+        raise HTTPException(status_code=400, detail="message is required with session_id")
+
+    try:
+        conversation = await conversations.load_conversation(req.session_id)
+    except conversations.ConversationClosedError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if conversation is None:
+        raise HTTPException(status_code=404, detail=f"Session '{req.session_id}' not found")
+    if conversation["persona_id"] not in PERSONAS:
+        raise HTTPException(status_code=404, detail=f"Persona '{conversation['persona_id']}' not found")
+
+    advisor_turn = conversations.new_turn(conversation, "advisor", req.message, req.turn_number)
+    system, messages = conversations.build_prompt(
+        conversation, get_rendered_persona_prompt(conversation["persona_id"]), [advisor_turn]
+    )
+
+    return RespondContext(
+        persona_id=conversation["persona_id"],
+        turn_number=advisor_turn["turn_number"],
+        system=system,
         messages=messages,
+        first_turn=all(turn["role"] == "advisor" for turn in conversation["turns"]),
+        speculation_key=speculation_key(req.session_id, advisor_turn["turn_number"]),
+        utterance=req.message,
+        conversation=conversation,
+        advisor_turn=advisor_turn,
     )
 
-    reply = response.content[0].text
 
-    return {
-        "persona_id": req.persona_id,
-        "turn_number": req.turn_number,
-        "response": reply,
-    }
+async def finish_respond(context: RespondContext, reply: str) -> None:
+    """Record the exchange in session mode; a no-op for stateless requests."""
+    if context.conversation is None:
+        return
 
+    prospect_turn = conversations.new_turn(
+        context.conversation, "prospect", reply, context.advisor_turn["turn_number"]
+    )
+    await conversations.record_turns(context.conversation, [context.advisor_turn, prospect_turn])
+    notify_live_scoring(context.conversation["session_id"], [MessageRequest(**prospect_turn)])
 
-@app.post("/score")
-def score(req: ScoreRequest):
-    persona = PERSONAS.get(req.persona_id)
-    if not persona:
-        raise HTTPException(status_code=404, detail=f"Persona '{req.persona_id}' not found")
 
-    transcript_text = ""
-    for entry in req.transcript:
-        label = "Advisor" if entry["role"] == "advisor" else persona["name"]
-        transcript_text += f"{label}: {entry['content']}\n"
+async def generate_reply(context: RespondContext, label: str) -> str:
+    response = await llm.create_message(
+        max_tokens=256,
+        system=context.system,
+        messages=context.messages,
+        timeout=settings.LLM_RESPOND_TIMEOUT,
+        label=label,
+        persona=context.persona_id,
+    )
+    return response.content[0].text
+
+
+async def prepared_reply(context: RespondContext) -> Optional[str]:
+    """A reply that needs no model call of its own, if there is one.
+
+    That is a pooled opener on the first turn, or the speculative reply
+    started from an interim transcript with the same words.
+    """
+    if context.first_turn:
+        opener = opener_pool.take(context.persona_id)
+        if opener is not None:
+            if context.speculation_key is not None:
+                speculator.discard(context.speculation_key)
+            return opener
+
+    if context.speculation_key is not None:
+        return await speculator.take(context.speculation_key, context.utterance)
+    return None
+
+
+def speculate(context: RespondContext) -> JSONResponse:
+    """Start generating a reply to an interim utterance; nothing is recorded."""
+    started = (
+        settings.SPECULATION_ENABLED
+        and context.speculation_key is not None
+        # The first turn is served from the opener pool when it can be
+        and not (context.first_turn and opener_pool.available(context.persona_id))
+    )
+    if started:
+        speculator.start(
+            context.speculation_key,
+            context.utterance,
+            lambda: generate_reply(context, "respond_speculative"),
+        )
+    return JSONResponse(status_code=202, content={"status": "speculating" if started else "ignored"})
 
-    scoring_message = f"""Prospect persona: {persona['name']} — {persona['age']}-year-old {persona['occupation']}, {persona['portfolio_value']} portfolio at {persona['current_provider']}, difficulty: {persona['difficulty']}.
 
-Transcript:
-{transcript_text}
+@app.post("/respond")
+async def respond(req: RespondRequest):
+    """Generate the persona's next reply.
+
+    Either send the full `conversation_history` each turn, or a
+    `session_id` plus the new advisor `message` and let the server keep
+    (and compact) the history and store both turns. With `interim`, the
+    reply is only started (202) and served to the final request if the
+    words match.
+    """
+    context = await prepare_respond(req)
+    if req.interim:
+        return speculate(context)
+
+    reply = await prepared_reply(context)
+    if reply is None:
+        reply = await generate_reply(context, "respond")
+    await finish_respond(context, reply)
+
+    return {
+        "persona_id": context.persona_id,
+        "turn_number": context.turn_number,
+        "response": reply,
+    }
 
-Score this call now."""
 
-    response = client.messages.create(
-        model="claude-sonnet-4-20250514",
-        max_tokens=1024,
-        system=SCORING_PROMPT,
-        messages=[{"role": "user", "content": scoring_message}],
+@app.post("/respond/stream")
+async def respond_stream(req: RespondRequest):
+    """Stream the persona's reply as Server-Sent Events.
+
+    Emits `token` events for each text delta, `segment` events whenever a
+    clause or sentence is complete (so TTS can start on the first one), and
+    a final `done` event with the full reply and timing metadata. An opener
+    or speculative reply arrives as a single `token` event.
+    """
+    context = await prepare_respond(req)
+    if req.interim:
+        return speculate(context)
+
+    async def events():
+        started = time.perf_counter()
+        ttft_ms = None
+        splitter = SentenceSplitter()
+        segment_index = 0
+        reply = await prepared_reply(context)
+
+        if reply is not None:
+            ttft_ms = round((time.perf_counter() - started) * 1000, 1)
+            yield sse_event("token", {"text": reply})
+            for kind, segment in splitter.feed(reply):
+                yield sse_event("segment", {"index": segment_index, "kind": kind, "text": segment})
+                segment_index += 1
+        else:
+            reply = ""
+            try:
+                async with llm.stream_message(
+                    max_tokens=256,
+                    system=context.system,
+                    messages=context.messages,
+                    timeout=settings.LLM_RESPOND_TIMEOUT,
+                    label="respond_stream",
+                    persona=context.persona_id,
+                ) as stream:
+                    async for text in stream.text_stream:
+                        if ttft_ms is None:
+                            ttft = time.perf_counter() - started
+                            llm.observe_ttft("respond_stream", ttft, persona=context.persona_id)
+                            ttft_ms = round(ttft * 1000, 1)
+                        reply += text
+                        yield sse_event("token", {"text": text})
+
+                        for kind, segment in splitter.feed(text):
+                            yield sse_event("segment", {"index": segment_index, "kind": kind, "text": segment})
+                            segment_index += 1
+            except llm.LLMError as e:
+                yield sse_event("error", {"detail": f"Claude request failed: {e}"})
+                return
+            except admission.AdmissionRejected:
+                yield sse_event("error", {"detail": "Model capacity is saturated, retry shortly"})
+                return
+
+        tail = splitter.flush()
+        if tail:
+            kind, segment = tail
+            yield sse_event("segment", {"index": segment_index, "kind": kind, "text": segment})
+
+        await finish_respond(context, reply)
+
+        yield sse_event("done", {
+            "persona_id": context.persona_id,
+            "turn_number": context.turn_number,
+            "response": reply,
+            "ttft_ms": ttft_ms,
+            "total_ms": round((time.perf_counter() - started) * 1000, 1),
+        })
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
-    raw = response.content[0].text.strip()
-    if raw.startswith("```"):
-        raw = raw.split("\n", 1)[1]
-        raw = raw.rsplit("```", 1)[0].strip()
 
+@app.post("/score")
+async def score(req: ScoreRequest):
+    persona = PERSONAS.get(req.persona_id)
+    if not persona:
+        raise HTTPException(status_code=404, detail=f"Persona '{req.persona_id}' not found")
+
+    call_metrics = analyze_transcript(req.transcript, persona)
     try:
-        scorecard = json.loads(raw)
-    except json.JSONDecodeError:
+        scorecard = await generate_scorecard(
+            persona, req.transcript, persona_id=req.persona_id, call_metrics=call_metrics
+        )
+    except ScorecardParseError:
         raise HTTPException(status_code=500, detail="Failed to parse scorecard JSON from Claude")
 
     return {
         "persona_id": req.persona_id,
         "user_id": req.user_id,
         "scorecard": scorecard,
+        "metrics": call_metrics,
     }
 
 
+INSERT_SESSION_SQL = register_hot_statement("""
+INSERT INTO sessions (user_id, persona_id, conversation_id, started_at, status)
+VALUES ($1, $2, $3, NOW(), 'in_progress')
+RETURNING id, user_id, persona_id, conversation_id, started_at, status
+""")
+
+
 @app.post("/sessions", response_model=SessionResponse)
 async def create_session(req: CreateSessionRequest):
     """Create a new session when a voice call starts."""
@@ -156,16 +460,15 @@ async def create_session(req: CreateSessionRequest):
 
     async with get_db_connection() as conn:
         row = await conn.fetchrow(
-            """
-            INSERT INTO sessions (user_id, persona_id, conversation_id, started_at, status)
-            VALUES ($1, $2, $3, NOW(), 'in_progress')
-            RETURNING id, user_id, persona_id, conversation_id, started_at, status
-            """,
+            INSERT_SESSION_SQL,
             req.user_id,
             req.persona_id,
             req.conversation_id,
         )
 
+        set_trace_id(session_trace_id(row["id"]))
+        await known_sessions.set(str(row["id"]), True)
+
         return SessionResponse(
             id=str(row["id"]),
             user_id=row["user_id"],
@@ -176,290 +479,420 @@ async def create_session(req: CreateSessionRequest):
         )
 
 
-@app.post("/sessions/{session_id}/messages")
-async def add_message(session_id: str, req: MessageRequest):
-    """Add a message to a session (fire-and-forget from frontend)."""
+def validate_message(req: MessageRequest) -> None:
     if req.role not in ["advisor", "prospect"]:
         raise HTTPException(status_code=400, detail="Role must be 'advisor' or 'prospect'")
 
-    async with get_db_connection() as conn:
-        # Verify session exists
-        session_exists = await conn.fetchval(
-            "SELECT EXISTS(SELECT 1 FROM sessions WHERE id = $1)",
-            session_id,
-        )
 
-        if not session_exists:
+def validate_session_id(session_id: str) -> None:
+    try:
+        uuid.UUID(session_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail=f"Session '{session_id}' not found")
+
+
+def notify_live_scoring(session_id: str, messages: list[MessageRequest]) -> None:
+    """Re-evaluate the session in the background once a prospect reply lands."""
+    if settings.LIVE_SCORING_ENABLED and any(m.role == "prospect" for m in messages):
+        live_evaluator.notify(session_id)
+
+
+@app.post("/sessions/{session_id}/messages")
+async def add_message(session_id: str, req: MessageRequest):
+    """Add a message to a session (fire-and-forget from frontend).
+
+    With the message buffer enabled the turn is queued and written with
+    other pending turns on the next flush; otherwise it is inserted now.
+    """
+    validate_message(req)
+    validate_session_id(session_id)
+
+    if settings.MESSAGE_BUFFER_ENABLED:
+        if not await session_exists(session_id):
             raise HTTPException(status_code=404, detail=f"Session '{session_id}' not found")
+        message_buffer.add(session_id, req.role, req.content, req.turn_number)
+        notify_live_scoring(session_id, [req])
+        return {"status": "queued"}
 
-        await conn.execute(
-            """
-            INSERT INTO messages (session_id, role, content, turn_number, created_at)
-            VALUES ($1, $2, $3, $4, NOW())
-            """,
-            session_id,
-            req.role,
-            req.content,
-            req.turn_number,
-        )
+    async with get_db_connection() as conn:
+        session_found, _ = await insert_session_messages(conn, session_id, [req])
+
+    if not session_found:
+        raise HTTPException(status_code=404, detail=f"Session '{session_id}' not found")
 
+    notify_live_scoring(session_id, [req])
     return {"status": "ok"}
 
 
+@app.post("/sessions/{session_id}/messages/batch")
+async def add_messages(session_id: str, req: MessageBatchRequest):
+    """Add many messages to a session in one statement.
+
+    Turns already stored for the same (turn_number, role) are skipped, so
+    retrying a batch is safe.
+    """
+    for message in req.messages:
+        validate_message(message)
+    validate_session_id(session_id)
+
+    async with get_db_connection() as conn:
+        session_found, inserted = await insert_session_messages(conn, session_id, req.messages)
+
+    if not session_found:
+        raise HTTPException(status_code=404, detail=f"Session '{session_id}' not found")
+
+    notify_live_scoring(session_id, req.messages)
+    return {"status": "ok", "inserted": inserted}
+
+
 @app.post("/sessions/{session_id}/end", response_model=EndSessionResponse)
-async def end_session(session_id: str):
-    """End a session and generate scorecard."""
+async def end_session(session_id: str, response: Response):
+    """End a session and queue its scorecard.
+
+    Returns 202 with status 'scoring' straight away, along with the call's
+    heuristic metrics; a scoring worker fills in the scorecard and flips
+    the session to 'completed'. Poll GET /sessions/{session_id} for the
+    result. Calling this again is safe, and retries a session whose
+    scoring previously failed.
+    """
+    validate_session_id(session_id)
+
+    # Make sure turns still sitting in the write buffer are stored
+    await message_buffer.flush()
+    await conversations.forget_conversation(session_id)
+
     async with get_db_connection() as conn:
-        # Fetch session
-        session_row = await conn.fetchrow(
-            "SELECT id, user_id, persona_id, started_at, status FROM sessions WHERE id = $1",
-            session_id,
-        )
+        async with conn.transaction():
+            session_row = await conn.fetchrow(
+                "SELECT id, persona_id, started_at, ended_at, status, call_metrics::text FROM sessions WHERE id = $1 FOR UPDATE",
+                session_id,
+            )
 
-        if not session_row:
-            raise HTTPException(status_code=404, detail=f"Session '{session_id}' not found")
+            if not session_row:
+                raise HTTPException(status_code=404, detail=f"Session '{session_id}' not found")
+
+            persona_id = session_row["persona_id"]
+            if persona_id not in PERSONAS:
+                raise HTTPException(status_code=404, detail=f"Persona '{persona_id}' not found")
+
+            status = session_row["status"]
+            ended_at = session_row["ended_at"]
+            call_metrics = json.loads(session_row["call_metrics"]) if session_row["call_metrics"] else None
+
+            if status == "in_progress":
+                ended_at = datetime.now()
+                turns = await conn.fetch(
+                    """
+                    SELECT role, content
+                    FROM messages
+                    WHERE session_id = $1 AND session_started_at = $2
+                    ORDER BY turn_number, role
+                    """,
+                    session_id,
+                    session_row["started_at"],
+                )
+                call_metrics = analyze_transcript(turns, PERSONAS[persona_id])
+                await conn.execute(
+                    "UPDATE sessions SET status = 'scoring', ended_at = $1, call_metrics = $3::jsonb WHERE id = $2",
+                    ended_at,
+                    session_id,
+                    json.dumps(call_metrics),
+                )
+                await enqueue_scoring(conn, session_id)
+                status = "scoring"
+            elif status == "scoring_failed":
+                await conn.execute(
+                    """
+                    UPDATE scoring_jobs
+                    SET status = 'queued', attempts = 0, run_after = NOW(), updated_at = NOW()
+                    WHERE session_id = $1
+                    """,
+                    session_id,
+                )
+                await conn.execute("UPDATE sessions SET status = 'scoring' WHERE id = $1", session_id)
+                status = "scoring"
+
+            scorecard = None
+            if status == "completed":
+                scorecard_row = await conn.fetchrow(
+                    """
+                    SELECT overall_score,
+                           opener_score, opener_feedback,
+                           objection_handling_score, objection_handling_feedback,
+                           tone_confidence_score, tone_confidence_feedback,
+                           close_attempt_score, close_attempt_feedback,
+                           best_moment, biggest_mistake, what_to_say_instead,
+                           meeting_booked
+                    FROM scorecards
+                    WHERE session_id = $1
+                    """,
+                    session_id,
+                )
+                if scorecard_row:
+                    scorecard = ScorecardData(**dict(scorecard_row))
+
+    if scorecard is None:
+        response.status_code = 202
+
+    return EndSessionResponse(
+        session_id=str(session_id),
+        status=status,
+        ended_at=ended_at or datetime.now(),
+        scorecard=scorecard,
+        metrics=call_metrics,
+    )
 
-        persona_id = session_row["persona_id"]
-        persona = PERSONAS.get(persona_id)
-
-        if not persona:
-            raise HTTPException(status_code=404, detail=f"Persona '{persona_id}' not found")
-
-        # Fetch all messages ordered by turn_number
-        message_rows = await conn.fetch(
-            """
-            SELECT role, content, turn_number
-            FROM messages
-            WHERE session_id = $1
-            ORDER BY turn_number ASC
-            """,
-            session_id,
-        )
 
-        # Format transcript
-        transcript_text = ""
-        for msg in message_rows:
-            label = "Advisor" if msg["role"] == "advisor" else persona["name"]
-            transcript_text += f"{label}: {msg['content']}\n"
+@app.get("/sessions/{session_id}", response_model=SessionDetail)
+async def get_session(session_id: str, request: Request):
+    """Fetch full session details including messages and scorecard.
 
-        # Generate scorecard using Claude
-        scoring_message = f"""Prospect persona: {persona['name']} — {persona['age']}-year-old {persona['occupation']}, {persona['portfolio_value']} portfolio at {persona['current_provider']}, difficulty: {persona['difficulty']}.
+    The body is built by a single query and returned as-is. Responses carry
+    an ETag; a matching If-None-Match gets a 304. Completed sessions are
+    cached, so re-opening a scorecard costs no database work.
+    """
+    validate_session_id(session_id)
 
-Transcript:
-{transcript_text}
+    detail = await get_session_detail(session_id)
+    if detail is None:
+        raise HTTPException(status_code=404, detail=f"Session '{session_id}' not found")
 
-Score this call now."""
+    etag, body = detail
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
 
-        response = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=1024,
-            system=SCORING_PROMPT,
-            messages=[{"role": "user", "content": scoring_message}],
-        )
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
 
-        raw = response.content[0].text.strip()
+    return Response(content=body, media_type="application/json", headers=headers)
 
-        # Strip markdown code fences if present
-        if raw.startswith("```"):
-            # Handle both ```json and ``` formats
-            lines = raw.split("\n")
-            raw = "\n".join(lines[1:])  # Remove first line with ```
-            raw = raw.rsplit("```", 1)[0].strip()
 
+@app.get("/sessions")
+async def list_sessions(
+    response: Response,
+    user_id: Optional[str] = None,
+    status: Optional[str] = None,
+    persona_id: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    stream: bool = False,
+):
+    """List sessions newest first, with overall score and meeting outcome.
+
+    Paginated: pass the X-Next-Cursor response header back as `cursor` to
+    get the next page. With `stream=true` every matching session is
+    streamed as one JSON array instead (for exports).
+    """
+    filters = {"user_id": user_id, "status": status, "persona_id": persona_id}
+
+    if cursor:
         try:
-            scorecard_json = json.loads(raw)
-        except json.JSONDecodeError as e:
-            print(f"[ERROR] Failed to parse Claude response. Raw content (first 500 chars):")
-            print(raw[:500])
-            print(f"[ERROR] JSON decode error: {e}")
-            raise HTTPException(
-                status_code=500,
-                detail=f"Failed to parse scorecard JSON from Claude. Error: {str(e)}"
-            )
-
-        # Extract nested scores and flatten for database
-        overall_score = scorecard_json.get("overall_score", 0)
-        opener = scorecard_json.get("opener", {})
-        objection_handling = scorecard_json.get("objection_handling", {})
-        tone_and_confidence = scorecard_json.get("tone_and_confidence", {})
-        close_attempt = scorecard_json.get("close_attempt", {})
-
-        # Insert scorecard
-        await conn.execute(
-            """
-            INSERT INTO scorecards (
-                session_id, overall_score,
-                opener_score, opener_feedback,
-                objection_handling_score, objection_handling_feedback,
-                tone_confidence_score, tone_confidence_feedback,
-                close_attempt_score, close_attempt_feedback,
-                best_moment, biggest_mistake, what_to_say_instead,
-                meeting_booked, generated_at
-            )
-            VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, NOW())
-            """,
-            session_id,
-            overall_score,
-            opener.get("score", 0),
-            opener.get("feedback", ""),
-            objection_handling.get("score", 0),
-            objection_handling.get("feedback", ""),
-            tone_and_confidence.get("score", 0),
-            tone_and_confidence.get("feedback", ""),
-            close_attempt.get("score", 0),
-            close_attempt.get("feedback", ""),
-            scorecard_json.get("best_moment", ""),
-            scorecard_json.get("biggest_mistake", ""),
-            scorecard_json.get("what_to_say_instead", ""),
-            scorecard_json.get("meeting_booked", False),
+            decode_cursor(cursor)
+        except InvalidCursorError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    if stream:
+        return StreamingResponse(
+            stream_sessions_json(cursor=cursor, **filters),
+            media_type="application/json",
         )
 
-        # Update session status
-        ended_at = datetime.now()
-        await conn.execute(
-            "UPDATE sessions SET status = 'completed', ended_at = $1 WHERE id = $2",
-            ended_at,
-            session_id,
-        )
+    async with get_db_connection() as conn:
+        rows, next_cursor = await fetch_session_page(conn, cursor=cursor, limit=limit, **filters)
+
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+
+    return [session_summary(row) for row in rows]
+
+
+@app.get("/export")
+async def export_sessions(
+    request: Request,
+    format: str = "jsonl",
+    table: str = "sessions",
+    user_id: Optional[str] = None,
+    persona_id: Optional[str] = None,
+    status: Optional[str] = None,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    after: Optional[str] = None,
+):
+    """Stream sessions with transcripts and scorecards, oldest first.
+
+    `format=jsonl` gives one session per line with its messages and
+    scorecard; `format=csv` gives one row per session (`table=sessions`)
+    or per transcript turn (`table=messages`). `since`/`until` are
+    inclusive start dates. To resume an interrupted export, or fetch only
+    what's new since the last one, pass the id of the last session
+    received as `after`. Gzipped when the client accepts it.
+    """
+    if format not in export.FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(export.FORMATS)}")
+    if table not in export.CSV_TABLES:
+        raise HTTPException(status_code=400, detail=f"table must be one of: {', '.join(export.CSV_TABLES)}")
+
+    position = None
+    if after:
+        validate_session_id(after)
+        async with get_db_connection() as conn:
+            try:
+                position = await export.resume_position(conn, after)
+            except export.ExportCursorError as e:
+                raise HTTPException(status_code=404, detail=str(e))
+
+    compress = "gzip" in request.headers.get("accept-encoding", "")
+    headers = {
+        "Content-Disposition": f'attachment; filename="sessions-{date.today()}.{format}"',
+        "Vary": "Accept-Encoding",
+    }
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+
+    return StreamingResponse(
+        export.stream_export(
+            format,
+            table=table,
+            user_id=user_id,
+            persona_id=persona_id,
+            status=status,
+            since=since,
+            until=until,
+            after=position,
+            compress=compress,
+        ),
+        media_type="application/x-ndjson" if format == "jsonl" else "text/csv",
+        headers=headers,
+    )
 
-        return EndSessionResponse(
-            session_id=str(session_id),
-            status="completed",
-            ended_at=ended_at,
-            scorecard=ScorecardData(
-                overall_score=overall_score,
-                opener_score=opener.get("score", 0),
-                opener_feedback=opener.get("feedback", ""),
-                objection_handling_score=objection_handling.get("score", 0),
-                objection_handling_feedback=objection_handling.get("feedback", ""),
-                tone_confidence_score=tone_and_confidence.get("score", 0),
-                tone_confidence_feedback=tone_and_confidence.get("feedback", ""),
-                close_attempt_score=close_attempt.get("score", 0),
-                close_attempt_feedback=close_attempt.get("feedback", ""),
-                best_moment=scorecard_json.get("best_moment", ""),
-                biggest_mistake=scorecard_json.get("biggest_mistake", ""),
-                what_to_say_instead=scorecard_json.get("what_to_say_instead", ""),
-                meeting_booked=scorecard_json.get("meeting_booked", False),
-            ),
+
+@app.get("/search")
+async def full_text_search(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=500),
+    scope: str = "transcripts",
+    field: Optional[str] = None,
+    role: Optional[str] = None,
+    user_id: Optional[str] = None,
+    persona_id: Optional[str] = None,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+):
+    """Full-text search over transcript lines or scorecard feedback, best match first.
+
+    `q` takes web-search syntax ("exact phrase", -word, or). `scope` is
+    'transcripts' (filter by `role`) or 'scorecards' (restrict to one
+    feedback `field` such as biggest_mistake). `since`/`until` are
+    inclusive session start dates. Matches come back highlighted with
+    <mark>; pass the X-Next-Cursor response header back as `cursor` for
+    the next page.
+    """
+    if scope not in ("transcripts", "scorecards"):
+        raise HTTPException(status_code=400, detail="scope must be one of: transcripts, scorecards")
+    if role is not None and role not in search.ROLES:
+        raise HTTPException(status_code=400, detail=f"role must be one of: {', '.join(search.ROLES)}")
+    if field is not None and field not in search.FEEDBACK_FIELDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"field must be one of: {', '.join(search.FEEDBACK_FIELDS)}",
         )
+    if cursor:
+        try:
+            search.decode_search_cursor(cursor)
+        except InvalidCursorError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
+    filters = {"user_id": user_id, "persona_id": persona_id, "since": since, "until": until}
 
-@app.get("/sessions/{session_id}", response_model=SessionDetail)
-async def get_session(session_id: str):
-    """Fetch full session details including messages and scorecard."""
+    try:
+        async with get_db_connection() as conn:
+            if scope == "transcripts":
+                rows, next_cursor = await search.search_transcripts(
+                    conn, q, role=role, cursor=cursor, limit=limit, **filters
+                )
+                hits = [search.transcript_hit(row) for row in rows]
+            else:
+                rows, next_cursor = await search.search_scorecards(
+                    conn, q, field=field, cursor=cursor, limit=limit, **filters
+                )
+                hits = [search.scorecard_hit(row) for row in rows]
+    except search.SearchTooBroadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+
+    return hits
+
+
+def validate_period(period: str, allowed: tuple) -> None:
+    if period not in allowed:
+        raise HTTPException(status_code=400, detail=f"period must be one of: {', '.join(allowed)}")
+
+
+@app.get("/analytics/summary")
+async def analytics_summary(user_id: str = analytics.ALL_USERS):
+    """All-time averages for a user ('*' for the whole team), overall and per persona."""
     async with get_db_connection() as conn:
-        # Fetch session
-        session_row = await conn.fetchrow(
-            "SELECT id, user_id, persona_id, conversation_id, started_at, status FROM sessions WHERE id = $1",
-            session_id,
-        )
+        rows = await analytics.fetch_summary(conn, user_id)
 
-        if not session_row:
-            raise HTTPException(status_code=404, detail=f"Session '{session_id}' not found")
+    overall = next((row for row in rows if row["persona_id"] == analytics.ALL_PERSONAS), None)
+    return {
+        "user_id": user_id,
+        "overall": overall,
+        "personas": [row for row in rows if row["persona_id"] != analytics.ALL_PERSONAS],
+    }
 
-        # Fetch messages
-        message_rows = await conn.fetch(
-            """
-            SELECT id, session_id, role, content, turn_number, created_at
-            FROM messages
-            WHERE session_id = $1
-            ORDER BY turn_number ASC
-            """,
-            session_id,
-        )
 
-        messages = [
-            Message(
-                id=str(row["id"]),
-                session_id=str(row["session_id"]),
-                role=row["role"],
-                content=row["content"],
-                turn_number=row["turn_number"],
-                created_at=row["created_at"],
-            )
-            for row in message_rows
-        ]
-
-        # Fetch scorecard if exists
-        scorecard_row = await conn.fetchrow(
-            """
-            SELECT overall_score,
-                   opener_score, opener_feedback,
-                   objection_handling_score, objection_handling_feedback,
-                   tone_confidence_score, tone_confidence_feedback,
-                   close_attempt_score, close_attempt_feedback,
-                   best_moment, biggest_mistake, what_to_say_instead,
-                   meeting_booked
-            FROM scorecards
-            WHERE session_id = $1
-            """,
-            session_id,
+@app.get("/analytics/trend")
+async def analytics_trend(
+    user_id: str = analytics.ALL_USERS,
+    persona_id: str = analytics.ALL_PERSONAS,
+    period: str = "day",
+    buckets: int = Query(30, ge=1, le=366),
+    window: int = Query(7, ge=1, le=52),
+):
+    """Daily or weekly averages with rolling averages over `window` buckets."""
+    validate_period(period, ("day", "week"))
+
+    async with get_db_connection() as conn:
+        trend = await analytics.fetch_trend(
+            conn,
+            user_id=user_id,
+            persona_id=persona_id,
+            period=period,
+            buckets=buckets,
+            window=window,
         )
 
-        scorecard = None
-        if scorecard_row:
-            scorecard = ScorecardData(
-                overall_score=scorecard_row["overall_score"],
-                opener_score=scorecard_row["opener_score"],
-                opener_feedback=scorecard_row["opener_feedback"],
-                objection_handling_score=scorecard_row["objection_handling_score"],
-                objection_handling_feedback=scorecard_row["objection_handling_feedback"],
-                tone_confidence_score=scorecard_row["tone_confidence_score"],
-                tone_confidence_feedback=scorecard_row["tone_confidence_feedback"],
-                close_attempt_score=scorecard_row["close_attempt_score"],
-                close_attempt_feedback=scorecard_row["close_attempt_feedback"],
-                best_moment=scorecard_row["best_moment"],
-                biggest_mistake=scorecard_row["biggest_mistake"],
-                what_to_say_instead=scorecard_row["what_to_say_instead"],
-                meeting_booked=scorecard_row["meeting_booked"],
-            )
+    return {"user_id": user_id, "persona_id": persona_id, "period": period, "window": window, "trend": trend}
 
-        return SessionDetail(
-            session=SessionResponse(
-                id=str(session_row["id"]),
-                user_id=session_row["user_id"],
-                persona_id=session_row["persona_id"],
-                conversation_id=session_row["conversation_id"],
-                started_at=session_row["started_at"],
-                status=session_row["status"],
-            ),
-            messages=messages,
-            scorecard=scorecard,
-        )
 
+@app.get("/analytics/leaderboard")
+async def analytics_leaderboard(
+    persona_id: str = analytics.ALL_PERSONAS,
+    period: str = "all",
+    bucket: Optional[date] = None,
+    limit: int = Query(10, ge=1, le=100),
+    min_sessions: int = Query(1, ge=1),
+):
+    """Top users by average overall score.
+
+    `period` is 'all', 'week' or 'day'; `bucket` is any date in the wanted
+    week or day and defaults to the current one.
+    """
+    validate_period(period, analytics.PERIODS)
+    bucket = analytics.bucket_start(period, bucket or date.today())
 
-@app.get("/sessions")
-async def list_sessions(user_id: Optional[str] = None):
-    """List sessions, optionally filtered by user_id."""
     async with get_db_connection() as conn:
-        if user_id:
-            rows = await conn.fetch(
-                """
-                SELECT id, user_id, persona_id, conversation_id, started_at, ended_at, status
-                FROM sessions
-                WHERE user_id = $1
-                ORDER BY started_at DESC
-                """,
-                user_id,
-            )
-        else:
-            rows = await conn.fetch(
-                """
-                SELECT id, user_id, persona_id, conversation_id, started_at, ended_at, status
-                FROM sessions
-                ORDER BY started_at DESC
-                """
-            )
+        leaders = await analytics.fetch_leaderboard(
+            conn,
+            persona_id=persona_id,
+            period=period,
+            bucket=bucket,
+            limit=limit,
+            min_sessions=min_sessions,
+        )
 
-        return [
-            {
-                "id": str(row["id"]),
-                "user_id": row["user_id"],
-                "persona_id": row["persona_id"],
-                "conversation_id": row["conversation_id"],
-                "started_at": row["started_at"],
-                "ended_at": row["ended_at"],
-                "status": row["status"],
-            }
-            for row in rows
-        ]
+    return {"persona_id": persona_id, "period": period, "bucket": bucket, "leaders": leaders}
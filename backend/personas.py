@@ -1,47 +1,159 @@
-PERSONAS = {
-    "robert": {
-        "name": "Robert Chen",
-        "age": 58,
-        "occupation": "Retired Mechanical Engineer",
-        "portfolio_value": "$400k",
-        "current_provider": "Fidelity",
-        "difficulty": "Hard",
-        "voice_id": "VR6AewLTigWG4xSOukaG",
-        "main_objection": "I already manage it myself, done fine for 30 years",
-        "secondary_objections": [
-            "How did you get my number?",
-            "What makes you different?",
-            "I don't pay fees for something I do myself",
-        ],
-    },
-    "sarah": {
-        "name": "Sarah Mitchell",
-        "age": 45,
-        "occupation": "VP of Operations",
-        "portfolio_value": "$750k",
-        "current_provider": "Vanguard",
-        "difficulty": "Medium",
-        "voice_id": "XB0fDUnXU5powFXDhCwa",
-        "main_objection": "Can you just send me an email?",
-        "secondary_objections": [
-            "I don't have time",
-            "Everything's on autopilot",
-            "What's this going to cost me?",
-        ],
-    },
-    "marcus": {
-        "name": "Marcus Johnson",
-        "age": 34,
-        "occupation": "Startup Founder",
-        "portfolio_value": "$250k",
-        "current_provider": "Robinhood + Crypto",
-        "difficulty": "Easy",
-        "voice_id": "IKne3meq5aSn9XLyUdCD",
-        "main_objection": "I've been managing my own stuff, it's been fine",
-        "secondary_objections": [
-            "Been meaning to get around to that",
-            "What's your minimum?",
-            "Can I check your website first?",
-        ],
-    },
-}
+"""Persona registry.
+
+personas.json is the single source of persona data. It is loaded once,
+with every persona's system prompt rendered and the /personas payload
+serialized up front, and reloaded when the file changes (checked at most
+every PERSONAS_RELOAD_INTERVAL seconds). Editing or adding a persona
+therefore takes effect in every worker without a restart, and requests
+never render a prompt themselves.
+"""
+import hashlib
+import json
+import os
+import re
+import time
+from collections.abc import Mapping
+from typing import Iterator
+
+from app.core.config import settings
+from prompts import get_persona_prompt
+
+REQUIRED_FIELDS = (
+    "name",
+    "age",
+    "occupation",
+    "portfolio_value",
+    "current_provider",
+    "difficulty",
+    "voice_id",
+    "main_objection",
+    "secondary_objections",
+)
+
+# What GET /personas exposes for each persona.
+PUBLIC_FIELDS = (
+    "name",
+    "age",
+    "occupation",
+    "portfolio_value",
+    "current_provider",
+    "difficulty",
+    "voice_id",
+    "main_objection",
+)
+
+# Fits sessions.persona_id
+_PERSONA_ID = re.compile(r"^[a-z0-9_-]{1,50}$")
+
+
+class PersonaFileError(ValueError):
+    """personas.json is missing, unreadable or malformed."""
+
+
+class PersonaSnapshot:
+    """One loaded version of personas.json and everything derived from it."""
+
+    def __init__(self, personas: dict[str, dict], stamp: tuple[int, int]):
+        self.personas = personas
+        self.stamp = stamp
+        # Rendered once: identical strings keep the prompt-cache prefix stable
+        self.prompts = {persona_id: get_persona_prompt(p) for persona_id, p in personas.items()}
+        self.payload = json.dumps(
+            {
+                persona_id: {field: p[field] for field in PUBLIC_FIELDS}
+                for persona_id, p in personas.items()
+            },
+            separators=(",", ":"),
+            ensure_ascii=False,
+        ).encode()
+        self.etag = f'"{hashlib.sha256(self.payload).hexdigest()[:16]}"'
+
+
+def _validate(data) -> dict[str, dict]:
+    if not isinstance(data, dict) or not data:
+        raise PersonaFileError("expected a non-empty object of personas keyed by id")
+
+    for persona_id, persona in data.items():
+        if not _PERSONA_ID.match(persona_id):
+            raise PersonaFileError(f"invalid persona id '{persona_id}'")
+        if not isinstance(persona, dict):
+            raise PersonaFileError(f"persona '{persona_id}' is not an object")
+        missing = [field for field in REQUIRED_FIELDS if field not in persona]
+        if missing:
+            raise PersonaFileError(f"persona '{persona_id}' is missing {', '.join(missing)}")
+        if not isinstance(persona["secondary_objections"], list):
+            raise PersonaFileError(f"persona '{persona_id}': secondary_objections must be a list")
+
+    return data
+
+
+class PersonaRegistry(Mapping):
+    """Read-only mapping of persona id to persona, backed by a hot-reloaded file."""
+
+    def __init__(self, path: str, reload_interval: float):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._snapshot = self._load()
+        self._checked_at = time.monotonic()
+        # Stamp of a version that failed to load, so it is reported once
+        self._rejected_stamp = None
+
+    def _stamp(self) -> tuple[int, int]:
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self) -> PersonaSnapshot:
+        try:
+            stamp = self._stamp()
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            raise PersonaFileError(f"cannot read {self.path}: {e}") from e
+        return PersonaSnapshot(_validate(data), stamp)
+
+    def reload(self) -> bool:
+        """Reload if the file changed. A bad file is logged and the current personas kept."""
+        self._checked_at = time.monotonic()
+        try:
+            stamp = self._stamp()
+            if stamp in (self._snapshot.stamp, self._rejected_stamp):
+                return False
+            snapshot = self._load()
+        except (OSError, PersonaFileError) as e:
+            print(f"[ERROR] Persona reload failed, keeping previous personas: {e}")
+            self._rejected_stamp = stamp if isinstance(e, PersonaFileError) else None
+            return False
+
+        self._snapshot = snapshot
+        print(f"[PERSONAS] Reloaded {len(snapshot.personas)} personas from {self.path}")
+        return True
+
+    def current(self) -> PersonaSnapshot:
+        if time.monotonic() - self._checked_at >= self.reload_interval:
+            self.reload()
+        return self._snapshot
+
+    def __getitem__(self, persona_id: str) -> dict:
+        return self.current().personas[persona_id]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.current().personas)
+
+    def __len__(self) -> int:
+        return len(self.current().personas)
+
+    def prompt(self, persona_id: str) -> str:
+        return self.current().prompts[persona_id]
+
+
+PERSONAS = PersonaRegistry(settings.PERSONAS_FILE, settings.PERSONAS_RELOAD_INTERVAL)
+
+
+def get_rendered_persona_prompt(persona_id: str) -> str:
+    """The persona's precomputed system prompt."""
+    return PERSONAS.prompt(persona_id)
+
+
+def persona_version(persona: dict) -> str:
+    """Short hash of a persona's data, for cache keys that depend on it."""
+    return hashlib.sha256(json.dumps(persona, sort_keys=True).encode()).hexdigest()[:12]
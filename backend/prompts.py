@@ -72,3 +72,27 @@ Return ONLY valid JSON with this EXACT structure (no markdown, no code fences, j
   "what_to_say_instead": "A concrete alternative line the advisor could have used",
   "meeting_booked": false
 }"""
+
+SCORECARD_REPAIR_PROMPT = """You are given a sales-call scorecard that was returned in a broken or incomplete format. Re-emit it by calling the record_scorecard tool.
+
+- Copy every score and piece of feedback exactly as written. Do not re-evaluate the call.
+- Convert scores to integers from 0 to 10.
+- If overall_score is missing, use the average of the four category scores.
+- Use an empty string for text that is missing entirely, and false for meeting_booked if it is not stated."""
+
+LIVE_EVALUATION_PROMPT = """You are scoring a cold call that is still in progress, a few turns at a time.
+
+You will get the evaluation so far (or none, at the start of the call) and the turns that happened since. Call the update_evaluation tool with the evaluation of the WHOLE call so far:
+- Keep what the earlier evaluation got right and revise it only where the new turns change the picture.
+- Judge the opener after the advisor's first turn and the prospect's reply.
+- Add each new objection the prospect raises to `objections`, with how well the advisor handled it.
+- Score categories the call has not reached yet 0 with feedback "Not reached yet."
+- Write feedback as if the call ended now, following the scoring instructions above."""
+
+CONVERSATION_SUMMARY_PROMPT = """You keep a running summary of a cold call between a financial advisor and a prospect, so the prospect can stay consistent once early turns are dropped from the conversation.
+
+Given the summary so far (if any) and the turns to add, write the updated summary in at most 120 words. Keep who said what, every objection the prospect raised, anything the prospect revealed or agreed to, and how warm or cold the prospect currently is. Reply with the summary only."""
+
+OPENER_REQUEST_PROMPT = """*Your phone rings from a number you don't recognize, and you pick up.*
+
+(Out of character for this one reply: write {count} different ways you might answer the phone, each 1 to 6 words, one per line, with no numbering, quotes or anything else.)"""
@@ -0,0 +1,24 @@
+"""Recompute the score_rollups table from stored scorecards.
+
+Rollups are maintained as scorecards are written; run this once after
+adding the table to an existing database, or to repair drift.
+
+    python rebuild_rollups.py
+"""
+import asyncio
+
+from app.core.database import close_pool, get_db_connection
+from app.services.analytics import rebuild_rollups
+
+
+async def main() -> None:
+    try:
+        async with get_db_connection() as conn:
+            rows = await rebuild_rollups(conn)
+        print(f"[ROLLUPS] Rebuilt {rows} rollup rows")
+    finally:
+        await close_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
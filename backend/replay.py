@@ -0,0 +1,224 @@
+"""Replay stored calls against persona and scoring prompt variants and compare scores.
+
+Variants are listed in a JSON file; the first is the baseline the others
+are compared against. Each entry has a `name` and any of:
+
+- `persona_prompt`: 'module:function' building the persona prompt from
+  the persona dict, like prompts.get_persona_prompt (default: current)
+- `scoring_prompt`: 'module:STRING' used as the scoring system prompt
+  (default: prompts.SCORING_PROMPT)
+- `model`: model for both persona and scoring calls (default: LLM_MODEL)
+- `opener`: first advisor line to use instead of the stored one, with
+  {name}, {occupation}, {current_provider} etc. filled from the persona's
+  fields in personas.json (for opener A/B tests)
+- `rescore_only`: score the stored transcript without re-driving the persona
+
+    {"variants": [
+        {"name": "current"},
+        {"name": "warmer-opener", "opener": "Hi {name}, thanks for picking up..."},
+        {"name": "new-rubric", "scoring_prompt": "prompts_next:SCORING_PROMPT", "rescore_only": true}
+    ]}
+
+Usage:
+
+    python replay.py --variants variants.json                 # 1000 completed calls
+    python replay.py --variants variants.json --persona robert --limit 200
+    python replay.py --variants variants.json --fake          # offline, against the fake model
+    python replay.py --variants variants.json --from-export sessions.jsonl.gz   # no database
+
+Sessions x variants are replayed by a bounded pool of workers
+(--concurrency calls in flight). Model calls are cached on disk by
+content (--cache-dir), so unchanged variants cost nothing on a re-run.
+Results are appended to <out-dir>/<run-id>/results.jsonl as they finish;
+re-running with the same --run-id skips pairs already done. The
+comparison is printed and written to report.json next to the results.
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import time
+import uuid
+
+from app.core.database import get_db_connection
+from app.services.archive import load_archived_transcript
+from app.services.batch import batch_tool
+from app.services.replay import ReplayCache, format_report, load_variants, replay_session, summarize
+
+# A page of sessions with their stored turns in call order, oldest id first
+PAGE_SQL = """
+SELECT s.id, s.persona_id, COALESCE((
+    SELECT json_agg(json_build_object('role', m.role, 'content', m.content) ORDER BY m.turn_number, m.role)
+    FROM messages m
+    WHERE m.session_id = s.id AND m.session_started_at = s.started_at
+), '[]'::json)::text AS transcript,
+a.archive_file, a.byte_offset, a.byte_length
+FROM sessions s
+LEFT JOIN message_archives a ON a.session_id = s.id
+WHERE s.status = ANY($1::text[])
+  AND ($2::text IS NULL OR s.persona_id = $2)
+  AND s.id > $3
+ORDER BY s.id
+LIMIT $4
+"""
+
+NIL_UUID = uuid.UUID(int=0)
+
+
+class Replay:
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.variants = load_variants(args.variants)
+        self.run_id = args.run_id or os.path.splitext(os.path.basename(args.variants))[0]
+        self.run_dir = os.path.join(args.out_dir, self.run_id)
+        self.results_path = os.path.join(self.run_dir, "results.jsonl")
+        self.cache = ReplayCache(args.cache_dir or os.path.join(args.out_dir, "cache"))
+        self.done: set[tuple[str, str]] = set()
+        self.replayed = 0
+        self.failed = 0
+
+    def load_done(self) -> None:
+        if not os.path.exists(self.results_path):
+            return
+        with open(self.results_path) as f:
+            for line in f:
+                # A line cut short by a crash is simply replayed again
+                try:
+                    result = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                self.done.add((result["session_id"], result["variant"]))
+
+    async def sessions_from_db(self):
+        after = NIL_UUID
+        remaining = self.args.limit
+        while remaining > 0:
+            async with get_db_connection() as conn:
+                rows = await conn.fetch(
+                    PAGE_SQL, self.args.status, self.args.persona, after, min(remaining, self.args.page_size)
+                )
+            if not rows:
+                return
+            for row in rows:
+                turns = json.loads(row["transcript"])
+                if not turns and row["archive_file"] is not None:
+                    turns = await load_archived_transcript(row["archive_file"], row["byte_offset"], row["byte_length"])
+                yield {"id": str(row["id"]), "persona_id": row["persona_id"], "turns": turns}
+            remaining -= len(rows)
+            after = rows[-1]["id"]
+
+    async def sessions_from_export(self):
+        """Sessions from a JSON Lines export (GET /export?format=jsonl), gzipped or not."""
+        path = self.args.from_export
+        opener = gzip.open if path.endswith(".gz") else open
+        count = 0
+        with opener(path, "rt") as f:
+            for line in f:
+                session = json.loads(line)
+                if session["status"] not in self.args.status:
+                    continue
+                if self.args.persona and session["persona_id"] != self.args.persona:
+                    continue
+                yield {"id": session["id"], "persona_id": session["persona_id"], "turns": session["messages"]}
+                count += 1
+                if count >= self.args.limit:
+                    return
+
+    async def replay_one(self, session: dict, variant, out) -> None:
+        try:
+            result = await replay_session(self.cache, variant, session)
+        except Exception as e:
+            print(f"[ERROR] Replaying session {session['id']} as '{variant.name}' failed: {e}")
+            self.failed += 1
+            return
+        out.write(json.dumps(result, ensure_ascii=False) + "\n")
+        out.flush()
+        self.replayed += 1
+
+    async def worker(self, queue: asyncio.Queue, out) -> None:
+        while True:
+            session, variant = await queue.get()
+            try:
+                await self.replay_one(session, variant, out)
+            finally:
+                queue.task_done()
+
+    async def run(self) -> dict:
+        os.makedirs(self.run_dir, exist_ok=True)
+        self.load_done()
+        sessions = self.sessions_from_export() if self.args.from_export else self.sessions_from_db()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.args.concurrency * 2)
+        started = time.perf_counter()
+
+        print(
+            f"[REPLAY] Run '{self.run_id}': {len(self.variants)} variants, "
+            f"{len(self.done)} results already done"
+        )
+
+        with open(self.results_path, "a") as out:
+            workers = [asyncio.create_task(self.worker(queue, out)) for _ in range(self.args.concurrency)]
+            try:
+                async for session in sessions:
+                    if not session["turns"]:
+                        continue
+                    for variant in self.variants:
+                        if (session["id"], variant.name) not in self.done:
+                            await queue.put((session, variant))
+                await queue.join()
+            finally:
+                for task in workers:
+                    task.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+
+        elapsed = time.perf_counter() - started
+        print(
+            f"[REPLAY] Done in {elapsed:.0f}s: replayed={self.replayed} failed={self.failed} "
+            f"cache hits={self.cache.hits} misses={self.cache.misses}"
+        )
+
+        with open(self.results_path) as f:
+            results = []
+            for line in f:
+                try:
+                    results.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        summary = summarize(results, [variant.name for variant in self.variants])
+        with open(os.path.join(self.run_dir, "report.json"), "w") as f:
+            json.dump(summary, f, indent=2)
+        return summary
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--variants", required=True, help="JSON file of variants; the first is the baseline")
+    parser.add_argument("--run-id", help="results directory name; re-use it to resume (default: variants file name)")
+    parser.add_argument("--out-dir", default="replay_runs", help="where runs and the call cache are kept")
+    parser.add_argument("--cache-dir", help="model call cache (default: <out-dir>/cache)")
+    parser.add_argument("--limit", type=int, default=1000, help="sessions to replay")
+    parser.add_argument("--persona", help="only sessions with this persona")
+    parser.add_argument("--status", nargs="+", default=["completed"], help="session statuses to replay")
+    parser.add_argument("--from-export", help="read sessions from a JSON Lines export instead of the database")
+    parser.add_argument("--concurrency", type=int, default=16, help="model calls in flight")
+    parser.add_argument("--db-connections", type=int, default=2, help="size of this tool's DB pool")
+    parser.add_argument("--page-size", type=int, default=200, help="sessions read per query")
+    parser.add_argument("--fake", action="store_true", help="replay against bench.fake_llm instead of the API")
+    parser.add_argument("--fake-latency", type=float, default=0.2)
+    return parser.parse_args()
+
+
+async def main() -> None:
+    args = parse_args()
+
+    fake_latency = args.fake_latency if args.fake else None
+    async with batch_tool(args.db_connections, args.concurrency, fake_latency):
+        summary = await Replay(args).run()
+        print(format_report(summary))
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,256 @@
+"""Re-score stored sessions under the current scoring prompt and model.
+
+Results go to scorecard_versions under a rubric version, next to (not
+over) the scorecards users already saw. Sessions are read in pages by
+ascending id through a server-side cursor, scored by a bounded pool of
+concurrent model calls, and written back with COPY. Progress is
+checkpointed per page in rescore_checkpoints, so an interrupted run
+picks up where it stopped:
+
+    python rescore.py                        # completed sessions, default rubric
+    python rescore.py --concurrency 32 --db-connections 3
+    python rescore.py --fake --limit 1000    # dry run against the fake model
+    python rescore.py --from-start           # retry sessions that failed earlier
+
+The tool opens its own small pool (--db-connections), separate from the
+API's, and holds a connection only while reading or writing a page, so
+a long backfill adds little load on the live database.
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+from app.core.config import settings
+from app.core.database import get_db_connection
+from app.models.session import ScorecardData
+from app.services import admission
+from app.services.archive import load_archived_transcript
+from app.services.batch import batch_tool
+from app.services.scoring import SCORING_PROMPT_VERSION, flatten_scorecard, generate_scorecard
+from personas import PERSONAS
+
+SCORECARD_COLUMNS = list(ScorecardData.model_fields)
+
+# One page of sessions with their transcripts (or where in the archive
+# they are), oldest id first. Sessions already scored under this rubric are
+# skipped, which makes re-running a page after a crash harmless.
+PAGE_SQL = """
+SELECT s.id, s.persona_id, COALESCE((
+    SELECT json_agg(json_build_object('role', m.role, 'content', m.content) ORDER BY m.turn_number, m.role)
+    FROM messages m
+    WHERE m.session_id = s.id AND m.session_started_at = s.started_at
+), '[]'::json)::text AS transcript,
+a.archive_file, a.byte_offset, a.byte_length
+FROM sessions s
+LEFT JOIN message_archives a ON a.session_id = s.id
+WHERE s.status = ANY($1::text[])
+  AND s.id > $2
+  AND NOT EXISTS (
+      SELECT 1 FROM scorecard_versions v
+      WHERE v.session_id = s.id AND v.rubric_version = $3
+  )
+ORDER BY s.id
+LIMIT $4
+"""
+
+MERGE_STAGED_SQL = f"""
+INSERT INTO scorecard_versions (session_id, rubric_version, model, {", ".join(SCORECARD_COLUMNS)}, generated_at)
+SELECT session_id, rubric_version, model, {", ".join(SCORECARD_COLUMNS)}, generated_at
+FROM scorecard_versions_staging
+ON CONFLICT (session_id, rubric_version) DO NOTHING
+"""
+
+CHECKPOINT_SQL = """
+INSERT INTO rescore_checkpoints (run_id, rubric_version, last_session_id, scored, failed, updated_at)
+VALUES ($1, $2, $3, $4, $5, NOW())
+ON CONFLICT (run_id) DO UPDATE SET
+    last_session_id = EXCLUDED.last_session_id,
+    scored = rescore_checkpoints.scored + EXCLUDED.scored,
+    failed = rescore_checkpoints.failed + EXCLUDED.failed,
+    updated_at = NOW()
+"""
+
+NIL_UUID = uuid.UUID(int=0)
+
+
+class Rescorer:
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.rubric_version = args.rubric_version
+        self.run_id = args.run_id or args.rubric_version
+        self.pending: list[tuple] = []
+        self.scored = 0
+        self.failed = 0
+        self.page_scored = 0
+        self.page_failed = 0
+
+    async def load_checkpoint(self) -> uuid.UUID:
+        if self.args.from_start:
+            return NIL_UUID
+
+        async with get_db_connection() as conn:
+            last = await conn.fetchval(
+                "SELECT last_session_id FROM rescore_checkpoints WHERE run_id = $1",
+                self.run_id,
+            )
+        return last or NIL_UUID
+
+    async def read_page(self, after: uuid.UUID) -> list:
+        """Read the next page through a server-side cursor in a short transaction."""
+        rows = []
+        async with get_db_connection() as conn:
+            async with conn.transaction(readonly=True):
+                async for row in conn.cursor(
+                    PAGE_SQL,
+                    self.args.status,
+                    after,
+                    self.rubric_version,
+                    self.args.page_size,
+                    prefetch=self.args.prefetch,
+                ):
+                    rows.append(row)
+        return rows
+
+    async def score_one(self, row) -> None:
+        session_id = row["id"]
+        persona = PERSONAS.get(row["persona_id"])
+        try:
+            if persona is None:
+                raise LookupError(f"Persona '{row['persona_id']}' not found")
+            transcript = json.loads(row["transcript"])
+            if not transcript and row["archive_file"] is not None:
+                transcript = await load_archived_transcript(
+                    row["archive_file"], row["byte_offset"], row["byte_length"]
+                )
+            scorecard_json = await generate_scorecard(
+                persona,
+                transcript,
+                label="rescore",
+                persona_id=row["persona_id"],
+                priority=admission.BATCH,
+            )
+            scorecard = flatten_scorecard(scorecard_json)
+        except Exception as e:
+            print(f"[ERROR] Re-scoring session {session_id} failed: {e}")
+            self.page_failed += 1
+            return
+
+        self.pending.append((
+            session_id,
+            self.rubric_version,
+            settings.LLM_MODEL,
+            *(getattr(scorecard, column) for column in SCORECARD_COLUMNS),
+        ))
+        self.page_scored += 1
+
+    async def write_page(self, checkpoint: uuid.UUID) -> None:
+        """COPY the page's results into scorecard_versions and move the checkpoint, atomically."""
+        batch, self.pending = self.pending, []
+
+        async with get_db_connection() as conn:
+            async with conn.transaction():
+                if batch:
+                    await conn.execute(
+                        "CREATE TEMP TABLE scorecard_versions_staging "
+                        "(LIKE scorecard_versions INCLUDING DEFAULTS) ON COMMIT DROP"
+                    )
+                    await conn.copy_records_to_table(
+                        "scorecard_versions_staging",
+                        records=batch,
+                        columns=["session_id", "rubric_version", "model", *SCORECARD_COLUMNS],
+                    )
+                    await conn.execute(MERGE_STAGED_SQL)
+
+                await conn.execute(
+                    CHECKPOINT_SQL,
+                    self.run_id,
+                    self.rubric_version,
+                    checkpoint,
+                    self.page_scored,
+                    self.page_failed,
+                )
+
+    async def worker(self, queue: asyncio.Queue) -> None:
+        while True:
+            row = await queue.get()
+            try:
+                await self.score_one(row)
+            finally:
+                queue.task_done()
+
+    async def run(self) -> None:
+        after = await self.load_checkpoint()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.args.concurrency * 2)
+        workers = [asyncio.create_task(self.worker(queue)) for _ in range(self.args.concurrency)]
+        started = time.perf_counter()
+        remaining = self.args.limit
+
+        print(f"[RESCORE] Run '{self.run_id}' rubric '{self.rubric_version}' starting after {after}")
+
+        try:
+            while remaining is None or remaining > 0:
+                rows = await self.read_page(after)
+                if remaining is not None:
+                    rows = rows[:remaining]
+                    remaining -= len(rows)
+                if not rows:
+                    break
+
+                self.page_scored = self.page_failed = 0
+                for row in rows:
+                    await queue.put(row)
+                await queue.join()
+
+                after = rows[-1]["id"]
+                await self.write_page(checkpoint=after)
+
+                self.scored += self.page_scored
+                self.failed += self.page_failed
+                elapsed = time.perf_counter() - started
+                print(
+                    f"[RESCORE] Checkpoint {after}: scored={self.scored} failed={self.failed} "
+                    f"rate={self.scored / elapsed:.1f}/s"
+                )
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+        print(f"[RESCORE] Done: scored={self.scored} failed={self.failed}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--rubric-version",
+        default=f"{SCORING_PROMPT_VERSION}-{settings.LLM_MODEL}",
+        help="label stored with each result (default: prompt hash and model)",
+    )
+    parser.add_argument("--run-id", help="checkpoint name (default: the rubric version)")
+    parser.add_argument("--status", nargs="+", default=["completed"], help="session statuses to re-score")
+    parser.add_argument("--concurrency", type=int, default=16, help="model calls in flight")
+    parser.add_argument("--db-connections", type=int, default=3, help="size of this tool's DB pool")
+    parser.add_argument("--page-size", type=int, default=1000, help="sessions read, scored and written per page")
+    parser.add_argument("--prefetch", type=int, default=200, help="rows fetched per cursor round-trip")
+    parser.add_argument("--limit", type=int, help="stop after this many sessions")
+    parser.add_argument("--from-start", action="store_true", help="ignore the checkpoint; already scored sessions are still skipped")
+    parser.add_argument("--fake", action="store_true", help="score with bench.fake_llm instead of the API")
+    parser.add_argument("--fake-latency", type=float, default=0.2)
+    return parser.parse_args()
+
+
+async def main() -> None:
+    args = parse_args()
+
+    fake_latency = args.fake_latency if args.fake else None
+    async with batch_tool(args.db_connections, args.concurrency, fake_latency):
+        await Rescorer(args).run()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
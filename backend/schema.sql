@@ -5,22 +5,42 @@
 CREATE TABLE IF NOT EXISTS sessions (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
     user_id VARCHAR(100) NOT NULL,  -- Hardcoded 'temp-user-001' for v1
-    persona_id VARCHAR(50) NOT NULL CHECK (persona_id IN ('robert', 'sarah', 'marcus')),
+    persona_id VARCHAR(50) NOT NULL,  -- An id from personas.json, checked by the API
     conversation_id VARCHAR(255),  -- From ElevenLabs
     started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     ended_at TIMESTAMP,
-    status VARCHAR(20) DEFAULT 'in_progress' CHECK (status IN ('in_progress', 'completed', 'abandoned'))
+    status VARCHAR(20) DEFAULT 'in_progress' CHECK (status IN ('in_progress', 'scoring', 'completed', 'scoring_failed', 'abandoned')),
+    call_metrics JSONB  -- Transcript heuristics (app.services.heuristics), set when the call ends
 );
 
--- Messages: Transcript turns
+-- Messages: Transcript turns, partitioned by the month the session started
+-- so a session's turns share one partition. Monthly partitions are created
+-- ahead by the API; old ones are moved to compressed files by
+-- archive_messages.py (see message_archives). Databases created before
+-- partitioning are converted with `python archive_messages.py migrate`.
 CREATE TABLE IF NOT EXISTS messages (
-    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    id UUID NOT NULL DEFAULT gen_random_uuid(),
     session_id UUID NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    session_started_at TIMESTAMP NOT NULL,  -- sessions.started_at; the partition key
     role VARCHAR(10) NOT NULL CHECK (role IN ('advisor', 'prospect')),
     content TEXT NOT NULL,
     turn_number INT NOT NULL,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    content_tsv TSVECTOR GENERATED ALWAYS AS (to_tsvector('english', content)) STORED,  -- for /search
+    PRIMARY KEY (id, session_started_at)
+) PARTITION BY RANGE (session_started_at);
+
+-- Catches rows for a month whose partition doesn't exist yet. Skipped on a
+-- database still on the unpartitioned messages table, until it is migrated.
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'messages'::regclass) THEN
+        CREATE TABLE IF NOT EXISTS messages_default PARTITION OF messages DEFAULT;
+    ELSE
+        RAISE NOTICE 'messages is not partitioned: run `python archive_messages.py migrate`';
+    END IF;
+END
+$$;
 
 -- Scorecards: One per completed session
 CREATE TABLE IF NOT EXISTS scorecards (
@@ -39,10 +59,175 @@ CREATE TABLE IF NOT EXISTS scorecards (
     biggest_mistake TEXT,
     what_to_say_instead TEXT,
     meeting_booked BOOLEAN DEFAULT false,
-    generated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    generated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    feedback_tsv TSVECTOR GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', COALESCE(biggest_mistake, '')), 'A') ||
+        setweight(to_tsvector('english', COALESCE(what_to_say_instead, '')), 'A') ||
+        setweight(to_tsvector('english', COALESCE(best_moment, '')), 'B') ||
+        setweight(to_tsvector('english', COALESCE(opener_feedback, '')), 'C') ||
+        setweight(to_tsvector('english', COALESCE(objection_handling_feedback, '')), 'C') ||
+        setweight(to_tsvector('english', COALESCE(tone_confidence_feedback, '')), 'C') ||
+        setweight(to_tsvector('english', COALESCE(close_attempt_feedback, '')), 'C')
+    ) STORED  -- for /search
+);
+
+-- Scoring jobs: queued by /end, claimed by scoring workers
+CREATE TABLE IF NOT EXISTS scoring_jobs (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    session_id UUID UNIQUE NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'done', 'failed')),
+    attempts INT NOT NULL DEFAULT 0,
+    run_after TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    locked_at TIMESTAMP,
+    last_error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
 -- Indexes for performance
 CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON sessions(user_id);
-CREATE INDEX IF NOT EXISTS idx_sessions_started_at ON sessions(started_at DESC);
-CREATE INDEX IF NOT EXISTS idx_messages_session_id_turn ON messages(session_id, turn_number);
+CREATE INDEX IF NOT EXISTS idx_sessions_started_at_id ON sessions(started_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_sessions_user_started_at ON sessions(user_id, started_at DESC, id DESC);
+-- One row per (session, turn, role): makes retried message posts idempotent.
+-- Also serves transcript reads in turn order. The unpartitioned table has
+-- no session_started_at and keeps its own index until it is migrated.
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'messages'::regclass) THEN
+        CREATE UNIQUE INDEX IF NOT EXISTS uq_messages_session_turn_role
+            ON messages(session_id, turn_number, role, session_started_at);
+    END IF;
+END
+$$;
+
+CREATE INDEX IF NOT EXISTS idx_scoring_jobs_runnable ON scoring_jobs(run_after) WHERE status IN ('queued', 'running');
+
+-- Upgrades for databases created from an earlier version of this file
+-- idx_sessions_started_at_id serves everything this index did
+DROP INDEX IF EXISTS idx_sessions_started_at;
+ALTER TABLE sessions DROP CONSTRAINT IF EXISTS sessions_persona_id_check;
+ALTER TABLE sessions DROP CONSTRAINT IF EXISTS sessions_status_check;
+ALTER TABLE sessions ADD CONSTRAINT sessions_status_check
+    CHECK (status IN ('in_progress', 'scoring', 'completed', 'scoring_failed', 'abandoned'));
+ALTER TABLE sessions ADD COLUMN IF NOT EXISTS call_metrics JSONB;
+ALTER TABLE messages ADD COLUMN IF NOT EXISTS content_tsv TSVECTOR
+    GENERATED ALWAYS AS (to_tsvector('english', content)) STORED;
+ALTER TABLE scorecards ADD COLUMN IF NOT EXISTS feedback_tsv TSVECTOR GENERATED ALWAYS AS (
+    setweight(to_tsvector('english', COALESCE(biggest_mistake, '')), 'A') ||
+    setweight(to_tsvector('english', COALESCE(what_to_say_instead, '')), 'A') ||
+    setweight(to_tsvector('english', COALESCE(best_moment, '')), 'B') ||
+    setweight(to_tsvector('english', COALESCE(opener_feedback, '')), 'C') ||
+    setweight(to_tsvector('english', COALESCE(objection_handling_feedback, '')), 'C') ||
+    setweight(to_tsvector('english', COALESCE(tone_confidence_feedback, '')), 'C') ||
+    setweight(to_tsvector('english', COALESCE(close_attempt_feedback, '')), 'C')
+) STORED;
+
+-- Full-text search (GET /search). The tsvector columns are generated, so
+-- every insert keeps them and these indexes current.
+CREATE INDEX IF NOT EXISTS idx_messages_content_tsv ON messages USING GIN (content_tsv);
+CREATE INDEX IF NOT EXISTS idx_scorecards_feedback_tsv ON scorecards USING GIN (feedback_tsv);
+
+-- Score rollups: running sums per (user, persona, day/week/all-time bucket),
+-- updated in the transaction that stores each scorecard. '*' in user_id or
+-- persona_id is the aggregate over all users / personas. Rebuild from the
+-- scorecards table with `python rebuild_rollups.py`.
+CREATE TABLE IF NOT EXISTS score_rollups (
+    user_id VARCHAR(100) NOT NULL,
+    persona_id VARCHAR(50) NOT NULL,
+    period VARCHAR(4) NOT NULL CHECK (period IN ('day', 'week', 'all')),
+    bucket DATE NOT NULL,  -- day, Monday of the week, or 1970-01-01 for 'all'
+    sessions INT NOT NULL,
+    overall_sum BIGINT NOT NULL,
+    opener_sum BIGINT NOT NULL,
+    objection_handling_sum BIGINT NOT NULL,
+    tone_confidence_sum BIGINT NOT NULL,
+    close_attempt_sum BIGINT NOT NULL,
+    meetings_booked INT NOT NULL,
+    overall_mean NUMERIC GENERATED ALWAYS AS (overall_sum::numeric / sessions) STORED,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, persona_id, period, bucket)
+);
+
+CREATE INDEX IF NOT EXISTS idx_score_rollups_leaderboard
+    ON score_rollups(persona_id, period, bucket, overall_mean DESC, sessions DESC, user_id)
+    WHERE user_id <> '*';
+
+-- Scorecard cache: raw scoring results keyed by a hash of (normalized
+-- transcript, persona, scoring prompt version, model)
+CREATE TABLE IF NOT EXISTS scorecard_cache (
+    key CHAR(64) PRIMARY KEY,
+    persona_id VARCHAR(50) NOT NULL,
+    prompt_version VARCHAR(64) NOT NULL,  -- Scoring prompt hash plus persona hash
+    model VARCHAR(100) NOT NULL,
+    scorecard JSONB NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Upgrade: the version was once only the prompt hash
+ALTER TABLE scorecard_cache ALTER COLUMN prompt_version TYPE VARCHAR(64);
+
+-- Scorecard versions: sessions re-scored offline by rescore.py, one row per
+-- (session, rubric version). The scorecards table keeps the original.
+CREATE TABLE IF NOT EXISTS scorecard_versions (
+    session_id UUID NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    rubric_version VARCHAR(150) NOT NULL,
+    model VARCHAR(100) NOT NULL,
+    overall_score INT CHECK (overall_score BETWEEN 0 AND 10),
+    opener_score INT CHECK (opener_score BETWEEN 0 AND 10),
+    opener_feedback TEXT,
+    objection_handling_score INT CHECK (objection_handling_score BETWEEN 0 AND 10),
+    objection_handling_feedback TEXT,
+    tone_confidence_score INT CHECK (tone_confidence_score BETWEEN 0 AND 10),
+    tone_confidence_feedback TEXT,
+    close_attempt_score INT CHECK (close_attempt_score BETWEEN 0 AND 10),
+    close_attempt_feedback TEXT,
+    best_moment TEXT,
+    biggest_mistake TEXT,
+    what_to_say_instead TEXT,
+    meeting_booked BOOLEAN DEFAULT false,
+    generated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (session_id, rubric_version)
+);
+
+CREATE INDEX IF NOT EXISTS idx_scorecard_versions_rubric ON scorecard_versions(rubric_version);
+
+-- Re-scoring progress: the last session id whose page was fully written
+CREATE TABLE IF NOT EXISTS rescore_checkpoints (
+    run_id VARCHAR(150) PRIMARY KEY,
+    rubric_version VARCHAR(150) NOT NULL,
+    last_session_id UUID NOT NULL,
+    scored INT NOT NULL DEFAULT 0,
+    failed INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Live evaluations: running scorecard state per session, updated as turns
+-- arrive and consolidated into the scorecard when the call ends
+CREATE TABLE IF NOT EXISTS session_evaluations (
+    session_id UUID PRIMARY KEY REFERENCES sessions(id) ON DELETE CASCADE,
+    through_turn INT NOT NULL,  -- every turn up to this one is covered
+    messages_seen INT NOT NULL,
+    state JSONB NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Model call slots shared by every process when LLM_ADMISSION_BACKEND=postgres.
+-- Rows are created on first use; a slot is free when holder is NULL or its
+-- lease has run out. Tiny and constantly updated, so kept unlogged.
+CREATE UNLOGGED TABLE IF NOT EXISTS llm_slots (
+    slot INT PRIMARY KEY,
+    holder VARCHAR(32),
+    priority VARCHAR(10),
+    lease_until TIMESTAMPTZ
+);
+
+-- Where archived transcripts live: a gzip member per session inside one
+-- file per month under ARCHIVE_DIR
+CREATE TABLE IF NOT EXISTS message_archives (
+    session_id UUID PRIMARY KEY REFERENCES sessions(id) ON DELETE CASCADE,
+    archive_file VARCHAR(255) NOT NULL,  -- relative to ARCHIVE_DIR
+    byte_offset BIGINT NOT NULL,
+    byte_length INT NOT NULL,
+    message_count INT NOT NULL,
+    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,39 @@
+"""Standalone scoring worker.
+
+Runs scoring jobs queued by POST /sessions/{id}/end without serving HTTP,
+so scorers can be scaled separately from the API processes. Start the API
+with SCORING_WORKER_CONCURRENCY=0 to leave all scoring to these workers.
+
+    python scoring_worker.py
+"""
+import asyncio
+
+from app.core.config import settings
+from app.core.database import close_pool, warm_pool
+from app.services import admission, llm
+from app.services.scoring_queue import ScoringWorker
+
+
+async def main() -> None:
+    await warm_pool()
+    await llm.warm_client()
+    worker = ScoringWorker(
+        concurrency=max(settings.SCORING_WORKER_CONCURRENCY, 1),
+        poll_interval=settings.SCORING_POLL_INTERVAL,
+    )
+    print(f"[WORKER] Scoring with concurrency {worker.concurrency}")
+
+    try:
+        await worker.run_forever()
+    finally:
+        await worker.stop()
+        await llm.close_client()
+        await admission.close_limiter()
+        await close_pool()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,30 @@
+"""Startup-time regression check: importing main must stay within budget.
+
+The budget (seconds) defaults to STARTUP_IMPORT_BUDGET; importing main
+took about 0.5s when it was set. Each run is a fresh interpreter, and the
+fastest of a few runs is compared, so one slow run on a busy CI host
+doesn't fail the build.
+"""
+import os
+
+from app.core.startup import profile
+
+STARTUP_IMPORT_BUDGET = float(os.getenv("STARTUP_IMPORT_BUDGET", "1.0"))
+RUNS = 3
+
+
+def test_import_main_within_budget():
+    imported, modules, _ = min((profile() for _ in range(RUNS)), key=lambda run: run[0])
+
+    slowest = sorted(modules, key=lambda m: -m[2])[:5]
+    assert imported <= STARTUP_IMPORT_BUDGET, (
+        f"import main took {imported:.2f}s, over the {STARTUP_IMPORT_BUDGET:.2f}s budget; "
+        f"slowest modules: {', '.join(f'{name} {self_ms:.0f}ms' for name, _, self_ms, _ in slowest)}"
+    )
+
+
+def test_import_main_skips_the_sdk():
+    # The SDK alone costs over a second; it is imported by the warm-up instead
+    _, modules, _ = profile()
+    names = {name for name, _, _, _ in modules}
+    assert "anthropic" not in names
@@ -8,6 +8,8 @@ export interface Session {
   started_at: string;
   ended_at?: string;
   status: string;
+  overall_score?: number | null;
+  meeting_booked?: boolean | null;
 }
 
 export interface Message {
@@ -57,7 +59,7 @@ export interface EndSessionResponse {
   session_id: string;
   status: string;
   ended_at: string;
-  scorecard: Scorecard;
+  scorecard: Scorecard | null;
 }
 
 /**
@@ -95,35 +97,41 @@ export async function addMessage(sessionId: string, req: MessageRequest): Promis
 }
 
 /**
- * End a session and generate scorecard.
- * This can take 5-10 seconds as it calls Claude API.
+ * End a session and wait for its scorecard.
+ * The backend queues scoring and answers right away; we then poll the
+ * session until the scorecard lands (usually 5-10 seconds).
  */
 export async function endSession(sessionId: string): Promise<EndSessionResponse> {
-  const controller = new AbortController();
-  const timeoutId = setTimeout(() => controller.abort(), 30000); // 30 second timeout
+  const deadline = Date.now() + 60000; // 60 second timeout
 
-  try {
-    const response = await fetch(`${API_URL}/sessions/${sessionId}/end`, {
-      method: 'POST',
-      headers: { 'Content-Type': 'application/json' },
-      signal: controller.signal,
-    });
+  const response = await fetch(`${API_URL}/sessions/${sessionId}/end`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+  });
 
-    clearTimeout(timeoutId);
+  if (!response.ok) {
+    const error = await response.json().catch(() => ({ detail: 'Failed to end session' }));
+    throw new Error(error.detail || 'Failed to end session');
+  }
 
-    if (!response.ok) {
-      const error = await response.json().catch(() => ({ detail: 'Failed to end session' }));
-      throw new Error(error.detail || 'Failed to end session');
-    }
+  const result: EndSessionResponse = await response.json();
 
-    return response.json();
-  } catch (error) {
-    clearTimeout(timeoutId);
-    if (error instanceof Error && error.name === 'AbortError') {
+  while (!result.scorecard) {
+    if (Date.now() > deadline) {
       throw new Error('Request timed out - scorecard generation took too long');
     }
-    throw error;
+
+    await new Promise((resolve) => setTimeout(resolve, 1500));
+    const detail = await getSession(sessionId);
+
+    if (detail.session.status === 'scoring_failed') {
+      throw new Error('Scorecard generation failed');
+    }
+    result.status = detail.session.status;
+    result.scorecard = detail.scorecard;
   }
+
+  return result;
 }
 
 /**